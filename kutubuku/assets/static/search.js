@@ -0,0 +1,214 @@
+// Search client for the index written by scripts/search_index.py.
+// Only the manifest and page lengths are loaded up front; term shards and
+// page metadata are fetched when a query needs them.
+(() => {
+  const K1 = 1.2;
+  const B = 0.75;
+  const TOKEN = /[\p{L}\p{N}_]+/gu;
+  const MAX_TERM_LENGTH = 40;
+  const LIMIT = 10;
+
+  const decodeVarint = (data, pos) => {
+    let value = 0;
+    let scale = 1;
+    for (;;) {
+      const byte = data[pos++];
+      value += (byte & 0x7f) * scale;
+      if (byte < 0x80) return [value, pos];
+      scale *= 128;
+    }
+  };
+
+  const decodeShard = (data) => {
+    const terms = new Map();
+    const decoder = new TextDecoder();
+    let [count, pos] = decodeVarint(data, 0);
+    for (let i = 0; i < count; i++) {
+      let length, pages, delta, tf;
+      [length, pos] = decodeVarint(data, pos);
+      const term = decoder.decode(data.subarray(pos, pos + length));
+      pos += length;
+      [pages, pos] = decodeVarint(data, pos);
+      const postings = new Map();
+      let id = 0;
+      for (let j = 0; j < pages; j++) {
+        [delta, pos] = decodeVarint(data, pos);
+        [tf, pos] = decodeVarint(data, pos);
+        id += delta;
+        postings.set(id, tf);
+      }
+      terms.set(term, postings);
+    }
+    return terms;
+  };
+
+  const decodeLengths = (data) => {
+    const lengths = [];
+    let pos = 0;
+    while (pos < data.length) {
+      let length;
+      [length, pos] = decodeVarint(data, pos);
+      lengths.push(length);
+    }
+    return lengths;
+  };
+
+  const tokenize = (text) =>
+    (text.toLowerCase().match(TOKEN) || []).filter(
+      (term) => Array.from(term).length <= MAX_TERM_LENGTH
+    );
+
+  class SearchIndex {
+    constructor(base) {
+      this.base = base;
+      this.files = new Map();
+    }
+
+    // Fetch an index file once. Only the manifest can change under the
+    // same name, every other file is named after its content hash.
+    get(name, decode) {
+      if (!this.files.has(name)) {
+        const options = name === "index.json" ? { cache: "no-cache" } : {};
+        this.files.set(
+          name,
+          fetch(this.base + name, options).then(async (response) => {
+            if (!response.ok) throw new Error(`${name}: ${response.status}`);
+            return decode(await response.arrayBuffer());
+          })
+        );
+      }
+      return this.files.get(name);
+    }
+
+    async load() {
+      const json = (buffer) => JSON.parse(new TextDecoder().decode(buffer));
+      this.manifest = await this.get("index.json", json);
+      const bytes = (buffer) => decodeLengths(new Uint8Array(buffer));
+      this.lengths = await this.get(this.manifest.lengths, bytes);
+      return this;
+    }
+
+    async shard(term) {
+      const chars = Array.from(term);
+      for (let n = Math.min(chars.length, this.manifest.max_prefix); n > 0; n--) {
+        const name = this.manifest.shards[chars.slice(0, n).join("")];
+        if (name) return this.get(name, (buffer) => decodeShard(new Uint8Array(buffer)));
+      }
+      return new Map();
+    }
+
+    async matches(term, prefix) {
+      const terms = await this.shard(term);
+      if (prefix && Array.from(term).length >= this.manifest.max_prefix) {
+        return [...terms].filter(([t]) => t.startsWith(term)).map(([, p]) => p);
+      }
+      return terms.has(term) ? [terms.get(term)] : [];
+    }
+
+    async meta(id) {
+      const chunk = String(Math.floor(id / this.manifest.chunk_size));
+      const pages = await this.get(this.manifest.chunks[chunk], (buffer) =>
+        JSON.parse(new TextDecoder().decode(buffer))
+      );
+      return pages[String(id)];
+    }
+
+    // Pages matching every term of the query, best BM25 score first.
+    // The last term also matches as a prefix, so results show while typing.
+    async search(query, limit = LIMIT) {
+      const terms = tokenize(query);
+      if (!terms.length) return [];
+      const pages = this.manifest.pages;
+      const average = this.manifest.average_length || 1;
+      const matches = await Promise.all(
+        terms.map((term, i) => this.matches(term, i === terms.length - 1))
+      );
+      let scores = null;
+      for (const postingLists of matches) {
+        const termScores = new Map();
+        for (const postings of postingLists) {
+          const idf = Math.log(1 + (pages - postings.size + 0.5) / (postings.size + 0.5));
+          for (const [id, tf] of postings) {
+            const norm = K1 * (1 - B + (B * this.lengths[id]) / average);
+            const score = (idf * tf * (K1 + 1)) / (tf + norm);
+            termScores.set(id, (termScores.get(id) || 0) + score);
+          }
+        }
+        if (scores === null) {
+          scores = termScores;
+        } else {
+          for (const [id, score] of scores) {
+            if (termScores.has(id)) scores.set(id, score + termScores.get(id));
+            else scores.delete(id);
+          }
+        }
+      }
+      const ranked = [...scores].sort((a, b) => b[1] - a[1] || a[0] - b[0]);
+      return Promise.all(ranked.slice(0, limit).map(([id]) => this.meta(id)));
+    }
+  }
+
+  const renderResult = (meta) => {
+    const item = document.createElement("li");
+    item.className = "search-result";
+    if (meta.image) {
+      const image = document.createElement("img");
+      image.className = "search-result-image";
+      image.src = new URL(meta.image, new URL(meta.url, window.location)).pathname;
+      image.alt = "";
+      image.loading = "lazy";
+      item.append(image);
+    }
+    const link = document.createElement("a");
+    link.className = "search-result-link";
+    link.href = meta.url;
+    link.textContent = meta.title;
+    const excerpt = document.createElement("p");
+    excerpt.className = "search-result-excerpt";
+    excerpt.textContent = meta.excerpt;
+    item.append(link, excerpt);
+    return item;
+  };
+
+  window.addEventListener("DOMContentLoaded", () => {
+    const container = document.getElementById("search");
+    if (!container) return;
+    const input = container.querySelector(".search-page-input");
+    const status = container.querySelector(".search-status");
+    const results = container.querySelector(".search-results");
+    const index = new SearchIndex(container.dataset.index).load();
+    let latest = 0;
+    let timer;
+
+    const run = async () => {
+      const query = input.value.trim();
+      const current = ++latest;
+      if (!query) {
+        results.replaceChildren();
+        status.textContent = "";
+        return;
+      }
+      try {
+        const found = await (await index).search(query);
+        if (current !== latest) return;
+        results.replaceChildren(...found.map(renderResult));
+        status.textContent = found.length ? "" : `No results for "${query}"`;
+      } catch (error) {
+        status.textContent = "Search is not available right now";
+        console.error("Search failed:", error);
+      }
+    };
+
+    input.addEventListener("input", () => {
+      clearTimeout(timer);
+      timer = setTimeout(run, 100);
+    });
+
+    const query = new URLSearchParams(window.location.search).get("q");
+    if (query) {
+      input.value = query;
+      run();
+    }
+    input.focus();
+  });
+})();
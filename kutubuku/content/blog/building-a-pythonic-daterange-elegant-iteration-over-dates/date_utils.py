@@ -1,6 +1,13 @@
-from datetime import date, timedelta
+from __future__ import annotations
+
+import calendar
+import operator
+from collections.abc import Sequence
+from datetime import date, datetime
 from typing import Iterator
 
+UNITS = ("days", "weeks", "months")
+
 
 def date_range(start_date: str, end_date: str) -> Iterator[str]:
     """
@@ -41,18 +48,110 @@ def date_range(start_date: str, end_date: str) -> Iterator[str]:
         >>> list(gen)  # consumes remaining items
         ['2025-12-02', '2025-12-03']
     """
-    start = date.fromisoformat(start_date)
-    end = date.fromisoformat(end_date)
+    start = date.fromisoformat(start_date).toordinal()
+    end = date.fromisoformat(end_date).toordinal()
+
+    # Dates from their ordinals, without a timedelta per date.
+    return map(date.isoformat, map(date.fromordinal, range(start, end + 1)))
+
+
+def date_ranges(starts, ends):
+    """
+    Expand many date ranges at once, from arrays of start dates and end dates
+    (inclusive), into one NumPy datetime64[D] array of all their dates and the
+    offsets of every range in it: the dates of range i are
+    dates[offsets[i]:offsets[i + 1]].
+
+    Args:
+        starts: Start dates, as ISO format strings, dates or datetime64
+        ends: End dates, as many as starts
+
+    Returns:
+        tuple: The dates and the len(starts) + 1 offsets
+
+    Examples:
+        >>> dates, offsets = date_ranges(
+        ...     ["2025-12-31", "2024-02-28", "2025-12-07"],
+        ...     ["2026-01-02", "2024-03-01", "2025-12-07"],
+        ... )
+        >>> offsets
+        array([0, 3, 6, 7])
+        >>> dates[offsets[1] : offsets[2]]
+        array(['2024-02-28', '2024-02-29', '2024-03-01'], dtype='datetime64[D]')
+        >>> iso_format(dates).tolist()
+        ['2025-12-31', '2026-01-01', '2026-01-02', '2024-02-28', '2024-02-29', '2024-03-01', '2025-12-07']
+    """
+    # Imported here, so NumPy is only needed for bulk use.
+    import numpy as np
+
+    starts = np.asarray(starts, dtype="datetime64[D]")
+    ends = np.asarray(ends, dtype="datetime64[D]")
+    if starts.ndim != 1 or starts.shape != ends.shape:
+        raise ValueError("starts and ends must be 1-d arrays of the same length")
+    lengths = (ends - starts).astype(np.int64) + 1
+    invalid = np.flatnonzero(lengths < 1)
+    if len(invalid):
+        i = invalid[0]
+        raise ValueError(f"start_date ({starts[i]}) must be <= end_date ({ends[i]})")
+
+    offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    # Every date is its range start plus its position past the range offset.
+    days = np.arange(offsets[-1]) - np.repeat(offsets[:-1], lengths)
+    return np.repeat(starts, lengths) + days, offsets
+
+
+def iso_format(dates, as_bytes=False):
+    """
+    Format a NumPy array of dates as ISO format strings "YYYY-MM-DD", writing
+    the digits of all years, months and days at once straight into the
+    characters of the strings, two to three times faster than
+    numpy.datetime_as_string.
+
+    Args:
+        dates: Dates of the years 0 to 9999, as datetime64 or anything
+            NumPy converts to it
+        as_bytes: Return bytes strings, a quarter of the memory of str
+
+    Returns:
+        numpy.ndarray: Strings of 10 characters, str or bytes
+
+    Examples:
+        >>> import numpy as np
+        >>> iso_format(np.array(["0987-06-05", "2024-02-29"], dtype="datetime64[D]"))
+        array(['0987-06-05', '2024-02-29'], dtype='<U10')
+        >>> iso_format(["2025-12-07"], as_bytes=True)
+        array([b'2025-12-07'], dtype='|S10')
+    """
+    import numpy as np
+
+    dates = np.asarray(dates, dtype="datetime64[D]")
+    years = dates.astype("datetime64[Y]")
+    months = dates.astype("datetime64[M]")
+    year = years.astype(np.int64) + 1970
+    if ((year < 0) | (year > 9999)).any():
+        raise ValueError("only dates of the years 0 to 9999 can be formatted")
+    year = year.astype(np.int16)
+    month = (months - years).astype(np.int8) + 1
+    day = (dates - months).astype(np.int8) + 1
 
-    return (
-        (start + timedelta(days=n)).isoformat() for n in range((end - start).days + 1)
-    )
+    # One byte per character of bytes strings, four of str strings, so the
+    # array is viewed as strings without converting it.
+    chars = np.empty(dates.shape + (10,), dtype=np.uint8 if as_bytes else np.uint32)
+    chars[..., 4] = chars[..., 7] = ord("-")
+    for first, value, width in ((0, year, 4), (5, month, 2), (8, day, 2)):
+        for i in range(width):
+            chars[..., first + width - 1 - i] = value // 10**i % 10 + ord("0")
+    return chars.view("S10" if as_bytes else "U10")[..., 0]
 
 
-class DateRange:
+class DateRange(Sequence):
     """
     Iterator class for date ranges between start_date (inclusive) and end_date (inclusive)
 
+    Like range, dates are computed from their index instead of being stored,
+    so a range takes the same memory whatever its length.
+
     Examples:
         >>> dr = DateRange("2025-12-01", "2025-12-05")
 
@@ -79,17 +178,23 @@ class DateRange:
         2025-12-01
 
 
-        Slicing:
+        Slicing, which gives a date range too:
         >>> dr[:3]
+        DateRange('2025-12-01', '2025-12-03')
+        >>> list(dr[:3])
         ['2025-12-01', '2025-12-02', '2025-12-03']
-        >>> dr[1:2]
+        >>> list(dr[1:2])
         ['2025-12-02']
+        >>> list(dr[::-2])
+        ['2025-12-05', '2025-12-03', '2025-12-01']
 
         Membership testing:
         >>> "2025-12-02" in dr
         True
         >>> "2025-12-06" in dr
         False
+        >>> dr.index("2025-12-04"), dr.count("2025-12-04")
+        (3, 1)
 
         Randomized pick
         >>> import random
@@ -97,24 +202,174 @@ class DateRange:
         >>> random.choice(dr)
         '2025-12-05'
 
+        Steps of days, weeks or months, the day of month being clamped to
+        the length of shorter months:
+        >>> list(DateRange("2025-12-01", "2025-12-31", step=2, unit="weeks"))
+        ['2025-12-01', '2025-12-15', '2025-12-29']
+        >>> list(DateRange("2024-01-31", "2024-05-31", unit="months"))
+        ['2024-01-31', '2024-02-29', '2024-03-31', '2024-04-30', '2024-05-31']
 
-    """
+        Date objects instead of strings:
+        >>> DateRange("2025-12-01", "2025-12-05", as_date=True)[-1]
+        datetime.date(2025, 12, 5)
+
+        Long ranges cost nothing up front:
+        >>> century = DateRange("1925-01-01", "2024-12-31")
+        >>> len(century), century[-1], "2000-02-29" in century
+        (36525, '2024-12-31', True)
 
-    def __init__(self, start_date: str, end_date: str):
-        self.start = date.fromisoformat(start_date)
-        self.end = date.fromisoformat(end_date)
+        A NumPy datetime64 array for bulk use:
+        >>> DateRange("2024-01-31", "2024-03-31", unit="months").to_numpy()
+        array(['2024-01-31', '2024-02-29', '2024-03-31'], dtype='datetime64[D]')
+    """
 
-        if self.start > self.end:
+    def __init__(
+        self,
+        start_date: str | date,
+        end_date: str | date,
+        step: int = 1,
+        unit: str = "days",
+        as_date: bool = False,
+    ):
+        self.start = _to_date(start_date)
+        self.end = _to_date(end_date)
+        if unit not in UNITS:
+            raise ValueError(f"unit must be one of {', '.join(UNITS)}, not {unit!r}")
+        if step == 0:
+            raise ValueError("step must not be zero")
+        if step > 0 and self.start > self.end:
             raise ValueError(
                 f"start_date ({start_date}) must be <= end_date ({end_date})"
             )
-        self._dates = [
-            (self.start + timedelta(days=n)).isoformat()
-            for n in range((self.end - self.start).days + 1)
-        ]
+        if step < 0 and self.start < self.end:
+            raise ValueError(
+                f"start_date ({start_date}) must be >= end_date ({end_date}) "
+                "with a negative step"
+            )
+        if unit == "weeks":
+            unit, step = "days", step * 7
+        self.unit = unit
+        self.as_date = as_date
+
+        # Dates are kept as a range of offsets, in days or months, from the
+        # start date, which slicing, membership and index are delegated to.
+        last = self._offset(self.end)
+        if (self._date(last) - self.end).days * step > 0:
+            # The end falls before the clamped date of its month.
+            last -= 1 if step > 0 else -1
+        self._offsets = range(0, last + (1 if step > 0 else -1), step)
+
+    def _offset(self, d: date) -> int:
+        """Offset of d from the start, in days or in months"""
+        if self.unit == "days":
+            return (d - self.start).days
+        return (d.year - self.start.year) * 12 + d.month - self.start.month
+
+    def _date(self, offset: int) -> date:
+        if self.unit == "days":
+            return date.fromordinal(self.start.toordinal() + offset)
+        year, month = divmod(self.start.month - 1 + offset, 12)
+        year += self.start.year
+        day = min(self.start.day, calendar.monthrange(year, month + 1)[1])
+        return date(year, month + 1, day)
+
+    def _item(self, offset: int) -> str | date:
+        d = self._date(offset)
+        return d if self.as_date else d.isoformat()
+
+    def _items(self, offsets: range) -> Iterator[str | date]:
+        if self.unit == "days":
+            # Dates from their ordinals, without a timedelta per date.
+            ordinal = self.start.toordinal()
+            dates = map(
+                date.fromordinal,
+                range(ordinal + offsets.start, ordinal + offsets.stop, offsets.step),
+            )
+        else:
+            dates = map(self._date, offsets)
+        return dates if self.as_date else map(date.isoformat, dates)
 
     def __len__(self) -> int:
-        return (self.end - self.start).days + 1
+        return len(self._offsets)
+
+    def __getitem__(self, index: int | slice) -> str | date | DateRange:
+        if isinstance(index, slice):
+            sliced = object.__new__(DateRange)
+            sliced.__dict__.update(self.__dict__)
+            sliced._offsets = self._offsets[index]
+            return sliced
+        try:
+            return self._item(self._offsets[operator.index(index)])
+        except IndexError:
+            raise IndexError("DateRange index out of range") from None
+
+    def __iter__(self) -> Iterator[str | date]:
+        return self._items(self._offsets)
+
+    def __reversed__(self) -> Iterator[str | date]:
+        return self._items(self._offsets[::-1])
+
+    def __contains__(self, value: object) -> bool:
+        return self._find(value) is not None
+
+    def _find(self, value: object) -> int | None:
+        """Offset of value if it is one of the dates of the range"""
+        try:
+            d = _to_date(value)
+        except (TypeError, ValueError):
+            return None
+        offset = self._offset(d)
+        if offset in self._offsets and self._date(offset) == d:
+            return offset
+        return None
+
+    def index(self, value: object, start: int = 0, stop: int | None = None) -> int:
+        offset = self._find(value)
+        if offset is not None:
+            i = self._offsets.index(offset)
+            if i in range(len(self))[start:stop]:
+                return i
+        raise ValueError(f"{value!r} is not in range")
+
+    def count(self, value: object) -> int:
+        return int(value in self)
+
+    def __repr__(self) -> str:
+        if not self:
+            return "<DateRange of 0 dates>"
+        first = self._date(self._offsets[0])
+        last = self._date(self._offsets[-1])
+        # A slice of a range of months keeps the day of month of its start,
+        # which it does not show if its first date was clamped.
+        if self.unit == "months" and first.day != self.start.day:
+            return f"<DateRange of {len(self)} dates from {first} to {last}>"
+        args = [repr(first.isoformat()), repr(last.isoformat())]
+        if self._offsets.step != 1:
+            args.append(f"step={self._offsets.step}")
+        if self.unit != "days":
+            args.append(f"unit={self.unit!r}")
+        if self.as_date:
+            args.append("as_date=True")
+        return f"DateRange({', '.join(args)})"
+
+    def to_numpy(self):
+        """The dates as a NumPy datetime64[D] array"""
+        # Imported here, so NumPy is only needed for bulk exports.
+        import numpy as np
+
+        offsets = np.arange(self._offsets.start, self._offsets.stop, self._offsets.step)
+        if self.unit == "days":
+            return np.datetime64(self.start, "D") + offsets
+        months = np.datetime64(self.start, "M") + offsets
+        first = months.astype("datetime64[D]")
+        days = ((months + 1).astype("datetime64[D]") - first).astype(int)
+        return first + np.minimum(self.start.day, days) - 1
+
 
-    def __getitem__(self, index: int) -> str:
-        return self._dates[index]
+def _to_date(value: object) -> date:
+    """The date of an ISO format string or a date, not a datetime"""
+    if isinstance(value, str):
+        return date.fromisoformat(value)
+    if isinstance(value, date) and not isinstance(value, datetime):
+        return value
+    raise TypeError(f"expected an ISO format date string or a date, not {value!r}")
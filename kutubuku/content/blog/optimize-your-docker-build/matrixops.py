@@ -1,5 +1,11 @@
 import numpy as np
 import argparse
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+# Elements per row block of the streaming mode, 8 MB of float64.
+BLOCK_ELEMENTS = 1 << 20
 
 
 def create_matrix(rows, cols, operation):
@@ -32,23 +38,224 @@ def analyze_matrix(matrix):
     return stats
 
 
+def create_block(operation, start, stop, cols, rng):
+    """Create rows start to stop of a matrix, like create_matrix"""
+    match operation:
+        case "random":
+            return rng.random((stop - start, cols))
+        case "identity":
+            return np.eye(stop - start, cols, k=start)
+        case "zeros":
+            return np.zeros((stop - start, cols))
+        case "ones":
+            return np.ones((stop - start, cols))
+        case _:
+            return None
+
+
+@dataclass
+class RunningStats:
+    """Count, mean, sum of squared deviations, sum, min and max of values"""
+
+    count: int = 0
+    mean: float = 0.0
+    m2: float = 0.0
+    total: float = 0.0
+    min: float = np.inf
+    max: float = -np.inf
+
+    @classmethod
+    def of(cls, block):
+        block = np.asarray(block, dtype=np.float64)
+        if block.size == 0:
+            return cls()
+        total = block.sum()
+        mean = total / block.size
+        m2 = np.square(block - mean).sum()
+        return cls(block.size, mean, m2, total, block.min(), block.max())
+
+    def merge(self, other):
+        """Combine with the stats of other values, by Chan's formula"""
+        count = self.count + other.count
+        if count == 0:
+            return self
+        delta = other.mean - self.mean
+        return RunningStats(
+            count,
+            self.mean + delta * other.count / count,
+            self.m2 + other.m2 + delta**2 * self.count * other.count / count,
+            self.total + other.total,
+            min(self.min, other.min),
+            max(self.max, other.max),
+        )
+
+    @property
+    def variance(self):
+        return self.m2 / self.count if self.count else np.nan
+
+
+def stream_stats(blocks, read_block, workers=None):
+    """
+    Compute the stats of a matrix one row block at a time: read_block(start,
+    stop) returns the rows of every (start, stop) in blocks. Blocks are read
+    and reduced in a thread pool, as NumPy releases the GIL while it does
+    both, and merged in order, so the result does not depend on the threads.
+    Only one block per thread is in memory at a time.
+    """
+
+    def block_stats(bounds):
+        return RunningStats.of(read_block(*bounds))
+
+    stats = RunningStats()
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        for block in executor.map(block_stats, blocks):
+            stats = stats.merge(block)
+    return stats
+
+
+def row_blocks(rows, cols, block_rows=None):
+    if block_rows is None:
+        block_rows = max(1, BLOCK_ELEMENTS // max(1, cols))
+    if block_rows < 1:
+        raise ValueError(f"block_rows must be at least 1, not {block_rows}")
+    return [
+        (start, min(start + block_rows, rows)) for start in range(0, rows, block_rows)
+    ]
+
+
+def analyze_stream(args):
+    """
+    Analyze a matrix read from a .npy file, mapped into memory, or generated
+    one row block at a time and optionally saved to a .npy file, so the
+    matrix never has to fit in memory.
+    """
+    if args.input:
+        matrix = np.load(args.input, mmap_mode="r")
+        if matrix.ndim != 2:
+            raise SystemExit(f"{args.input} does not hold a 2-D matrix")
+        rows, cols = matrix.shape
+        blocks = row_blocks(rows, cols, args.block_rows)
+
+        def read_block(start, stop):
+            return matrix[start:stop]
+
+    else:
+        rows, cols = args.rows, args.cols
+        if args.operation == "identity":
+            # Like np.eye(rows), an identity matrix is square.
+            cols = rows
+        blocks = row_blocks(rows, cols, args.block_rows)
+        # A generator per block, so blocks are the same whatever the threads.
+        seeds = dict(zip(blocks, np.random.SeedSequence(args.seed).spawn(len(blocks))))
+        output = None
+        if args.save:
+            output = np.lib.format.open_memmap(
+                args.save, mode="w+", dtype=np.float64, shape=(rows, cols)
+            )
+
+        def read_block(start, stop):
+            rng = np.random.default_rng(seeds[start, stop])
+            block = create_block(args.operation, start, stop, cols, rng)
+            if output is not None:
+                output[start:stop] = block
+            return block
+
+    stats = stream_stats(blocks, read_block, args.workers)
+    if args.save:
+        output.flush()
+    analysis = {
+        "Mean": stats.mean,
+        "Variance": stats.variance,
+        "Std Dev": np.sqrt(stats.variance),
+        "Min": stats.min,
+        "Max": stats.max,
+        "Sum": stats.total,
+        # Needs the whole matrix in memory.
+        "Determinant": "N/A",
+    }
+    if stats.count == 0:
+        # An empty matrix has a sum, but no mean, spread or extremes.
+        for key in ("Mean", "Variance", "Std Dev", "Min", "Max"):
+            analysis[key] = "N/A"
+    return rows, cols, analysis
+
+
 def main():
     parser = argparse.ArgumentParser(description="Matrix Operations CLI")
     parser.add_argument(
         "operation",
+        nargs="?",
         choices=["random", "identity", "zeros", "ones"],
         help="Type of matrix to create",
     )
-    parser.add_argument("rows", type=int, help="Number of rows")
-    parser.add_argument("cols", type=int, help="Number of columns")
+    parser.add_argument("rows", nargs="?", type=int, help="Number of rows")
+    parser.add_argument("cols", nargs="?", type=int, help="Number of columns")
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Compute mean, variance, min, max and sum one row block at a time, "
+        "without the matrix in memory or printing it",
+    )
+    parser.add_argument(
+        "--input",
+        help="Stream the matrix of this .npy file instead of creating one",
+    )
+    parser.add_argument(
+        "--save", help="Save the created matrix to this .npy file, implies --stream"
+    )
+    parser.add_argument(
+        "--block-rows",
+        type=int,
+        default=None,
+        help=f"Rows per block of the stream (default: {BLOCK_ELEMENTS:_} elements)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Threads of the stream (default: all cores)",
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=None,
+        help="Random seed of the stream, the same for the same block rows",
+    )
+    parser.add_argument(
+        "--no-print",
+        dest="print_matrix",
+        action="store_false",
+        help="Do not print the matrix",
+    )
 
     args = parser.parse_args()
+    if args.block_rows is not None and args.block_rows < 1:
+        parser.error("--block-rows must be at least 1")
+    if args.workers is not None and args.workers < 1:
+        parser.error("--workers must be at least 1")
+    if args.input:
+        if args.save:
+            parser.error("--save saves a created matrix, not an --input")
+        args.stream = True
+    elif args.operation is None or args.rows is None or args.cols is None:
+        parser.error("operation, rows and cols are required without --input")
+    elif args.save:
+        # The matrix is written one block at a time while it is streamed.
+        args.stream = True
 
-    matrix = create_matrix(args.rows, args.cols, args.operation)
-    stats = analyze_matrix(matrix)
+    if args.stream:
+        rows, cols, stats = analyze_stream(args)
+        source = args.input or f"{args.operation.upper()} Matrix"
+        print(f"\n🔢 Streamed {source} ({rows}x{cols})")
+    else:
+        matrix = create_matrix(args.rows, args.cols, args.operation)
+        stats = analyze_matrix(matrix)
 
-    print(f"\n🔢 Generated {args.operation.upper()} Matrix ({args.rows}x{args.cols}):")
-    print(matrix)
+        print(
+            f"\n🔢 Generated {args.operation.upper()} Matrix ({args.rows}x{args.cols}):"
+        )
+        if args.print_matrix:
+            print(matrix)
     print("\n📊 Matrix Analysis:")
     for key, value in stats.items():
         print(f"{key}: {value}")
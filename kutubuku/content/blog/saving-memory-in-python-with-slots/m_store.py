@@ -0,0 +1,172 @@
+import mmap
+import sys
+from array import array
+from itertools import islice
+
+# Header of a saved store: magic, byte order of the columns, number of rows.
+MAGIC = b"MSTORE"
+HEADER_SIZE = 16
+# Rows transposed into columns at a time by extend.
+CHUNK_SIZE = 1 << 12
+
+
+class MeasurementRow:
+    """
+    View of a row of a MeasurementStore, made on indexing. It holds no data,
+    reads and writes go to the columns of the store.
+    """
+
+    __slots__ = ("_store", "_index")
+
+    def __init__(self, store, index):
+        self._store = store
+        self._index = index
+
+    @property
+    def sample_id(self) -> int:
+        return self._store.sample_ids[self._index]
+
+    @sample_id.setter
+    def sample_id(self, value: int):
+        self._store.own()
+        self._store.sample_ids[self._index] = value
+
+    @property
+    def timestamp(self) -> int:
+        return self._store.timestamps[self._index]
+
+    @timestamp.setter
+    def timestamp(self, value: int):
+        self._store.own()
+        self._store.timestamps[self._index] = value
+
+    def __eq__(self, other):
+        if not isinstance(other, MeasurementRow):
+            return NotImplemented
+        return (self.sample_id, self.timestamp) == (other.sample_id, other.timestamp)
+
+    def __repr__(self):
+        return f"Measurement(sample_id={self.sample_id}, timestamp={self.timestamp})"
+
+
+class MeasurementStore:
+    """
+    Measurements stored by column instead of as one object each: sample ids
+    and timestamps, as Unix seconds, are 64-bit integers in two arrays, which
+    is 16 bytes per measurement.
+    """
+
+    __slots__ = ("sample_ids", "timestamps", "_mmap")
+
+    def __init__(self, rows=()):
+        self.sample_ids = array("q")
+        self.timestamps = array("q")
+        self._mmap = None
+        self.extend(rows)
+
+    def __len__(self):
+        return len(self.sample_ids)
+
+    def __getitem__(self, index: int) -> MeasurementRow:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("MeasurementStore index out of range")
+        return MeasurementRow(self, index)
+
+    def __iter__(self):
+        return (MeasurementRow(self, i) for i in range(len(self)))
+
+    def __repr__(self):
+        return f"<MeasurementStore of {len(self)} measurements>"
+
+    def append(self, sample_id: int, timestamp: int):
+        self.own()
+        start = len(self)
+        try:
+            self.sample_ids.append(sample_id)
+            self.timestamps.append(timestamp)
+        except BaseException:
+            self._truncate(start)
+            raise
+
+    def extend(self, rows):
+        """
+        Append the (sample_id, timestamp) pairs of the iterable rows, which
+        may be an iterator of any length: rows are transposed into columns a
+        chunk at a time and the arrays extended from them. If a row is
+        invalid, none of the rows are appended.
+        """
+        self.own()
+        start = len(self)
+        rows = iter(rows)
+        try:
+            while chunk := list(islice(rows, CHUNK_SIZE)):
+                sample_ids, timestamps = zip(*chunk)
+                self.sample_ids.extend(sample_ids)
+                self.timestamps.extend(timestamps)
+        except BaseException:
+            self._truncate(start)
+            raise
+
+    def extend_columns(self, sample_ids, timestamps):
+        """Append the measurements of two iterables of the same length"""
+        self.own()
+        start = len(self)
+        try:
+            self.sample_ids.extend(sample_ids)
+            self.timestamps.extend(timestamps)
+            if len(self.sample_ids) != len(self.timestamps):
+                raise ValueError("sample_ids and timestamps differ in length")
+        except BaseException:
+            self._truncate(start)
+            raise
+
+    def _truncate(self, length: int):
+        # Keeps the columns the same length when appending fails halfway.
+        del self.sample_ids[length:]
+        del self.timestamps[length:]
+
+    def save(self, path):
+        """Write the store to path, as a header and then the raw columns"""
+        with open(path, "wb") as f:
+            f.write(MAGIC + sys.byteorder[0].encode() + b"\0")
+            f.write(len(self).to_bytes(8, "little"))
+            f.write(self.sample_ids)
+            f.write(self.timestamps)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Map a store saved to path into memory: its columns are views of the
+        file, read by the OS page by page as they are used, instead of
+        arrays. They are copied into arrays on the first change.
+        """
+        with open(path, "rb") as f:
+            header = f.read(HEADER_SIZE)
+            if header[: len(MAGIC)] != MAGIC:
+                raise ValueError(f"{path} is not a saved MeasurementStore")
+            if header[len(MAGIC) : len(MAGIC) + 1] != sys.byteorder[0].encode():
+                raise ValueError(f"{path} was saved on a machine of another byte order")
+            count = int.from_bytes(header[len(MAGIC) + 2 :], "little")
+            size = HEADER_SIZE + 2 * 8 * count
+            if count == 0:
+                return cls()
+            mapped = mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ)
+
+        store = cls()
+        view = memoryview(mapped)
+        store.sample_ids = view[HEADER_SIZE : HEADER_SIZE + 8 * count].cast("q")
+        store.timestamps = view[HEADER_SIZE + 8 * count : size].cast("q")
+        store._mmap = mapped
+        return store
+
+    def own(self):
+        """Copy columns mapped from a file into arrays, so they can change"""
+        if self._mmap is None:
+            return
+        for name in ("sample_ids", "timestamps"):
+            column = array("q")
+            column.frombytes(getattr(self, name).cast("B"))
+            setattr(self, name, column)
+        self._mmap = None
@@ -1,33 +1,224 @@
-import random
+"""
+Memory benchmark of the Measurement representations.
+
+Every module is measured in a fresh process for every number of
+measurements N: the RSS growth and the memory traced by tracemalloc while
+building N measurements, and the time to build and to iterate over them.
+Timestamps are generated before anything is measured. The memory per
+measurement is the slope of the memory over N, which leaves out the fixed
+overhead of a process and the noise of a single N.
+"""
+
+import argparse
+import gc
 import importlib
-import sys
+import json
+import random
 import resource
-from datetime import datetime
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from array import array
+from pathlib import Path
+
+MODULES = ["m.py", "m_slots.py", "m_store.py"]
+SIZES = [100_000, 1_000_000, 10_000_000]
+
+
+def max_rss_bytes():
+    # Kilobytes on Linux, bytes on macOS.
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+def random_timestamps(n, seed=0):
+    """n Unix timestamps up to 2038, in an array of 8 bytes each"""
+    rng = random.Random(seed)
+    return array("q", (rng.getrandbits(31) for _ in range(n)))
+
+
+def build(module, timestamps):
+    if hasattr(module, "MeasurementStore"):
+        # Fill columns of measurements, without an object per measurement
+        return module.MeasurementStore(enumerate(timestamps))
+    # Create a list of Measurement objects
+    return [module.Measurement(i, t) for i, t in enumerate(timestamps)]
+
+
+def iterate(measurements):
+    for m in measurements:
+        m.sample_id
+        m.timestamp
+
+
+def measure(module_name, n, seed=0):
+    """
+    Build n measurements of module_name in this process, which should be
+    fresh, and return their memory and timings.
+    """
+    module = importlib.import_module(Path(module_name).stem)
+    timestamps = random_timestamps(n, seed)
+    gc.collect()
+
+    # The peak RSS only grows while building, so its growth is the memory
+    # of the measurements, as far as the allocator returns it to the OS.
+    rss_before = max_rss_bytes()
+    started = time.perf_counter()
+    measurements = build(module, timestamps)
+    build_seconds = time.perf_counter() - started
+    rss_after = max_rss_bytes()
+
+    started = time.perf_counter()
+    iterate(measurements)
+    iterate_seconds = time.perf_counter() - started
+    del measurements
+    gc.collect()
+
+    # Tracing slows allocations down, so it gets a build of its own.
+    tracemalloc.start()
+    measurements = build(module, timestamps)
+    traced, traced_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert len(measurements) == n
+
+    return {
+        "module": module_name,
+        "n": n,
+        "rss_bytes": rss_after - rss_before,
+        "traced_bytes": traced,
+        "traced_peak_bytes": traced_peak,
+        "build_seconds": build_seconds,
+        "iterate_seconds": iterate_seconds,
+    }
+
+
+def run_child(module_name, n, seed):
+    cmd = [sys.executable, __file__, module_name, "--child", str(n)]
+    cmd += ["--seed", str(seed)]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"{' '.join(cmd)} failed:\n{result.stderr}")
+    return json.loads(result.stdout)
+
 
-N = 10_000_000
+def fit(runs, key):
+    """Bytes per measurement and fixed bytes, from a line fit over N"""
+    if len(runs) < 2:
+        run = runs[0]
+        return {"per_measurement": run[key] / run["n"], "fixed": 0.0}
+    slope, intercept = statistics.linear_regression(
+        [run["n"] for run in runs], [run[key] for run in runs]
+    )
+    return {"per_measurement": slope, "fixed": intercept}
 
 
-def random_timestamp():
-    return random.randint(0, int(datetime.now().timestamp()))
+def print_table(headers, rows):
+    """Print rows as a Markdown table"""
+    cols = list(zip(*([headers] + rows)))
+    widths = [max(len(cell) for cell in col) for col in cols]
+    sep = "|" + "|".join("-" * (w + 2) for w in widths) + "|"
+    fmt = "|" + "|".join(" {:<" + str(w) + "} " for w in widths) + "|"
+    print(fmt.format(*headers))
+    print(sep)
+    for row in rows:
+        print(fmt.format(*row))
 
 
-if len(sys.argv) != 2:
-    print(f"Usage: {sys.argv[0]} <module-to-test>")
-    sys.exit(1)
+def print_report(report):
+    print_table(
+        ["Module", "N", "Traced", "RSS", "Build", "Iterate"],
+        [
+            [
+                run["module"],
+                f"{run['n']:_}",
+                f"{run['traced_bytes'] / run['n']:.1f} B",
+                f"{run['rss_bytes'] / run['n']:.1f} B",
+                f"{run['build_seconds'] * 1e9 / run['n']:.0f} ns",
+                f"{run['iterate_seconds'] * 1e9 / run['n']:.0f} ns",
+            ]
+            for run in report["runs"]
+        ],
+    )
+    print()
 
-module_name = sys.argv[1].replace(".py", "")
-module = importlib.import_module(module_name)
+    base = report["summary"][0]["traced"]["per_measurement"]
+    print_table(
+        ["Module", "Traced per measurement", "RSS per measurement", "Fixed", "Saved"],
+        [
+            [
+                summary["module"],
+                f"{summary['traced']['per_measurement']:.1f} B",
+                f"{summary['rss']['per_measurement']:.1f} B",
+                f"{summary['traced']['fixed'] / 1024:.0f} KB",
+                f"{1 - summary['traced']['per_measurement'] / base:.0%}",
+            ]
+            for summary in report["summary"]
+        ],
+    )
 
 
-mem_init = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "modules",
+        nargs="*",
+        default=MODULES,
+        help=f"Modules defining Measurement or MeasurementStore (default: "
+        f"{' '.join(MODULES)})",
+    )
+    parser.add_argument(
+        "--sizes",
+        type=lambda value: [int(n) for n in value.split(",")],
+        default=SIZES,
+        help="Comma separated numbers of measurements (default: "
+        f"{','.join(f'{n:_}' for n in SIZES)})",
+    )
+    parser.add_argument(
+        "--json",
+        default=".cache/mem_test.json",
+        help="File to write the results to (default: .cache/mem_test.json)",
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    # Measures a single module and N in this process, for the runs above.
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
 
-# Create a list of Measurement objects
-measurements = [module.Measurement(i, random_timestamp()) for i in range(N)]
+    if args.child is not None:
+        print(json.dumps(measure(args.modules[0], args.child, args.seed)))
+        return
 
-mem_final = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    runs = []
+    for module_name in args.modules:
+        for n in args.sizes:
+            print(f"Measuring {module_name} with {n:_} measurements...")
+            runs.append(run_child(module_name, n, args.seed))
+    summary = []
+    for module_name in args.modules:
+        module_runs = [run for run in runs if run["module"] == module_name]
+        summary.append(
+            {
+                "module": module_name,
+                "traced": fit(module_runs, "traced_bytes"),
+                "rss": fit(module_runs, "rss_bytes"),
+            }
+        )
+    report = {
+        "python": sys.version,
+        "platform": sys.platform,
+        "sizes": args.sizes,
+        "seed": args.seed,
+        "runs": runs,
+        "summary": summary,
+    }
+    Path(args.json).parent.mkdir(parents=True, exist_ok=True)
+    Path(args.json).write_text(json.dumps(report, indent=2))
+    print()
+    print_report(report)
 
-mem_consumption = mem_final - mem_init
 
-print(f"Initial RAM usage: {mem_init:_} KB")
-print(f"Final RAM usage: {mem_final:_} KB")
-print(f"Memory consumption: {mem_consumption:_} KB")
+if __name__ == "__main__":
+    main()
@@ -3,80 +3,172 @@
 # requires-python = ">=3.14"
 # ///
 
-"""Simple Python GIL vs No-GIL Benchmark"""
+"""Python GIL vs No-GIL Benchmark, across execution backends and workers"""
 
+import argparse
+import datetime
+import json
+import math
+import os
+import platform
+import statistics
 import subprocess
-import re
+import sys
+import tempfile
+import time
 
 SCRIPT_NAME = "is_prime.py"
-RUNS = 3
-
-
-def run_test(python_version):
-    cmd = ["gtime", "-v", "uv", "run", "-p", python_version, SCRIPT_NAME]
-    result = subprocess.run(cmd, capture_output=True, text=True)
-    out = result.stderr
-
-    # Wall time: “Elapsed ... time ... : 0:00.26”
-    m = re.search(r"Elapsed.*?:\s*(\d+):(\d+)\.(\d+)", out)
-    if m:
-        min_, sec, cs = map(int, m.groups())
-        wall = min_ * 60 + sec + cs / 100
-    else:
-        raise ValueError("Could not parse wall time")
-
-    # CPU: “Percent of CPU this job got: 93%”
-    cpu = int(re.search(r"Percent of CPU this job got:\s*(\d+)%", out).group(1))
-
-    # Memory: “Maximum resident set size (kbytes): 19008”
-    kb = int(re.search(r"Maximum resident set size.*?:\s*(\d+)", out).group(1))
-    mem = kb / 1024
-
-    return wall, cpu, mem
-
-
-def run_benchmark(ver, label):
-    print(f"Testing {label}...")
-    walls, cpus, mems = [], [], []
-    for i in range(RUNS):
-        w, c, m = run_test(ver)
-        walls.append(w)
-        cpus.append(c)
-        mems.append(m)
-        print(f"  Run {i+1}: {w:.2f}s, {c:3d}%, {m:5.1f}MB")
-    return sum(walls) / RUNS, sum(cpus) / RUNS, sum(mems) / RUNS
-
-
-def main():
-    gil = run_benchmark("3.14", "Python 3.14 (GIL)")
-    nogil = run_benchmark("3.14t", "Python 3.14t (No GIL)")
-
-    speedup = gil[0] / nogil[0]
-    cpu_gain = nogil[1] / gil[1]
-    mem_gain = nogil[2] / gil[2]
-
-    headers = ["Metric", "Python 3.14 (GIL)", "Python 3.14t (No GIL)", "Improvement"]
-    rows = [
-        [
-            "**Wall Time**",
-            f"{gil[0]:5.2f} s",
-            f"{nogil[0]:6.2f} s",
-            f"**{speedup:.2f}× faster**",
-        ],
-        [
-            "**CPU Usage**",
-            f"{gil[1]:6.0f} %",
-            f"{nogil[1]:6.0f} %",
-            f"**{cpu_gain:.1f}× cores**",
-        ],
-        [
-            "**Memory Usage**",
-            f"{gil[2]:6.1f} MB",
-            f"{nogil[2]:6.1f} MB",
-            f"**{mem_gain:.2f}× overhead**",
-        ],
+PYTHONS = {"3.14": "Python 3.14 (GIL)", "3.14t": "Python 3.14t (No GIL)"}
+BACKENDS = ["thread-per-number", "serial", "threads", "processes", "interpreters"]
+# Backends without a pool run the same way whatever the number of workers.
+POOL_BACKENDS = ["threads", "processes", "interpreters"]
+ENGINES = ["trial", "wheel", "miller-rabin", "fast"]
+
+# Runs of every configuration: discarded warmups, then repeated until the 95%
+# confidence interval of the mean wall time is within CI_TARGET of the mean,
+# or MAX_RUNS or MAX_SECONDS of runs are reached.
+WARMUP = 1
+MIN_RUNS = 3
+MAX_RUNS = 20
+CI_TARGET = 0.02
+MAX_SECONDS = 600.0
+# Two sided 95% quantiles of Student's t distribution by degrees of freedom,
+# the normal quantile past the table.
+T_95 = [12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228]
+T_95 += [2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086]
+T_95 += [2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042]
+Z_95 = 1.960
+
+
+def worker_counts():
+    """1, 2, 4, ... up to the number of cores, which is always included"""
+    cores = os.cpu_count() or 1
+    counts = []
+    n = 1
+    while n < cores:
+        counts.append(n)
+        n *= 2
+    return counts + [cores]
+
+
+def max_rss_bytes(usage):
+    # Kilobytes on Linux, bytes on macOS.
+    rss = usage.ru_maxrss
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+def measure(cmd):
+    """
+    Run cmd once and return its wall time and CPU time in seconds and its
+    peak resident set size in bytes. The resource usage of a child includes
+    the children it waited for, like the interpreter that uv starts.
+    Raises RuntimeError with the output of cmd if it fails.
+    """
+    with tempfile.TemporaryFile() as output:
+        started = time.perf_counter()
+        proc = subprocess.Popen(cmd, stdout=output, stderr=subprocess.STDOUT)
+        _, status, usage = os.wait4(proc.pid, 0)
+        wall = time.perf_counter() - started
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        if proc.returncode != 0:
+            output.seek(0)
+            text = output.read().decode(errors="replace")
+            raise RuntimeError(f"{' '.join(cmd)} failed:\n{text}")
+    return {
+        "wall": wall,
+        "cpu": usage.ru_utime + usage.ru_stime,
+        "rss": max_rss_bytes(usage),
+    }
+
+
+def summarize(values):
+    """Mean, median, p95, standard deviation and 95% confidence interval"""
+    n = len(values)
+    mean = statistics.fmean(values)
+    stdev = statistics.stdev(values) if n > 1 else 0.0
+    t = T_95[n - 2] if 1 < n <= len(T_95) + 1 else Z_95
+    p95 = statistics.quantiles(values, n=20, method="inclusive")[-1] if n > 1 else mean
+    return {
+        "n": n,
+        "mean": mean,
+        "median": statistics.median(values),
+        "p95": p95,
+        "stdev": stdev,
+        "min": min(values),
+        "max": max(values),
+        "ci95": t * stdev / math.sqrt(n),
+    }
+
+
+def benchmark_command(
+    cmd,
+    warmup=WARMUP,
+    min_runs=MIN_RUNS,
+    max_runs=MAX_RUNS,
+    ci_target=CI_TARGET,
+    max_seconds=MAX_SECONDS,
+    log=print,
+):
+    """
+    Run cmd warmup times, then at least min_runs times and until the 95%
+    confidence interval of the wall time is within ci_target of its mean,
+    or max_runs runs or max_seconds of runs. Returns the runs, a summary of
+    their wall time, CPU time, CPU usage and peak RSS, and whether the
+    interval reached its target.
+    """
+    for i in range(warmup):
+        run = measure(cmd)
+        log(f"  Warmup {i + 1}: {run['wall']:.2f}s")
+
+    runs = []
+    started = time.perf_counter()
+    while True:
+        run = measure(cmd)
+        run["cpu_percent"] = 100 * run["cpu"] / run["wall"]
+        runs.append(run)
+        log(
+            f"  Run {len(runs)}: {run['wall']:.2f}s, {run['cpu_percent']:3.0f}%, "
+            f"{run['rss'] / 2**20:5.1f}MB"
+        )
+        wall = summarize([r["wall"] for r in runs])
+        converged = len(runs) > 1 and wall["ci95"] <= ci_target * wall["mean"]
+        if len(runs) >= min_runs and converged:
+            break
+        if len(runs) >= max_runs or time.perf_counter() - started > max_seconds:
+            break
+
+    return {
+        "runs": runs,
+        "converged": converged,
+        "stats": {
+            key: summarize([r[key] for r in runs])
+            for key in ("wall", "cpu", "cpu_percent", "rss")
+        },
+    }
+
+
+def is_prime_command(python_version, backend, workers, engine="trial"):
+    return [
+        "uv",
+        "run",
+        "-p",
+        python_version,
+        SCRIPT_NAME,
+        "--backend",
+        backend,
+        "--workers",
+        str(workers),
+        "--engine",
+        engine,
     ]
 
+
+def config_key(result):
+    return (result["python"], result["engine"], result["backend"], result["workers"])
+
+
+def print_table(headers, rows):
+    """Print rows as a Markdown table"""
     # Compute column widths using headers and all rows
     cols = list(zip(*([headers] + rows)))
     widths = [max(len(cell) for cell in col) for col in cols]
@@ -92,5 +184,162 @@ def main():
         print(fmt.format(*row))
 
 
+def print_results(results, baseline=None):
+    """
+    Print the results as a Markdown table, with speedups against the first
+    configuration and, given the results of an earlier benchmark, the change
+    of the median wall time of the same configurations.
+    """
+    # Speedups are against the first configuration, by default the GIL build
+    # running the original trial division on a thread per number.
+    base = results[0]["stats"]["wall"]["median"]
+    previous = {config_key(r): r["stats"]["wall"]["median"] for r in baseline or []}
+    headers = [
+        "Python",
+        "Engine",
+        "Backend",
+        "Workers",
+        "Wall Time",
+        "± 95% CI",
+        "p95",
+        "CPU Usage",
+        "Memory",
+        "Speedup",
+    ]
+    if baseline is not None:
+        headers.append("vs Baseline")
+    rows = []
+    for result in results:
+        wall = result["stats"]["wall"]
+        row = [
+            PYTHONS.get(result["python"], result["python"]),
+            result["engine"],
+            result["backend"],
+            str(result["workers"]) if result["backend"] in POOL_BACKENDS else "-",
+            f"{wall['median']:6.2f} s",
+            f"{wall['ci95']:5.2f} s" + ("" if result["converged"] else " *"),
+            f"{wall['p95']:6.2f} s",
+            f"{result['stats']['cpu_percent']['median']:6.0f} %",
+            f"{result['stats']['rss']['median'] / 2**20:6.1f} MB",
+            f"**{base / wall['median']:.2f}×**",
+        ]
+        if baseline is not None:
+            old = previous.get(config_key(result))
+            row.append(f"{wall['median'] / old - 1:+.1%}" if old else "-")
+        rows.append(row)
+    print_table(headers, rows)
+    if not all(result["converged"] for result in results):
+        print("\n\\* The confidence interval did not reach its target.")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--backends",
+        default=",".join(BACKENDS),
+        help="Comma separated backends of is_prime.py to compare",
+    )
+    parser.add_argument(
+        "--workers",
+        default=",".join(map(str, worker_counts())),
+        help="Comma separated numbers of workers for the pool backends",
+    )
+    parser.add_argument(
+        "--engines",
+        default="trial",
+        help=f"Comma separated engines of is_prime.py, of {','.join(ENGINES)}",
+    )
+    parser.add_argument(
+        "--pythons",
+        default=",".join(PYTHONS),
+        help="Comma separated Python versions for uv to run",
+    )
+    parser.add_argument(
+        "--warmup", type=int, default=WARMUP, help="Discarded runs per configuration"
+    )
+    parser.add_argument(
+        "--min-runs", type=int, default=MIN_RUNS, help="Minimum measured runs"
+    )
+    parser.add_argument(
+        "--max-runs", type=int, default=MAX_RUNS, help="Maximum measured runs"
+    )
+    parser.add_argument(
+        "--ci",
+        type=float,
+        default=CI_TARGET,
+        help="Target half width of the 95%% confidence interval of the wall "
+        "time, relative to its mean",
+    )
+    parser.add_argument(
+        "--max-time",
+        type=float,
+        default=MAX_SECONDS,
+        help="Seconds of measured runs after which a configuration stops",
+    )
+    parser.add_argument("--json", help="Write the results to this JSON file")
+    parser.add_argument(
+        "--compare", help="JSON file of an earlier benchmark to compare against"
+    )
+    args = parser.parse_args(argv)
+    backends = args.backends.split(",")
+    engines = args.engines.split(",")
+    counts = [int(n) for n in args.workers.split(",")]
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+
+    results = []
+    for ver in args.pythons.split(","):
+        label = PYTHONS.get(ver, ver)
+        for engine in engines:
+            for backend in backends:
+                for workers in counts if backend in POOL_BACKENDS else [max(counts)]:
+                    print(
+                        f"Testing {label}, {engine} on {backend} "
+                        f"with {workers} worker(s)..."
+                    )
+                    result = benchmark_command(
+                        is_prime_command(ver, backend, workers, engine),
+                        args.warmup,
+                        args.min_runs,
+                        args.max_runs,
+                        args.ci,
+                        args.max_time,
+                    )
+                    results.append(
+                        {
+                            "python": ver,
+                            "engine": engine,
+                            "backend": backend,
+                            "workers": workers,
+                            **result,
+                        }
+                    )
+
+    if args.json:
+        report = {
+            "created": datetime.datetime.now().isoformat(timespec="seconds"),
+            "machine": {
+                "platform": platform.platform(),
+                "processor": platform.processor() or platform.machine(),
+                "cpus": os.cpu_count(),
+            },
+            "settings": {
+                "warmup": args.warmup,
+                "min_runs": args.min_runs,
+                "max_runs": args.max_runs,
+                "ci": args.ci,
+                "max_time": args.max_time,
+            },
+            "results": results,
+        }
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    print_results(results, baseline)
+
+
 if __name__ == "__main__":
+    if not hasattr(os, "wait4"):
+        sys.exit("benchmark.py needs os.wait4, which this platform lacks")
     main()
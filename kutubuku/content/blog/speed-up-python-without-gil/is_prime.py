@@ -1,9 +1,17 @@
 #!/usr/bin/env -S uv run --script
 # /// script
 # requires-python = ">=3.14"
+# dependencies = [
+#   "numpy",
+# ]
 # ///
 
+import sys
+import argparse
+import concurrent.futures
 import math
+import os
+import time
 from threading import Thread
 
 PRIME_TEST_CASES = [
@@ -41,6 +49,13 @@ PRIME_TEST_CASES = [
 
 NUMBERS = [n for n, _ in PRIME_TEST_CASES]
 
+BACKENDS = ["thread-per-number", "serial", "threads", "processes", "interpreters"]
+# Chunks per worker: more chunks balance the load better, fewer cost less
+# scheduling.
+CHUNKS_PER_WORKER = 8
+# Smallest number of divisors in a chunk, so small numbers are not split.
+MIN_CHUNK = 1 << 16
+
 
 def is_prime(n: int) -> bool:
     if n < 2:
@@ -57,36 +72,358 @@ def is_prime(n: int) -> bool:
     return True
 
 
+# The wheel of 2·3·5·7: every prime above 7 is 210k plus one of these 48
+# spokes, so trial division skips 77% of the odd candidates.
+WHEEL_PRIMES = (2, 3, 5, 7)
+WHEEL = 2 * 3 * 5 * 7
+WHEEL_SPOKES = [r for r in range(1, WHEEL + 1) if math.gcd(r, WHEEL) == 1]
+# Number of divisors on the wheel tried one spoke after the other.
+WHEEL_BLOCK = WHEEL * 256
+# Trial division starts at the first prime after the wheel primes.
+FIRST_DIVISOR = 11
+# Below this, trial division on the wheel takes fewer steps than the
+# rounds of Miller–Rabin.
+WHEEL_LIMIT = 1 << 20
+# Bases for which Miller–Rabin is deterministic below 2**64, and the first
+# 13 primes, for which it is deterministic below 3.3·10**24. Above that the
+# test only tells probable primes.
+MILLER_RABIN_BASES_64 = (2, 325, 9375, 28178, 450775, 9780504, 1795265022)
+MILLER_RABIN_BASES = (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41)
+# Numbers per segment of the sieve, small enough for the CPU cache.
+SEGMENT_SIZE = 1 << 18
+# Numbers of a sieved range checked against Miller–Rabin.
+VERIFY_SAMPLE = 10_000
+
+
+def quick_check(n: int) -> bool | None:
+    """Return whether n is prime if dividing by 2, 3, 5 and 7 tells, else None"""
+    if n < 2:
+        return False
+    for p in WHEEL_PRIMES:
+        if n % p == 0:
+            return n == p
+    if n < FIRST_DIVISOR * FIRST_DIVISOR:
+        return True
+    return None
+
+
+def has_divisor(n: int, start: int, stop: int) -> bool:
+    """Whether n has an odd divisor in [start, stop), start being odd"""
+    for i in range(start, stop, 2):
+        if n % i == 0:
+            return True
+    return False
+
+
+def has_wheel_divisor(n: int, start: int, stop: int) -> bool:
+    """Whether n has a divisor on the wheel in [start, stop), start above 1"""
+    # Every spoke is a plain range, as cheap per divisor as has_divisor, over
+    # blocks of the divisors so that small divisors are still tried first.
+    for lo in range(start - start % WHEEL, stop, WHEEL_BLOCK):
+        hi = min(lo + WHEEL_BLOCK, stop)
+        for spoke in WHEEL_SPOKES:
+            first = lo + spoke if lo + spoke >= start else lo + spoke + WHEEL
+            for d in range(first, hi, WHEEL):
+                if n % d == 0:
+                    return True
+    return False
+
+
+def is_prime_wheel(n: int) -> bool:
+    prime = quick_check(n)
+    if prime is not None:
+        return prime
+    return not has_wheel_divisor(n, FIRST_DIVISOR, math.isqrt(n) + 1)
+
+
+def is_prime_miller_rabin(n: int) -> bool:
+    prime = quick_check(n)
+    if prime is not None:
+        return prime
+    d, s = n - 1, 0
+    while d % 2 == 0:
+        d //= 2
+        s += 1
+    bases = MILLER_RABIN_BASES_64 if n < 1 << 64 else MILLER_RABIN_BASES
+    for a in bases:
+        a %= n
+        if a == 0:
+            continue
+        x = pow(a, d, n)
+        if x == 1 or x == n - 1:
+            continue
+        for _ in range(s - 1):
+            x = x * x % n
+            if x == n - 1:
+                break
+        else:
+            return False
+    return True
+
+
+def is_prime_fast(n: int) -> bool:
+    """The wheel for small n, deterministic Miller–Rabin for the others"""
+    if n < WHEEL_LIMIT:
+        return is_prime_wheel(n)
+    return is_prime_miller_rabin(n)
+
+
+ENGINES = {
+    "trial": is_prime,
+    "wheel": is_prime_wheel,
+    "miller-rabin": is_prime_miller_rabin,
+    "fast": is_prime_fast,
+}
+# Engines dividing by every candidate up to √n, whose work is split in
+# ranges of divisors, and the fraction of the integers they divide by.
+RANGE_ENGINES = {
+    "trial": (has_divisor, 1 / 2),
+    "wheel": (has_wheel_divisor, len(WHEEL_SPOKES) / WHEEL),
+}
+
+
+def small_primes(limit):
+    """Primes up to limit, by a NumPy sieve of Eratosthenes"""
+    import numpy as np
+
+    sieve = np.ones(limit + 1, dtype=bool)
+    sieve[:2] = False
+    for p in range(2, math.isqrt(limit) + 1):
+        if sieve[p]:
+            sieve[p * p :: p] = False
+    return np.flatnonzero(sieve)
+
+
+def primes_between(start, stop, segment_size=SEGMENT_SIZE):
+    """
+    Primes in [start, stop) as a NumPy array, by a segmented sieve: the
+    range is sieved one segment at a time with the primes up to √stop. A
+    prime below the segment size strikes its multiples in one slice
+    assignment, the larger ones strike at most one number per segment and
+    are done all at once.
+    """
+    # Imported here, so the other engines are measured without NumPy.
+    import numpy as np
+
+    start = max(start, 2)
+    base = small_primes(math.isqrt(max(stop - 1, 0))).astype(np.int64)
+    small = base[base < segment_size].tolist()
+    large = base[base >= segment_size]
+    found = []
+    for lo in range(start, stop, segment_size):
+        hi = min(lo + segment_size, stop)
+        segment = np.ones(hi - lo, dtype=bool)
+        for p in small:
+            if p * p >= hi:
+                break
+            first = max(p * p, -(-lo // p) * p)
+            segment[first - lo :: p] = False
+        first = np.maximum(large * large, -(-lo // large) * large)
+        segment[first[first < hi] - lo] = False
+        found.append(np.flatnonzero(segment) + lo)
+    return np.concatenate(found) if found else np.array([], dtype=np.int64)
+
+
+def plan_chunks(numbers, chunks, engine="trial"):
+    """
+    Split the trial division of every number into (n, start, stop) ranges of
+    divisors with about the same estimated cost.
+
+    The cost of a number is the number of candidates up to √n it is divided
+    by: half of them for trial division, 48 in 210 for the wheel. Each
+    range gets an equal share of the total cost, so a large prime is spread
+    over every worker instead of deciding the wall time alone. Ranges are
+    ordered by their first divisor, so the small factors of composites are
+    found first and the rest of their ranges can be skipped.
+    """
+    density = RANGE_ENGINES[engine][1]
+    stops = {n: math.isqrt(n) + 1 for n in numbers if quick_check(n) is None}
+    cost = sum(max(0, stop - FIRST_DIVISOR) * density for stop in stops.values())
+    # A multiple of the wheel, so ranges start on odd numbers and spokes.
+    width = max(MIN_CHUNK, cost / max(1, chunks)) / density
+    width = max(1, round(width / WHEEL)) * WHEEL
+    tasks = []
+    for n, stop in stops.items():
+        for start in range(FIRST_DIVISOR, stop, width):
+            tasks.append((n, start, min(start + width, stop)))
+    tasks.sort(key=lambda task: (task[1], task[0]))
+    return tasks
+
+
+def check_batch(engine, numbers):
+    return [ENGINES[engine](n) for n in numbers]
+
+
+def make_executor(backend, workers):
+    if backend == "threads":
+        return concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+    if backend == "processes":
+        return concurrent.futures.ProcessPoolExecutor(max_workers=workers)
+    if backend == "interpreters":
+        # Python 3.14+: one subinterpreter, with its own GIL, per worker.
+        return concurrent.futures.InterpreterPoolExecutor(max_workers=workers)
+    raise ValueError(f"Unknown backend: {backend}")
+
+
+def run_tasks(tasks, backend, workers, skip):
+    """
+    Run tasks, (function, *args) tuples, on backend and yield (task, result)
+    as they complete. Tasks for which skip(task) became true are not run.
+    """
+    if backend == "serial":
+        for task in tasks:
+            if not skip(task):
+                yield task, task[0](*task[1:])
+        return
+
+    with make_executor(backend, workers) as executor:
+        futures = {executor.submit(*task): task for task in tasks}
+        for future in concurrent.futures.as_completed(futures):
+            if future.cancelled():
+                continue
+            yield futures[future], future.result()
+            for other, task in futures.items():
+                if skip(task):
+                    other.cancel()
+
+
+def check_numbers(numbers, backend="threads", workers=None, engine="trial"):
+    """
+    Return {n: is n prime} for numbers, checked by engine on backend with
+    workers workers. Trial division and the wheel run the ranges planned by
+    plan_chunks, the other engines take about the same time for every
+    number and run in batches of numbers.
+    """
+    workers = workers or os.cpu_count() or 1
+    chunks = workers * CHUNKS_PER_WORKER
+    results = {n: quick_check(n) for n in numbers}
+    if engine in RANGE_ENGINES:
+        divisor = RANGE_ENGINES[engine][0]
+        tasks = [(divisor, *task) for task in plan_chunks(numbers, chunks, engine)]
+    else:
+        pending = [n for n in numbers if results[n] is None]
+        tasks = [
+            (check_batch, engine, pending[i::chunks])
+            for i in range(min(chunks, len(pending)))
+        ]
+
+    def decided(task):
+        return engine in RANGE_ENGINES and results[task[1]] is not None
+
+    for task, result in run_tasks(tasks, backend, workers, decided):
+        if engine in RANGE_ENGINES:
+            if result:
+                results[task[1]] = False
+        else:
+            results.update(zip(task[2], result))
+
+    return {n: True if prime is None else prime for n, prime in results.items()}
+
+
 class IsPrimeWorker:
-    def __init__(self, n):
+    def __init__(self, n, check=is_prime):
         self.n = n
         self.name = hash(n)
         self.result = None
+        self.check = check
 
     def run(self):
-        self.result = is_prime(self.n)
+        self.result = self.check(self.n)
 
     @classmethod
-    def create_workers(cls):
-        return [cls(n) for n in NUMBERS]
+    def create_workers(cls, check=is_prime):
+        return [cls(n, check) for n in NUMBERS]
 
 
-def main():
-    workers = IsPrimeWorker.create_workers()
+def run_thread_per_number(engine="trial"):
+    """The original approach: one thread per number, no chunks and no pool"""
+    workers = IsPrimeWorker.create_workers(ENGINES[engine])
     threads = [Thread(target=worker.run) for worker in workers]
     for t in threads:
         t.start()
     for t in threads:
         t.join()
+    return {worker.n: worker.result for worker in workers}
+
+
+def sieve_range(start, stop):
+    """Sieve [start, stop) and check a sample of it against Miller–Rabin"""
+    import numpy as np
+
+    started = time.perf_counter()
+    primes = primes_between(start, stop)
+    elapsed = time.perf_counter() - started
+    print(f"Found {len(primes)} primes in [{start}, {stop}) in {elapsed:.2f}s")
+
+    print("Verifying against Miller–Rabin...")
+    step = max(1, (stop - start) // VERIFY_SAMPLE)
+    sample = np.arange(start, stop, step, dtype=np.int64)
+    sieved = np.isin(sample, primes)
+    for n, prime in zip(sample.tolist(), sieved.tolist()):
+        assert prime == is_prime_miller_rabin(n), f"Sieve is wrong about {n}"
+    print(f"All {len(sample)} sampled numbers agree!")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check the primality of NUMBERS")
+    parser.add_argument(
+        "--backend",
+        choices=BACKENDS,
+        default="thread-per-number",
+        help="How to run the checks (default: thread-per-number)",
+    )
+    parser.add_argument(
+        "--engine",
+        choices=ENGINES,
+        default="trial",
+        help="How to check a number (default: trial, the original trial division)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Number of workers of the pool backends (default: all cores)",
+    )
+    parser.add_argument(
+        "--range",
+        type=int,
+        nargs=2,
+        metavar=("START", "STOP"),
+        help="Find the primes in [START, STOP) with a NumPy segmented sieve instead",
+    )
+    args = parser.parse_args(argv)
+    if args.backend == "interpreters" and not hasattr(
+        concurrent.futures, "InterpreterPoolExecutor"
+    ):
+        parser.error("the interpreters backend needs Python 3.14 or later")
+    if args.range:
+        sieve_range(*args.range)
+        return
+
+    started = time.perf_counter()
+    if args.backend == "thread-per-number":
+        results = run_thread_per_number(args.engine)
+    else:
+        results = check_numbers(NUMBERS, args.backend, args.workers, args.engine)
+    elapsed = time.perf_counter() - started
+    print(
+        f"Checked {len(NUMBERS)} numbers with {args.engine} on {args.backend} "
+        f"in {elapsed:.2f}s"
+    )
 
     # Check results
     print("Verifying results...")
-    for (n, expected), worker in zip(PRIME_TEST_CASES, workers):
+    for n, expected in PRIME_TEST_CASES:
         assert (
-            worker.result == expected
-        ), f"Expected {n} to be {'prime' if expected else 'not prime'}, got {worker.result}"
+            results[n] == expected
+        ), f"Expected {n} to be {'prime' if expected else 'not prime'}, got {results[n]}"
     print(f"All {len(PRIME_TEST_CASES)} tests passed!")
 
 
 if __name__ == "__main__":
+    # Run from the module rather than __main__, so process and interpreter
+    # workers can unpickle the tasks by their module name.
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from is_prime import main
+
     main()
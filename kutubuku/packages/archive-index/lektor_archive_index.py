@@ -0,0 +1,630 @@
+import datetime
+import hashlib
+import json
+import posixpath
+from weakref import WeakKeyDictionary
+
+from jinja2 import is_undefined
+from lektor.build_programs import BuildProgram
+from lektor.context import get_ctx
+from lektor.db import Page
+from lektor.markdown import Markdown
+from lektor.pluginsystem import Plugin
+from lektor.sourceobj import VirtualSourceObject
+from lektor.utils import build_url, slugify
+
+BLOG_PATH = "/blog"
+VIRTUAL_PREFIX = "archive"
+TEMPLATE = "blog.html"
+FEED_NAME = "feed.json"
+FEED_VERSION = "https://jsonfeed.org/version/1.1"
+FEED_ITEMS = 20
+API_PATH = "api"
+API_VERSION = 1
+API_PER_PAGE = 100
+# Listings by kind: every post, the posts of a year and the posts with a tag.
+KINDS = ("blog", "year", "tag")
+
+
+def post_tags(post):
+    return [tag for tag in post["tags"] or () if tag]
+
+
+def checksum(value):
+    return hashlib.sha1(json.dumps(value, default=str).encode()).hexdigest()
+
+
+def public_url(pad, url_path):
+    """
+    URL of url_path for readers outside of the site, like feed readers and
+    API consumers: with the domain if the project configures one.
+    """
+    external = bool(pad.db.config.base_url)
+    return pad.make_url(url_path, absolute=not external, external=external)
+
+
+def is_post(source):
+    return isinstance(source, Page) and posixpath.dirname(source.path) == BLOG_PATH
+
+
+def encode_document(document):
+    return json.dumps(document, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def post_document(post):
+    """
+    API document of a blog post: every field of its model, with dates in
+    ISO format, Markdown as its source and the main image as a URL, plus
+    its slug, URL and word count.
+    """
+    document = {"slug": post["_slug"], "url": public_url(post.pad, post.url_path)}
+    for field in post.datamodel.fields:
+        value = post[field.name]
+        if is_undefined(value):
+            value = None
+        elif isinstance(value, Markdown):
+            value = value.source
+        elif isinstance(value, datetime.date):
+            value = value.isoformat()
+        document[field.name] = value
+    if document.get("main_image"):
+        document["main_image"] = public_url(
+            post.pad, posixpath.join(post.url_path, document["main_image"])
+        )
+    document["word_count"] = len((document.get("body") or "").split())
+    return document
+
+
+def api_item(post):
+    """
+    Entry of a post in the API index, with the content hash of its document
+    so consumers only fetch documents whose hash changed.
+    """
+    document = post_document(post)
+    return {
+        "slug": document["slug"],
+        "title": document.get("title"),
+        "pub_date": document.get("pub_date"),
+        "main_image": document.get("main_image"),
+        "word_count": document["word_count"],
+        "url": document["url"],
+        "api": public_url(post.pad, ApiPost(post).url_path),
+        "hash": hashlib.sha1(encode_document(document)).hexdigest(),
+    }
+
+
+class ArchiveIndex:
+    """
+    Metadata of the blog posts, sorted once in the order of the blog and
+    grouped by year and tag, so listing pages slice it instead of querying
+    and sorting all children of the blog again for every page.
+    """
+
+    def __init__(self, posts, per_page):
+        self.posts = list(posts)
+        self.per_page = per_page
+        self.years = {}
+        tags = {}
+        self.tag_names = {}
+        for post in self.posts:
+            if post["pub_date"]:
+                self.years.setdefault(post["pub_date"].year, []).append(post)
+            for tag in post_tags(post):
+                slug = slugify(tag)
+                self.tag_names.setdefault(slug, tag)
+                tags.setdefault(slug, []).append(post)
+        self.tags = dict(sorted(tags.items()))
+        self.checksums = {}
+        self._api_items = None
+
+    @classmethod
+    def from_blog(cls, blog):
+        return cls(blog.children, blog.datamodel.pagination_config.per_page)
+
+    def listing(self, kind, key=None):
+        if kind == "year":
+            return self.years.get(key, [])
+        if kind == "tag":
+            return self.tags.get(key, [])
+        return self.posts
+
+    def count_pages(self, kind, key=None):
+        # Like Lektor, an empty listing still has a first page.
+        return max(1, -(-len(self.listing(kind, key)) // self.per_page))
+
+    def items(self, kind, key, page):
+        start = (page - 1) * self.per_page
+        return self.listing(kind, key)[start : start + self.per_page]
+
+    def iter_listings(self):
+        yield "blog", None
+        for year in self.years:
+            yield "year", year
+        for slug in self.tags:
+            yield "tag", slug
+
+    def page_checksum(self, kind, key, page):
+        """
+        Checksum of everything a listing page shows: its posts, the number
+        of pages and the year and tag navigation. Pages are rebuilt only
+        when it changes, not whenever any post changes.
+        """
+        cache_key = (kind, key, page)
+        if cache_key not in self.checksums:
+            self.checksums[cache_key] = checksum(
+                [
+                    [
+                        [post.path, post["title"], post["pub_date"], post_tags(post)]
+                        for post in self.items(kind, key, page)
+                    ],
+                    self.count_pages(kind, key),
+                    list(self.years),
+                    self.tag_names,
+                ]
+            )
+        return self.checksums[cache_key]
+
+    def api_items(self):
+        if self._api_items is None:
+            self._api_items = [api_item(post) for post in self.posts]
+        return self._api_items
+
+    def count_api_pages(self):
+        return max(1, -(-len(self.posts) // API_PER_PAGE))
+
+    def api_page_items(self, page):
+        start = (page - 1) * API_PER_PAGE
+        return self.api_items()[start : start + API_PER_PAGE]
+
+    def feed_items(self):
+        return self.posts[:FEED_ITEMS]
+
+    def feed_checksum(self):
+        if "feed" not in self.checksums:
+            self.checksums["feed"] = checksum(
+                [
+                    [
+                        post.path,
+                        post["title"],
+                        post["pub_date"],
+                        post_tags(post),
+                        post["main_image"],
+                        post["body"].source,
+                    ]
+                    for post in self.feed_items()
+                ]
+            )
+        return self.checksums["feed"]
+
+
+class ArchivePage(VirtualSourceObject):
+    """
+    Page of a listing of blog posts. The first page of the listing of every
+    post is the blog itself, built by Lektor from the same template.
+    """
+
+    def __init__(self, record, kind, key=None, page=1):
+        super().__init__(record)
+        self.kind = kind
+        self.key = key
+        self.page = page
+
+    @property
+    def path(self):
+        pieces = [self.kind] + ([str(self.key)] if self.kind != "blog" else [])
+        return f"{self.record.path}@{VIRTUAL_PREFIX}/{'/'.join(pieces)}/{self.page}"
+
+    @property
+    def url_path(self):
+        pieces = [self.record.url_path]
+        if self.kind == "year":
+            pieces.append(str(self.key))
+        elif self.kind == "tag":
+            pieces += ["tag", self.key]
+        if self.page > 1:
+            pieces += ["page", str(self.page)]
+        return build_url(pieces, trailing_slash=True)
+
+    @property
+    def index(self):
+        return get_index(self.record)
+
+    @property
+    def title(self):
+        if self.kind == "year":
+            return f"Posts from {self.key}"
+        if self.kind == "tag":
+            return f"Posts tagged {self.index.tag_names.get(self.key, self.key)}"
+        return self.record["title"]
+
+    @property
+    def pagination(self):
+        return ArchivePagination(self)
+
+    @property
+    def years(self):
+        return [ArchivePage(self.record, "year", year) for year in self.index.years]
+
+    @property
+    def tags(self):
+        return [
+            (self.index.tag_names[slug], ArchivePage(self.record, "tag", slug))
+            for slug in self.index.tags
+        ]
+
+    def is_child_of(self, path, strict=False):
+        return self.record.is_child_of(path)
+
+    def get_checksum(self, path_cache):
+        return self.index.page_checksum(self.kind, self.key, self.page)
+
+
+class ArchivePagination:
+    """
+    Pagination of a listing, with the attributes of a Lektor pagination
+    that templates use.
+    """
+
+    def __init__(self, source):
+        self.source = source
+        self.page = source.page
+        self.per_page = source.index.per_page
+        self.total = len(source.index.listing(source.kind, source.key))
+        self.pages = source.index.count_pages(source.kind, source.key)
+
+    @property
+    def items(self):
+        return self.source.index.items(self.source.kind, self.source.key, self.page)
+
+    @property
+    def has_prev(self):
+        return self.page > 1
+
+    @property
+    def has_next(self):
+        return self.page < self.pages
+
+    @property
+    def prev(self):
+        return self.for_page(self.page - 1)
+
+    @property
+    def next(self):
+        return self.for_page(self.page + 1)
+
+    def for_page(self, page):
+        if not 1 <= page <= self.pages:
+            return None
+        if self.source.kind == "blog" and page == 1:
+            return self.source.record
+        return ArchivePage(self.source.record, self.source.kind, self.source.key, page)
+
+
+class ArchiveFeed(VirtualSourceObject):
+    """
+    JSON Feed of the latest blog posts.
+    """
+
+    @property
+    def path(self):
+        return f"{self.record.path}@{VIRTUAL_PREFIX}/feed"
+
+    @property
+    def url_path(self):
+        return build_url([self.record.url_path, FEED_NAME])
+
+    def get_checksum(self, path_cache):
+        return get_index(self.record).feed_checksum()
+
+    def to_json(self):
+        # Feed readers need absolute URLs, with the domain if the project
+        # configures one.
+        external = bool(self.pad.db.config.base_url)
+
+        def url(source):
+            return self.url_to(source, absolute=not external, external=external)
+
+        items = []
+        for post in get_index(self.record).feed_items():
+            item = {"id": url(post), "url": url(post), "title": post["title"]}
+            if post["pub_date"]:
+                item["date_published"] = post["pub_date"].isoformat()
+            if post["main_image"]:
+                item["image"] = url(posixpath.join(post.url_path, post["main_image"]))
+            if post_tags(post):
+                item["tags"] = post_tags(post)
+            item["content_text"] = post["body"].source
+            items.append(item)
+        return {
+            "version": FEED_VERSION,
+            "title": self.record["title"],
+            "home_page_url": url(self.record),
+            "feed_url": url(self),
+            "items": items,
+        }
+
+
+class ApiIndexPage(VirtualSourceObject):
+    """
+    Page of the API index of the blog posts, the first one at
+    /api/index.json and the next ones at /api/index/<page>.json.
+    """
+
+    def __init__(self, record, page=1):
+        super().__init__(record)
+        self.page = page
+
+    @property
+    def path(self):
+        return f"{self.record.path}@{VIRTUAL_PREFIX}/{API_PATH}/{self.page}"
+
+    @property
+    def url_path(self):
+        if self.page == 1:
+            return build_url([API_PATH, "index.json"])
+        return build_url([API_PATH, "index", f"{self.page}.json"])
+
+    def get_checksum(self, path_cache):
+        index = get_index(self.record)
+        return checksum([index.api_page_items(self.page), index.count_api_pages()])
+
+    def to_json(self):
+        index = get_index(self.record)
+        pages = index.count_api_pages()
+
+        def page_url(page):
+            if not 1 <= page <= pages:
+                return None
+            return public_url(self.pad, ApiIndexPage(self.record, page).url_path)
+
+        return {
+            "version": API_VERSION,
+            "page": self.page,
+            "pages": pages,
+            "total": len(index.posts),
+            "prev": page_url(self.page - 1),
+            "next": page_url(self.page + 1),
+            "items": index.api_page_items(self.page),
+        }
+
+
+class ApiPost(VirtualSourceObject):
+    """
+    API document of a blog post at /api/posts/<slug>.json.
+    """
+
+    @property
+    def path(self):
+        return f"{self.record.path}@{VIRTUAL_PREFIX}/{API_PATH}"
+
+    @property
+    def url_path(self):
+        return build_url([API_PATH, "posts", f"{self.record['_slug']}.json"])
+
+    def to_json(self):
+        return post_document(self.record)
+
+
+class ArchivePageBuildProgram(BuildProgram):
+    def produce_artifacts(self):
+        self.declare_artifact(
+            posixpath.join(self.source.url_path, "index.html"),
+            sources=list(self.source.iter_source_filenames()),
+        )
+
+    def build_artifact(self, artifact):
+        get_ctx().record_virtual_dependency(self.source)
+        artifact.render_template_into(TEMPLATE, this=self.source)
+
+
+class ArchiveFeedBuildProgram(BuildProgram):
+    def produce_artifacts(self):
+        self.declare_artifact(
+            self.source.url_path, sources=list(self.source.iter_source_filenames())
+        )
+
+    def build_artifact(self, artifact):
+        get_ctx().record_virtual_dependency(self.source)
+        with artifact.open("wb") as f:
+            f.write(
+                json.dumps(self.source.to_json(), indent=2, ensure_ascii=False).encode()
+            )
+
+
+class ApiBuildProgram(BuildProgram):
+    def produce_artifacts(self):
+        self.declare_artifact(
+            self.source.url_path, sources=list(self.source.iter_source_filenames())
+        )
+
+    def build_artifact(self, artifact):
+        if isinstance(self.source, ApiIndexPage):
+            get_ctx().record_virtual_dependency(self.source)
+        with artifact.open("wb") as f:
+            f.write(encode_document(self.source.to_json()))
+
+
+_indexes = WeakKeyDictionary()
+
+
+def get_index(blog):
+    """
+    Return the ArchiveIndex of the blog, built once per pad.
+    """
+    index = _indexes.get(blog.pad)
+    if index is None:
+        index = _indexes[blog.pad] = ArchiveIndex.from_blog(blog)
+    return index
+
+
+def is_blog(source):
+    return isinstance(source, Page) and source.path == BLOG_PATH
+
+
+def archive_page(this):
+    """
+    Return the listing page to render for this, the blog or one of its
+    ArchivePages, and record that the page depends on what it lists.
+    """
+    page = this if isinstance(this, ArchivePage) else ArchivePage(this, "blog")
+    ctx = get_ctx()
+    if ctx is not None:
+        ctx.record_virtual_dependency(page)
+    return page
+
+
+def archive_tag(tag):
+    """
+    Return the first page of the listing of the posts tagged tag.
+    """
+    blog = get_ctx().pad.get(BLOG_PATH)
+    return ArchivePage(blog, "tag", slugify(tag))
+
+
+def resolve_virtual_path(record, pieces):
+    if is_post(record):
+        return ApiPost(record) if pieces == [API_PATH] else None
+    if not is_blog(record):
+        return None
+    if pieces == ["feed"]:
+        return ArchiveFeed(record)
+    if len(pieces) == 2 and pieces[0] == API_PATH and pieces[1].isdigit():
+        page = int(pieces[1])
+        if not 1 <= page <= get_index(record).count_api_pages():
+            return None
+        return ApiIndexPage(record, page)
+    if not pieces or pieces[0] not in KINDS or not pieces[-1].isdigit():
+        return None
+    kind, page = pieces[0], int(pieces[-1])
+    key = "/".join(pieces[1:-1]) or None
+    if kind == "year":
+        if key is None or not key.isdigit():
+            return None
+        key = int(key)
+    index = get_index(record)
+    if key is not None and not index.listing(kind, key):
+        return None
+    if not 1 <= page <= index.count_pages(kind, key):
+        return None
+    return ArchivePage(record, kind, key, page)
+
+
+def resolve_api_url_path(root, url_path):
+    blog = root.pad.get(BLOG_PATH)
+    if blog is None:
+        return None
+    if url_path == [API_PATH, "index.json"]:
+        return ApiIndexPage(blog)
+    if len(url_path) != 3 or not url_path[2].endswith(".json"):
+        return None
+    name = url_path[2][: -len(".json")]
+    if url_path[1] == "index" and name.isdigit() and name != "1":
+        return resolve_virtual_path(blog, [API_PATH, name])
+    if url_path[1] == "posts":
+        post = blog.children.get(name)
+        return ApiPost(post) if post is not None else None
+    return None
+
+
+def resolve_url_path(record, url_path):
+    if record.path == "/" and url_path[:1] == [API_PATH]:
+        return resolve_api_url_path(record, url_path)
+    if not is_blog(record):
+        return None
+    if url_path == [FEED_NAME]:
+        return ArchiveFeed(record)
+    page = 1
+    if url_path[-2:-1] == ["page"] and url_path[-1].isdigit():
+        page = int(url_path[-1])
+        url_path = url_path[:-2]
+        if page == 1:
+            return None
+    if not url_path:
+        pieces = ["blog", str(page)]
+    elif len(url_path) == 1 and url_path[0].isdigit():
+        pieces = ["year", url_path[0], str(page)]
+    elif len(url_path) == 2 and url_path[0] == "tag":
+        pieces = ["tag", url_path[1], str(page)]
+    else:
+        return None
+    return resolve_virtual_path(record, pieces)
+
+
+def generate_archive(source):
+    """
+    Yield the listing pages after the first, the feed and the API index of
+    the blog, and the API document of a post.
+    """
+    if is_post(source):
+        yield ApiPost(source)
+        return
+    if not is_blog(source):
+        return
+    index = get_index(source)
+    for kind, key in index.iter_listings():
+        first = 2 if kind == "blog" else 1
+        for page in range(first, index.count_pages(kind, key) + 1):
+            yield ArchivePage(source, kind, key, page)
+    yield ArchiveFeed(source)
+    for page in range(1, index.count_api_pages() + 1):
+        yield ApiIndexPage(source, page)
+
+
+def artifact_name(url_path):
+    name = url_path.strip("/")
+    return posixpath.join(name, "index.html") if url_path.endswith("/") else name
+
+
+def obsolete_artifacts(blog, build_state):
+    """
+    Names of the artifacts of the blog in build_state that it no longer
+    builds, like the pages of a tag no post has anymore or the pages past
+    the last one. They keep the blog as their source, which still exists,
+    so Lektor would never prune them.
+    """
+    current = {artifact_name(blog.url_path)}
+    current.update(artifact_name(source.url_path) for source in generate_archive(blog))
+    sources = [build_state.to_source_filename(f) for f in blog.iter_source_filenames()]
+    con = build_state.connect_to_database()
+    try:
+        rows = con.execute(
+            "select distinct artifact from artifacts where is_primary_source "
+            f"and source in ({', '.join('?' * len(sources))})",
+            sources,
+        ).fetchall()
+    finally:
+        con.close()
+    return sorted(name for (name,) in rows if name not in current)
+
+
+class ArchiveIndexPlugin(Plugin):
+    name = "archive index"
+    description = "Builds blog listings, year and tag pages, a JSON feed and a JSON API from one sorted index."
+
+    def on_setup_env(self, **extra):
+        self.env.add_build_program(ArchivePage, ArchivePageBuildProgram)
+        self.env.add_build_program(ArchiveFeed, ArchiveFeedBuildProgram)
+        self.env.add_build_program(ApiIndexPage, ApiBuildProgram)
+        self.env.add_build_program(ApiPost, ApiBuildProgram)
+        self.env.virtualpathresolver(VIRTUAL_PREFIX)(resolve_virtual_path)
+        self.env.urlresolver(resolve_url_path)
+        self.env.generator(generate_archive)
+        self.env.jinja_env.globals["archive_page"] = archive_page
+        self.env.jinja_env.globals["archive_tag"] = archive_tag
+
+    def on_before_prune(self, builder, all=False, **extra):
+        # Dropped from the build state, the obsolete listing and API pages
+        # have no source left and are pruned with the deleted posts.
+        blog = builder.pad.get(BLOG_PATH)
+        if all or blog is None:
+            return
+        with builder.new_build_state() as build_state:
+            for name in obsolete_artifacts(blog, build_state):
+                build_state.remove_artifact(name)
+
+    def on_before_build_all(self, builder, **extra):
+        # Built outside of any artifact, so loading every post is not
+        # recorded as a dependency of the first page that needs the index.
+        blog = builder.pad.get(BLOG_PATH)
+        if blog is not None:
+            get_index(blog)
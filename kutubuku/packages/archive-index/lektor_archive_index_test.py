@@ -0,0 +1,223 @@
+import datetime
+import hashlib
+import json
+import pytest
+from pathlib import Path
+import shutil
+import tempfile
+from lektor.builder import Builder
+from lektor.project import Project
+from lektor_archive_index import ArchiveIndex, ArchiveIndexPlugin
+
+
+@pytest.fixture
+def test_dir():
+    temp_dir = Path(tempfile.mkdtemp())
+    yield temp_dir
+    shutil.rmtree(temp_dir)
+
+
+class Post(dict):
+    def __init__(self, path, title, pub_date, tags=()):
+        super().__init__(title=title, pub_date=pub_date, tags=list(tags))
+        self.path = path
+
+
+POSTS = [
+    Post("/blog/c", "C", datetime.date(2025, 3, 1), ["Python", "rust"]),
+    Post("/blog/b", "B", datetime.date(2025, 2, 1), ["python"]),
+    Post("/blog/a", "A", datetime.date(2024, 1, 1), ["Data Science", ""]),
+]
+
+
+def create_test_project(base_dir: Path) -> Path:
+    project_dir = base_dir / "project"
+    files = {
+        "project.lektorproject": "[project]\nname = test\n",
+        "models/page.ini": "[model]\nname = Page\n\n[fields.title]\ntype = string\n",
+        "models/blog.ini": (
+            "[model]\nname = Blog\n\n[fields.title]\ntype = string\n\n"
+            "[children]\nmodel = blog-post\norder_by = -pub_date, title\n\n"
+            "[pagination]\nenabled = no\nper_page = 2\n"
+        ),
+        "models/blog-post.ini": (
+            "[model]\nname = Blog Post\n\n[fields.title]\ntype = string\n\n"
+            "[fields.tags]\ntype = strings\n\n[fields.pub_date]\ntype = date\n\n"
+            "[fields.main_image]\ntype = string\n\n[fields.body]\ntype = markdown\n"
+        ),
+        "templates/page.html": "{{ this.title }}",
+        "templates/blog-post.html": "{{ this.title }}",
+        "templates/blog.html": (
+            "{% set page = archive_page(this) %}{{ page.title }}|"
+            "{% for post in page.pagination.items %}{{ post.title }},{% endfor %}|"
+            "{{ page.pagination.page }}/{{ page.pagination.pages }}"
+        ),
+        "content/contents.lr": "title: Home\n",
+        "content/blog/contents.lr": "_model: blog\n---\ntitle: Blog\n",
+    }
+    for post in POSTS:
+        files[f"content{post.path}/contents.lr"] = (
+            f"title: {post['title']}\n---\ntags:\n\n" + "\n".join(post["tags"]) + "\n"
+            f"---\npub_date: {post['pub_date']}\n---\nbody:\n\nAbout {post['title']}.\n"
+        )
+    for name, text in files.items():
+        (project_dir / name).parent.mkdir(parents=True, exist_ok=True)
+        (project_dir / name).write_text(text)
+    return project_dir
+
+
+def build(project_dir, output_dir):
+    """
+    Build the project with the plugin and return the output files that
+    were written, relative to output_dir.
+    """
+    env = Project.discover(project_dir).make_env(load_plugins=False)
+    env.plugin_controller.instanciate_plugin("archive-index", ArchiveIndexPlugin)
+    env.plugin_controller.emit("setup-env")
+    before = {p: p.stat().st_mtime_ns for p in output_dir.rglob("*") if p.is_file()}
+    builder = Builder(
+        env.new_pad(), str(output_dir), buildstate_path=str(output_dir.parent / "bs")
+    )
+    assert builder.build_all() == 0
+    builder.prune()
+    return sorted(
+        p.relative_to(output_dir).as_posix()
+        for p in output_dir.rglob("*")
+        if p.is_file() and before.get(p) != p.stat().st_mtime_ns
+    )
+
+
+def read(path):
+    return path.read_text().strip()
+
+
+def test_index_groups_posts_by_year_and_tag():
+    index = ArchiveIndex(POSTS, per_page=2)
+    assert list(index.years) == [2025, 2024]
+    assert [post["title"] for post in index.years[2025]] == ["C", "B"]
+    assert list(index.tags) == ["data-science", "python", "rust"]
+    assert index.tag_names["python"] == "Python"
+    assert [post["title"] for post in index.tags["python"]] == ["C", "B"]
+    assert index.count_pages("blog") == 2
+    assert index.count_pages("tag", "missing") == 1
+    assert [post["title"] for post in index.items("blog", None, 2)] == ["A"]
+
+
+def test_page_checksum_changes_only_with_what_the_page_shows():
+    before = ArchiveIndex(POSTS, per_page=2)
+    renamed = POSTS[:2] + [
+        Post("/blog/a", "Zed", datetime.date(2024, 1, 1), ["Data Science"])
+    ]
+    after = ArchiveIndex(renamed, per_page=2)
+    assert before.page_checksum("blog", None, 1) == after.page_checksum("blog", None, 1)
+    assert before.page_checksum("blog", None, 2) != after.page_checksum("blog", None, 2)
+
+
+def test_build_listings_and_feed(test_dir):
+    project_dir = create_test_project(test_dir)
+    output_dir = test_dir / "public"
+    written = build(project_dir, output_dir)
+
+    assert written == [
+        "api/index.json",
+        "api/posts/a.json",
+        "api/posts/b.json",
+        "api/posts/c.json",
+        "blog/2024/index.html",
+        "blog/2025/index.html",
+        "blog/a/index.html",
+        "blog/b/index.html",
+        "blog/c/index.html",
+        "blog/feed.json",
+        "blog/index.html",
+        "blog/page/2/index.html",
+        "blog/tag/data-science/index.html",
+        "blog/tag/python/index.html",
+        "blog/tag/rust/index.html",
+        "index.html",
+    ]
+    assert read(output_dir / "blog/index.html") == "Blog|C,B,|1/2"
+    assert read(output_dir / "blog/page/2/index.html") == "Blog|A,|2/2"
+    assert (
+        read(output_dir / "blog/tag/python/index.html")
+        == "Posts tagged Python|C,B,|1/1"
+    )
+    assert read(output_dir / "blog/2024/index.html") == "Posts from 2024|A,|1/1"
+
+    feed = json.loads((output_dir / "blog/feed.json").read_text())
+    assert feed["feed_url"] == "/blog/feed.json"
+    assert [item["url"] for item in feed["items"]] == [
+        "/blog/c/",
+        "/blog/b/",
+        "/blog/a/",
+    ]
+    assert feed["items"][0]["tags"] == ["Python", "rust"]
+    assert feed["items"][0]["content_text"] == "About C."
+
+
+def test_rebuild_only_pages_showing_a_changed_post(test_dir):
+    project_dir = create_test_project(test_dir)
+    output_dir = test_dir / "public"
+    build(project_dir, output_dir)
+    assert build(project_dir, output_dir) == []
+
+    contents = project_dir / "content/blog/a/contents.lr"
+    # Lektor compares the mtime in seconds and the size of sources, so the
+    # new title is longer to be noticed within the same second.
+    contents.write_text(contents.read_text().replace("title: A", "title: Zed"))
+    assert build(project_dir, output_dir) == [
+        "api/index.json",
+        "api/posts/a.json",
+        "blog/2024/index.html",
+        "blog/a/index.html",
+        "blog/feed.json",
+        "blog/page/2/index.html",
+        "blog/tag/data-science/index.html",
+    ]
+
+
+def test_prune_listings_no_post_shows(test_dir):
+    project_dir = create_test_project(test_dir)
+    output_dir = test_dir / "public"
+    build(project_dir, output_dir)
+    assert (output_dir / "blog/tag/rust/index.html").exists()
+
+    contents = project_dir / "content/blog/c/contents.lr"
+    contents.write_text(contents.read_text().replace("\nrust\n", "\n"))
+    (project_dir / "content/blog/b/contents.lr").unlink()
+    build(project_dir, output_dir)
+    assert not (output_dir / "blog/tag/rust").exists()
+    assert not (output_dir / "blog/page/2").exists()
+    assert (output_dir / "blog/tag/python/index.html").exists()
+    assert read(output_dir / "blog/index.html") == "Blog|C,A,|1/1"
+
+
+def test_build_api(test_dir):
+    project_dir = create_test_project(test_dir)
+    output_dir = test_dir / "public"
+    build(project_dir, output_dir)
+
+    index = json.loads((output_dir / "api/index.json").read_text())
+    assert (index["page"], index["pages"], index["total"]) == (1, 1, 3)
+    assert index["prev"] is None and index["next"] is None
+    assert [item["slug"] for item in index["items"]] == ["c", "b", "a"]
+    item = index["items"][0]
+    assert item["api"] == "/api/posts/c.json"
+    assert item["url"] == "/blog/c/"
+    assert item["pub_date"] == "2025-03-01"
+    assert item["main_image"] is None
+    assert item["word_count"] == 2
+
+    data = (output_dir / "api/posts/c.json").read_bytes()
+    assert item["hash"] == hashlib.sha1(data).hexdigest()
+    post = json.loads(data)
+    assert post == {
+        "slug": "c",
+        "url": "/blog/c/",
+        "title": "C",
+        "tags": ["Python", "rust"],
+        "pub_date": "2025-03-01",
+        "main_image": None,
+        "body": "About C.",
+        "word_count": 2,
+    }
@@ -0,0 +1,15 @@
+from setuptools import setup
+
+setup(
+    name="lektor-archive-index",
+    version="0.1.0",
+    author="Ricky Lim",
+    author_email="rlim.email@gmail.com",
+    description="Build blog listings, year and tag pages and a JSON feed from one sorted index",
+    py_modules=["lektor_archive_index"],
+    entry_points={
+        "lektor.plugins": [
+            "archive-index = lektor_archive_index:ArchiveIndexPlugin",
+        ]
+    },
+)
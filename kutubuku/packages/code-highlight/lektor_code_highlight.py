@@ -0,0 +1,66 @@
+from functools import lru_cache
+
+from lektor.pluginsystem import Plugin
+from pygments import highlight
+from pygments.formatters import HtmlFormatter
+from pygments.lexers import get_lexer_by_name
+from pygments.util import ClassNotFound
+
+CSS_CLASS = "highlight"
+STYLE = "default"
+
+
+@lru_cache(maxsize=None)
+def get_formatter():
+    return HtmlFormatter(cssclass=CSS_CLASS, style=STYLE, wrapcode=True)
+
+
+@lru_cache(maxsize=None)
+def get_lexer(lang):
+    """
+    Return the Pygments lexer for a code block language, or None if Pygments
+    does not know the language. Language names are case insensitive.
+    """
+    try:
+        return get_lexer_by_name(lang.lower(), stripnl=False)
+    except ClassNotFound:
+        return None
+
+
+def highlight_code(code, lang):
+    """
+    Highlight code as HTML, or return None if it has no known language.
+    """
+    lexer = get_lexer(lang) if lang else None
+    if lexer is None:
+        return None
+    return highlight(code.rstrip("\n") + "\n", lexer, get_formatter())
+
+
+def stylesheet():
+    """
+    CSS for the token classes of highlighted code blocks.
+    """
+    return get_formatter().get_style_defs(f".{CSS_CLASS}") + "\n"
+
+
+class CodeHighlightMixin:
+    """
+    Markdown renderer mixin that highlights fenced code blocks with a
+    language while the body is rendered, so no highlighter runs in the
+    browser. Blocks without a known language are rendered as before.
+    """
+
+    def block_code(self, code, lang=None):
+        html = highlight_code(code, lang)
+        if html is None:
+            return super().block_code(code, lang)
+        return html
+
+
+class CodeHighlightPlugin(Plugin):
+    name = "code highlight"
+    description = "Highlights Markdown code blocks with Pygments at build time."
+
+    def on_markdown_config(self, config, **extra):
+        config.renderer_mixins.append(CodeHighlightMixin)
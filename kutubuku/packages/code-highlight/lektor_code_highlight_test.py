@@ -0,0 +1,33 @@
+import mistune
+from lektor_code_highlight import CodeHighlightMixin, highlight_code, stylesheet
+
+
+class Renderer(CodeHighlightMixin, mistune.Renderer):
+    pass
+
+
+def render(text):
+    return mistune.Markdown(renderer=Renderer())(text)
+
+
+def test_highlight_code():
+    html = highlight_code("def f():\n    return 1\n", "Python")
+    assert html.startswith('<div class="highlight"><pre>')
+    assert '<span class="k">def</span>' in html
+    assert "<code>" in html
+
+
+def test_unknown_language_is_not_highlighted():
+    assert highlight_code("x", "no-such-language") is None
+    assert highlight_code("x", None) is None
+
+
+def test_renderer_highlights_fenced_code():
+    html = render("```bash\necho <hi>\n```\n\n```\nplain <text>\n```\n")
+    assert '<div class="highlight">' in html
+    assert "&lt;hi&gt;" in html
+    assert "<pre><code>plain &lt;text&gt;\n</code></pre>" in html
+
+
+def test_stylesheet():
+    assert ".highlight .k " in stylesheet()
@@ -0,0 +1,16 @@
+from setuptools import setup
+
+setup(
+    name="lektor-code-highlight",
+    version="0.1.0",
+    author="Ricky Lim",
+    author_email="rlim.email@gmail.com",
+    description="Highlight Markdown code blocks with Pygments at build time",
+    py_modules=["lektor_code_highlight"],
+    install_requires=["Pygments>=2.19"],
+    entry_points={
+        "lektor.plugins": [
+            "code-highlight = lektor_code_highlight:CodeHighlightPlugin",
+        ]
+    },
+)
@@ -0,0 +1,288 @@
+import hashlib
+import os
+import posixpath
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from urllib.parse import urlsplit
+
+from lektor.context import get_ctx
+from lektor.pluginsystem import Plugin, get_plugin
+from lektor.utils import get_cache_dir
+from markupsafe import escape
+from PIL import Image
+
+WIDTHS = (160, 320, 480, 768, 1024, 1600)
+FORMATS = {"avif": "image/avif", "webp": "image/webp"}
+QUALITY = {"avif": 60, "webp": 80}
+EXTENSIONS = (".png", ".jpg", ".jpeg")
+CACHE_DIRNAME = "responsive-images"
+DEFAULT_SIZES = "100vw"
+
+
+def supported_formats():
+    Image.init()
+    return [fmt for fmt in FORMATS if fmt.upper() in Image.SAVE]
+
+
+def variant_widths(width):
+    """
+    Widths of the variants of an image: every standard width below the
+    original width, plus the original width. Images are never upscaled.
+    """
+    return [w for w in WIDTHS if w < width] + [width]
+
+
+def variant_filename(filename, width, fmt):
+    stem = posixpath.splitext(filename)[0]
+    return f"{stem}-{width}w.{fmt}"
+
+
+def file_digest(path):
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(65536), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def copy_variant(cached, artifact):
+    artifact.replace_with_file(cached, copy=True)
+
+
+def encode_variants(source, outputs):
+    """
+    Resize the image at source to every (path, width, format) in outputs.
+    Like resize.py, the image is converted to a mode the encoders accept and
+    downscaled with LANCZOS, keeping its aspect ratio.
+    Returns the number of bytes written.
+    """
+    written = 0
+    with Image.open(source) as img:
+        if img.mode not in ("RGB", "RGBA"):
+            has_alpha = img.mode in ("LA", "PA") or "transparency" in img.info
+            img = img.convert("RGBA" if has_alpha else "RGB")
+        for path, width, fmt in outputs:
+            if width == img.width:
+                variant = img
+            else:
+                height = max(1, round(img.height * width / img.width))
+                variant = img.resize((width, height), Image.Resampling.LANCZOS)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Written aside and renamed, so builds running in parallel never
+            # read a partly written variant.
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            variant.save(tmp_path, fmt.upper(), quality=QUALITY[fmt])
+            os.replace(tmp_path, path)
+            written += os.path.getsize(path)
+    return written
+
+
+class ResponsiveImage:
+    """
+    An image attachment with its intrinsic size and its width variants,
+    grouped by format. Variants are encoded once into cache_dir, named after
+    the content hash of the source image.
+    """
+
+    def __init__(self, url_path, filename, width, height, formats, digest, cache_dir):
+        self.url_path = url_path
+        self.filename = filename
+        self.width = width
+        self.height = height
+        self.formats = formats
+        self.digest = digest
+        self.cache_dir = cache_dir
+
+    @property
+    def variants(self):
+        """
+        Yield (format, width, URL path, cached file) of every variant.
+        """
+        base, filename = posixpath.split(self.url_path)
+        for fmt in self.formats:
+            for width in variant_widths(self.width):
+                url = posixpath.join(base, variant_filename(filename, width, fmt))
+                cached = os.path.join(self.cache_dir, f"{self.digest}-{width}.{fmt}")
+                yield fmt, width, url, cached
+
+    @property
+    def sources(self):
+        """
+        One {"type", "srcset"} per format, most efficient format first.
+        """
+        srcsets = {}
+        for fmt, width, url, _ in self.variants:
+            srcsets.setdefault(fmt, []).append(f"{url} {width}w")
+        return [
+            {"type": FORMATS[fmt], "srcset": ", ".join(srcset)}
+            for fmt, srcset in srcsets.items()
+        ]
+
+
+def iter_image_attachments(record):
+    stack = [record]
+    while stack:
+        record = stack.pop()
+        for image in record.attachments.images:
+            if image.url_path.lower().endswith(EXTENSIONS):
+                yield image
+        stack.extend(record.children.include_hidden(True))
+
+
+def responsive_image(attachment, formats, cache_dir):
+    """
+    Return the ResponsiveImage of an image attachment, or None if its size
+    is unknown.
+    """
+    if not attachment.width or not attachment.height:
+        return None
+    filename = attachment.attachment_filename
+    return ResponsiveImage(
+        attachment.url_path,
+        filename,
+        attachment.width,
+        attachment.height,
+        formats,
+        file_digest(filename),
+        cache_dir,
+    )
+
+
+def build_responsive_images(pad, cache_dir, workers=None):
+    """
+    Encode the WebP and AVIF variants of every PNG and JPEG attachment into
+    cache_dir and return the ResponsiveImages by URL path.
+
+    Cached variants are named after the content hash of their source image,
+    so images that did not change since the last build are not encoded
+    again. Variants of images that are gone are removed from the cache.
+    """
+    formats = supported_formats()
+    os.makedirs(cache_dir, exist_ok=True)
+
+    images = {}
+    jobs = []
+    used = set()
+    for attachment in iter_image_attachments(pad.root):
+        image = responsive_image(attachment, formats, cache_dir)
+        if image is None:
+            continue
+        images[image.url_path] = image
+
+        outputs = [
+            (cached, width, fmt)
+            for fmt, width, _, cached in image.variants
+            if cached not in used
+        ]
+        used.update(cached for cached, _, _ in outputs)
+        outputs = [output for output in outputs if not os.path.exists(output[0])]
+        if outputs:
+            jobs.append((image.filename, outputs))
+
+    if jobs:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            sources, outputs = zip(*jobs)
+            written = sum(executor.map(encode_variants, sources, outputs))
+        print(f"Encoded {len(jobs)} image(s) into {written} bytes of variants")
+
+    for name in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, name)
+        if path not in used:
+            os.remove(path)
+    return images
+
+
+class ResponsiveImageMixin:
+    """
+    Markdown renderer mixin that wraps inline images of a record in a
+    <picture> with srcset, sizes and explicit width and height.
+    """
+
+    def image(self, src, title, text):
+        html = super().image(src, title, text)
+        if self.record is None or urlsplit(src).scheme:
+            return html
+        url_path = posixpath.normpath(posixpath.join(self.record.url_path, src))
+        image = get_plugin(ResponsiveImagesPlugin).get_image(url_path)
+        if image is None:
+            return html
+
+        sources = "".join(
+            f'<source type="{source["type"]}" srcset="{escape(source["srcset"])}" '
+            f'sizes="{DEFAULT_SIZES}">'
+            for source in image.sources
+        )
+        attrs = (
+            f'<img width="{image.width}" height="{image.height}" '
+            'loading="lazy" decoding="async" '
+        )
+        return f"<picture>{sources}{html.replace('<img ', attrs, 1)}</picture>"
+
+
+class ResponsiveImagesPlugin(Plugin):
+    name = "responsive images"
+    description = "Builds WebP and AVIF width variants of image attachments."
+
+    def on_setup_env(self, **extra):
+        self.images = {}
+        self.complete = False
+        self.env.jinja_env.globals["responsive_image"] = self.get_image
+
+    def on_markdown_config(self, config, **extra):
+        config.renderer_mixins.append(ResponsiveImageMixin)
+
+    @property
+    def cache_dir(self):
+        return os.path.join(get_cache_dir(), CACHE_DIRNAME, self.env.project.id)
+
+    def on_before_build_all(self, builder, **extra):
+        self.images = build_responsive_images(builder.pad, self.cache_dir)
+        self.complete = True
+
+    def load_image(self, pad, url_path):
+        """
+        Return the ResponsiveImage of the attachment at url_path, encoding
+        its missing variants. Used by builds of single sources, like the
+        shards of a parallel build, where no build of every image ran first.
+        """
+        attachment = pad.resolve_url_path(url_path)
+        if (
+            attachment is None
+            or not getattr(attachment, "is_attachment", False)
+            or not url_path.lower().endswith(EXTENSIONS)
+        ):
+            return None
+        image = responsive_image(attachment, supported_formats(), self.cache_dir)
+        if image is not None:
+            outputs = [
+                (cached, width, fmt)
+                for fmt, width, _, cached in image.variants
+                if not os.path.exists(cached)
+            ]
+            if outputs:
+                encode_variants(image.filename, outputs)
+        return image
+
+    def get_image(self, url_path):
+        """
+        Return the ResponsiveImage of the attachment at url_path, or None if
+        it has no variants. The variants are declared as sub artifacts of the
+        page being built, so Lektor copies them into the output and prunes
+        them once no page uses them anymore.
+        """
+        image = self.images.get(url_path)
+        ctx = get_ctx()
+        if image is None and not self.complete and url_path not in self.images:
+            if ctx is not None:
+                image = self.images[url_path] = self.load_image(ctx.pad, url_path)
+        if image is None or ctx is None or ctx.build_state is None:
+            return image
+
+        ctx.record_dependency(image.filename)
+        for _, _, url, cached in image.variants:
+            ctx.add_sub_artifact(
+                artifact_name=url,
+                sources=[image.filename],
+                build_func=partial(copy_variant, cached),
+            )
+        return image
@@ -0,0 +1,53 @@
+import pytest
+from pathlib import Path
+import shutil
+import tempfile
+from PIL import Image
+from lektor_responsive_images import (
+    ResponsiveImage,
+    encode_variants,
+    variant_filename,
+    variant_widths,
+)
+
+
+@pytest.fixture
+def test_dir():
+    temp_dir = Path(tempfile.mkdtemp())
+    yield temp_dir
+    shutil.rmtree(temp_dir)
+
+
+def test_variant_widths_do_not_upscale():
+    assert variant_widths(200) == [160, 200]
+    assert variant_widths(100) == [100]
+    assert variant_widths(1600) == [160, 320, 480, 768, 1024, 1600]
+
+
+def test_variant_filename():
+    assert variant_filename("image.png", 320, "webp") == "image-320w.webp"
+
+
+def test_sources():
+    image = ResponsiveImage(
+        "/blog/post/image.png", "image.png", 200, 300, ["avif", "webp"], "abc", "/c"
+    )
+    assert image.sources == [
+        {
+            "type": "image/avif",
+            "srcset": "/blog/post/image-160w.avif 160w, /blog/post/image-200w.avif 200w",
+        },
+        {
+            "type": "image/webp",
+            "srcset": "/blog/post/image-160w.webp 160w, /blog/post/image-200w.webp 200w",
+        },
+    ]
+
+
+def test_encode_variants(test_dir):
+    source = test_dir / "image.png"
+    Image.new("P", (200, 100)).save(source)
+    outputs = [(str(test_dir / "out" / "a.webp"), 160, "webp")]
+    assert encode_variants(source, outputs) > 0
+    with Image.open(test_dir / "out" / "a.webp") as img:
+        assert img.size == (160, 80)
@@ -0,0 +1,16 @@
+from setuptools import setup
+
+setup(
+    name="lektor-responsive-images",
+    version="0.1.0",
+    author="Ricky Lim",
+    author_email="rlim.email@gmail.com",
+    description="Build WebP and AVIF width variants of image attachments",
+    py_modules=["lektor_responsive_images"],
+    install_requires=["Pillow>=11.3"],
+    entry_points={
+        "lektor.plugins": [
+            "responsive-images = lektor_responsive_images:ResponsiveImagesPlugin",
+        ]
+    },
+)
@@ -0,0 +1,262 @@
+#!/usr/bin/env python
+
+import sys
+import argparse
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+from lektor.builder import Builder
+from lektor.project import Project
+from parallel_build import available_cores, parallel_lektor_build
+from search_index import update_index
+
+PASS = 0
+FAIL = 1
+project_path = "kutubuku"
+output_path = "kutubuku/public"
+cache_path = ".cache/build_site"
+index_cache_path = ".cache/search_index"
+
+INPUT_DIRS = ("content", "templates", "models", "assets", "packages")
+# Changes to these inputs can affect every page, so they invalidate the whole build.
+GLOBAL_INPUTS = ("templates", "models", "packages")
+# Files generated next to the inputs, like the bytecode and metadata of plugins.
+GENERATED_DIRS = ("__pycache__", ".pytest_cache", ".ruff_cache")
+
+
+def file_digest(path):
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(65536), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def is_generated(path):
+    return any(
+        part in GENERATED_DIRS or part.endswith(".egg-info") for part in path.parts
+    )
+
+
+def is_global_input(name):
+    return name.split("/", 1)[0] in GLOBAL_INPUTS or name.endswith(".lektorproject")
+
+
+class InputManifest:
+    """
+    Snapshot of the build inputs of a Lektor project: content, templates,
+    models, assets, plugins and the project file, keyed by their path relative
+    to the project. A file is only hashed when its mtime or size changed.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        try:
+            self.entries = json.loads(self.path.read_text())
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def scan(self, project_path):
+        """
+        Return the new entries of the project and the names of the inputs that
+        were added, changed or removed since the snapshot.
+        """
+        project_path = Path(project_path)
+        files = list(project_path.glob("*.lektorproject"))
+        for name in INPUT_DIRS:
+            files.extend(
+                p
+                for p in (project_path / name).rglob("*")
+                if p.is_file() and not is_generated(p.relative_to(project_path))
+            )
+
+        entries = {}
+        changed = set()
+        for path in files:
+            name = path.relative_to(project_path).as_posix()
+            stat = path.stat()
+            entry = self.entries.get(name)
+            if (
+                entry
+                and entry["mtime_ns"] == stat.st_mtime_ns
+                and entry["size"] == stat.st_size
+            ):
+                entries[name] = entry
+                continue
+            digest = file_digest(path)
+            if not entry or entry["sha1"] != digest:
+                changed.add(name)
+            entries[name] = {
+                "mtime_ns": stat.st_mtime_ns,
+                "size": stat.st_size,
+                "sha1": digest,
+            }
+        changed.update(set(self.entries) - set(entries))
+        return entries, sorted(changed)
+
+    def save(self, entries):
+        self.entries = entries
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(entries))
+        os.replace(tmp_path, self.path)
+
+
+class TrackingBuilder(Builder):
+    """
+    Lektor builder that records the output files of the artifacts it updated.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.updated_artifacts = []
+
+    def build(self, source, path_cache=None):
+        prog, build_state = super().build(source, path_cache)
+        self.updated_artifacts.extend(
+            artifact.dst_filename for artifact in build_state.updated_artifacts
+        )
+        return prog, build_state
+
+
+def lektor_build(project_path, output_path, buildstate_path):
+    """
+    Build the Lektor project into output_path with the build state kept in
+    buildstate_path, so artifacts that are still current are not rebuilt.
+    Returns the number of failures and the paths of the updated artifacts.
+    """
+    project = Project.discover(project_path)
+    env = project.make_env()
+    builder = TrackingBuilder(
+        env.new_pad(), os.path.abspath(output_path), buildstate_path=buildstate_path
+    )
+    failures = builder.build_all()
+    builder.prune()
+    return failures, builder.updated_artifacts
+
+
+def build_site(
+    project_path=project_path,
+    output_path=output_path,
+    cache_path=cache_path,
+    full=False,
+    index=True,
+    index_cache_path=index_cache_path,
+    workers=None,
+):
+    """
+    Incrementally build the site and its search index.
+
+    The input manifest and the Lektor build state are kept in cache_path
+    between runs. Nothing is built if no input changed. A change to the
+    templates, models, plugins or project file invalidates every page,
+    otherwise only the artifacts depending on the changed content are
+    rebuilt. The search index is updated for the changed pages only, see
+    update_index.
+
+    With more than one worker, which is the default on a machine with more
+    than one core, the pages are built in parallel, see
+    parallel_lektor_build.
+    """
+    cache_path = Path(cache_path)
+    output_path = Path(output_path)
+    buildstate_path = cache_path / "buildstate"
+    manifest = InputManifest(cache_path / "inputs.json")
+    entries, changed = manifest.scan(project_path)
+
+    if not buildstate_path.exists() or not output_path.exists():
+        full = True
+    if any(is_global_input(name) for name in changed):
+        full = True
+
+    if not full and not changed:
+        print("Nothing changed, skipping build")
+        return PASS
+
+    if full:
+        print("Building all pages...")
+        shutil.rmtree(buildstate_path, ignore_errors=True)
+        shutil.rmtree(output_path, ignore_errors=True)
+    else:
+        print(f"Rebuilding pages for {len(changed)} changed input(s)...")
+        for name in changed:
+            print(f"  {name}")
+    buildstate_path.mkdir(parents=True, exist_ok=True)
+
+    workers = workers or available_cores()
+    if workers > 1:
+        failures, updated = parallel_lektor_build(
+            project_path, output_path, buildstate_path, workers
+        )
+    else:
+        failures, updated = lektor_build(
+            project_path, output_path, str(buildstate_path)
+        )
+    pages = sorted(p for p in updated if p.endswith(".html"))
+    print(f"Updated {len(updated)} artifact(s), {len(pages)} page(s)")
+    if failures:
+        print(f"Build failed with {failures} failure(s)")
+        return FAIL
+
+    if index:
+        print("Indexing pages...")
+        if update_index(output_path, index_cache_path) != PASS:
+            return FAIL
+
+    manifest.save(entries)
+    return PASS
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Incrementally build the Lektor site and its search index"
+    )
+    parser.add_argument(
+        "--project", default=project_path, help="Path to the Lektor project"
+    )
+    parser.add_argument(
+        "--output", default=output_path, help="Path to the build output directory"
+    )
+    parser.add_argument(
+        "--cache",
+        default=cache_path,
+        help="Path to keep the build state and input manifest between runs",
+    )
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="Rebuild every page regardless of what changed",
+    )
+    parser.add_argument(
+        "--no-index",
+        dest="index",
+        action="store_false",
+        help="Do not update the search index",
+    )
+    parser.add_argument(
+        "--index-cache",
+        default=index_cache_path,
+        help="Path to keep the search index state between runs",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Number of processes building pages (default: all available cores)",
+    )
+    args = parser.parse_args(argv)
+    return build_site(
+        args.project,
+        args.output,
+        args.cache,
+        args.full,
+        args.index,
+        args.index_cache,
+        args.workers,
+    )
+
+
+if __name__ == "__main__":
+    sys.exit(main())
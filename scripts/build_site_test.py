@@ -0,0 +1,78 @@
+import pytest
+from pathlib import Path
+import shutil
+import tempfile
+from build_site import InputManifest, is_global_input
+
+
+@pytest.fixture
+def test_dir():
+    temp_dir = Path(tempfile.mkdtemp())
+    yield temp_dir
+    shutil.rmtree(temp_dir)
+
+
+def create_test_project(base_dir: Path) -> Path:
+    project_dir = base_dir / "project"
+    (project_dir / "content" / "blog" / "my-first-post").mkdir(parents=True)
+    (project_dir / "templates").mkdir()
+    (project_dir / "project.lektorproject").write_text("[project]\n")
+    (project_dir / "templates" / "layout.html").write_text("<html></html>\n")
+    (project_dir / "content" / "blog" / "my-first-post" / "contents.lr").write_text(
+        "title: My First Post\n"
+    )
+    return project_dir
+
+
+def test_first_scan_reports_every_input(test_dir):
+    project_dir = create_test_project(test_dir)
+    _, changed = InputManifest(test_dir / "inputs.json").scan(project_dir)
+    assert changed == [
+        "content/blog/my-first-post/contents.lr",
+        "project.lektorproject",
+        "templates/layout.html",
+    ]
+
+
+def test_scan_reports_changed_and_removed_inputs(test_dir):
+    project_dir = create_test_project(test_dir)
+    manifest = InputManifest(test_dir / "inputs.json")
+    entries, _ = manifest.scan(project_dir)
+    manifest.save(entries)
+
+    manifest = InputManifest(test_dir / "inputs.json")
+    assert manifest.scan(project_dir)[1] == []
+
+    (project_dir / "templates" / "layout.html").touch()
+    assert manifest.scan(project_dir)[1] == []
+
+    (project_dir / "content" / "blog" / "my-first-post" / "contents.lr").write_text(
+        "title: My Renamed Post\n"
+    )
+    (project_dir / "templates" / "layout.html").unlink()
+    assert manifest.scan(project_dir)[1] == [
+        "content/blog/my-first-post/contents.lr",
+        "templates/layout.html",
+    ]
+
+
+def test_scan_skips_generated_plugin_files(test_dir):
+    project_dir = create_test_project(test_dir)
+    plugin_dir = project_dir / "packages" / "my-plugin"
+    (plugin_dir / "__pycache__").mkdir(parents=True)
+    (plugin_dir / "lektor_my_plugin.egg-info").mkdir()
+    (plugin_dir / "lektor_my_plugin.py").write_text("")
+    (plugin_dir / "__pycache__" / "lektor_my_plugin.pyc").write_text("")
+    (plugin_dir / "lektor_my_plugin.egg-info" / "PKG-INFO").write_text("")
+    _, changed = InputManifest(test_dir / "inputs.json").scan(project_dir)
+    assert "packages/my-plugin/lektor_my_plugin.py" in changed
+    assert not any("__pycache__" in name or "egg-info" in name for name in changed)
+
+
+def test_global_inputs():
+    assert is_global_input("templates/layout.html")
+    assert is_global_input("models/blog-post.ini")
+    assert is_global_input("kutubuku.lektorproject")
+    assert is_global_input("packages/archive-index/lektor_archive_index.py")
+    assert not is_global_input("content/blog/my-first-post/contents.lr")
+    assert not is_global_input("assets/static/style.css")
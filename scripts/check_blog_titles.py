@@ -2,53 +2,355 @@
 
 import sys
 import argparse
+import datetime
+import hashlib
+import json
+import os
+import subprocess
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
 from slugify import slugify
 from pathlib import Path
+from lektor_record import read_record
 
 PASS = 0
 FAIL = 1
 blog_path = "kutubuku/content/blog"
+cache_path = ".cache/check_blog_titles.json"
 
+METADATA_FIELDS = ("title", "pub_date", "main_image")
 
-def check_blog_titles(blog_path=blog_path, fix=False):
+
+@dataclass
+class PostRecord:
     """
-    Check that the folder name matches the title in the contents.lr file.
-    The folder name should be the title in slugified form.
-    If fix is True, the folder name will be changed to match the title.
+    Metadata of a single blog post, parsed once from its contents.lr file.
+    """
+
+    blog_dir: Path
+    title: str = None
+    pub_date: str = None
+    main_image: str = None
+    expected_dirname: str = None
+
+
+def parse_post(blog_dir):
+    """
+    Parse the metadata fields of the contents.lr file of a blog post into a
+    PostRecord. Reading stops once the metadata fields are found, so the body
+    is usually not read at all.
+    Returns None if the folder has no contents.lr file.
+    """
+    content_file = blog_dir / "contents.lr"
+    if not content_file.exists():
+        return None
+
+    fields = read_record(content_file, METADATA_FIELDS)
+    record = PostRecord(
+        blog_dir, **{name: value.strip() or None for name, value in fields.items()}
+    )
+    if record.title:
+        record.expected_dirname = slugify(record.title)
+    return record
+
+
+def file_digest(path):
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(65536), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class PostCache:
+    """
+    On-disk cache of parsed blog posts, keyed by the path of their contents.lr.
+    Each entry stores the (mtime, size, content hash) of the file with the
+    parsed record. A post whose mtime and size are unchanged is not read at all,
+    a post that was only touched is hashed but not parsed nor slugified again.
+    """
+
+    VERSION = 2
+
+    def __init__(self, path=None):
+        self.path = Path(path) if path else None
+        self.entries = {}
+        self.dirty = False
+        if self.path and self.path.exists():
+            try:
+                data = json.loads(self.path.read_text())
+            except (OSError, ValueError):
+                data = {}
+            if data.get("version") == self.VERSION:
+                self.entries = data["posts"]
+
+    def load(self, blog_dir):
+        """
+        Return the PostRecord of blog_dir, parsing contents.lr only if it changed.
+        """
+        content_file = blog_dir / "contents.lr"
+        try:
+            stat = content_file.stat()
+        except FileNotFoundError:
+            return None
+
+        key = str(content_file)
+        entry = self.entries.get(key)
+        if (
+            entry
+            and entry["mtime_ns"] == stat.st_mtime_ns
+            and entry["size"] == stat.st_size
+        ):
+            return PostRecord(blog_dir, **entry["record"])
+
+        digest = file_digest(content_file)
+        if entry and entry["sha1"] == digest:
+            record = PostRecord(blog_dir, **entry["record"])
+        else:
+            record = parse_post(blog_dir)
+        self.store(record, stat, digest)
+        return record
+
+    def store(self, record, stat, digest):
+        fields = asdict(record)
+        del fields["blog_dir"]
+        self.entries[str(record.blog_dir / "contents.lr")] = {
+            "mtime_ns": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "sha1": digest,
+            "record": fields,
+        }
+        self.dirty = True
+
+    def rename(self, old_dir, new_dir):
+        entry = self.entries.pop(str(old_dir / "contents.lr"), None)
+        if entry is not None:
+            self.entries[str(new_dir / "contents.lr")] = entry
+            self.dirty = True
+
+    def evict(self, blog_path, keep=None, blog_dirs=None):
+        """
+        Drop the entries under blog_path of posts that were deleted or renamed.
+        After a full scan, every entry not in keep is dropped. After a partial
+        scan, only entries in blog_dirs are checked against the filesystem.
+        """
+        blog_path = Path(blog_path)
+        for key in list(self.entries):
+            blog_dir = Path(key).parent
+            if blog_dir.parent != blog_path:
+                continue
+            if keep is not None:
+                stale = key not in keep
+            else:
+                stale = blog_dir in blog_dirs and not Path(key).exists()
+            if stale:
+                del self.entries[key]
+                self.dirty = True
+
+    def save(self):
+        if not (self.path and self.dirty):
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        tmp_path.write_text(
+            json.dumps({"version": self.VERSION, "posts": self.entries})
+        )
+        os.replace(tmp_path, self.path)
+        self.dirty = False
+
+
+def changed_paths(ref=None):
+    """
+    List the files changed according to git, relative to the current directory.
+    Without a ref the staged changes are listed, otherwise the changes since ref.
+    """
+    command = ["git", "diff", "--name-only", "--relative"]
+    command.append(ref if ref else "--cached")
+    output = subprocess.run(command, capture_output=True, text=True, check=True)
+    return output.stdout.splitlines()
+
+
+def touched_blog_dirs(paths, blog_path=blog_path):
+    """
+    Map changed file paths to the blog post folders that contain them,
+    including folders that no longer exist. Paths outside blog_path are ignored.
     """
     blog_path = Path(blog_path)
-    has_mismatch = False
-    for blog_dir in blog_path.iterdir():
-        if not blog_dir.is_dir():
+    root = blog_path.resolve()
+    blog_dirs = set()
+    for path in paths:
+        try:
+            parts = Path(path).resolve().relative_to(root).parts
+        except ValueError:
             continue
+        if parts:
+            blog_dirs.add(blog_path / parts[0])
+    return sorted(blog_dirs)
 
-        content_file = blog_dir / "contents.lr"
-        if not content_file.exists():
+
+def affected_blog_dirs(paths, blog_path=blog_path):
+    """
+    Map changed file paths to the existing blog post folders that contain them.
+    """
+    return [d for d in touched_blog_dirs(paths, blog_path) if d.is_dir()]
+
+
+def scan_posts(blog_path=blog_path, workers=None, blog_dirs=None, cache=None):
+    """
+    Parse every blog post under blog_path using a pool of worker threads.
+    If blog_dirs is given, only those blog post folders are parsed.
+    If cache is given, unchanged blog posts are taken from the cache.
+    """
+    if blog_dirs is None:
+        blog_dirs = sorted(d for d in Path(blog_path).iterdir() if d.is_dir())
+    load = cache.load if cache else parse_post
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        records = executor.map(load, blog_dirs)
+        return [record for record in records if record is not None]
+
+
+def check_slug(records):
+    """
+    The folder name should be the title in slugified form.
+    """
+    errors = []
+    for record in records:
+        if record.title and record.blog_dir.name != record.expected_dirname:
+            errors.append(
+                f"Mismatch in blog dir and blog title: {record.blog_dir.name} != {record.expected_dirname}"
+            )
+    return errors
+
+
+def check_duplicate_slugs(records):
+    """
+    No two blog posts should share the same slugified title.
+    """
+    dirs_by_slug = defaultdict(list)
+    for record in records:
+        if record.title:
+            dirs_by_slug[record.expected_dirname].append(record.blog_dir.name)
+
+    return [
+        f"Duplicate blog slug {slug}: {', '.join(dirnames)}"
+        for slug, dirnames in sorted(dirs_by_slug.items())
+        if len(dirnames) > 1
+    ]
+
+
+def check_main_image(records):
+    """
+    The main_image field should point to a file inside the blog post folder.
+    """
+    errors = []
+    for record in records:
+        if record.main_image and not (record.blog_dir / record.main_image).is_file():
+            errors.append(
+                f"Missing main image in {record.blog_dir.name}: {record.main_image}"
+            )
+    return errors
+
+
+def check_pub_date(records):
+    """
+    The pub_date field should be an ISO date, e.g. 2025-01-31.
+    """
+    errors = []
+    for record in records:
+        if not record.pub_date:
             continue
+        try:
+            datetime.date.fromisoformat(record.pub_date)
+        except ValueError:
+            errors.append(
+                f"Malformed pub_date in {record.blog_dir.name}: {record.pub_date}"
+            )
+    return errors
+
+
+CHECKS = [check_slug, check_duplicate_slugs, check_main_image, check_pub_date]
+
+
+def run_checks(records, checks=CHECKS):
+    errors = []
+    for check in checks:
+        errors.extend(check(records))
+    return errors
 
-        title = None
-        with open(content_file, "r") as f:
-            for line in f:
-                if line.startswith("title: "):
-                    title = line.split("title: ", 1)[1].strip()
-                    break
-        if not title:
+
+def fix_slugs(records, cache=None):
+    """
+    Rename the folder of each blog post to match its slugified title.
+    A folder is left untouched if the target name is already taken.
+    """
+    for record in records:
+        if not record.title or record.blog_dir.name == record.expected_dirname:
             continue
+        new_blog_dir = record.blog_dir.parent / record.expected_dirname
+        if new_blog_dir.exists():
+            print(f"Cannot rename {record.blog_dir}: {new_blog_dir} already exists")
+            continue
+        record.blog_dir.rename(new_blog_dir)
+        print(f"Renamed: {record.blog_dir} -> {new_blog_dir}")
+        if cache:
+            cache.rename(record.blog_dir, new_blog_dir)
+        record.blog_dir = new_blog_dir
 
-        expected_dirname = slugify(title)
-        if blog_dir.name != expected_dirname:
-            print(
-                f"Mismatch in blog dir and blog title: {blog_dir.name} != {expected_dirname}"
-            )
-            has_mismatch = True
-            if fix:
-                new_blog_dir = blog_dir.parent / expected_dirname
-                blog_dir.rename(new_blog_dir)
-                print(f"Renamed: {blog_dir} -> {new_blog_dir}")
 
-    should_fail = has_mismatch and not fix
+def scan_changed_posts(paths, blog_path=blog_path, workers=None, cache=None):
+    """
+    Parse only the blog posts affected by paths.
+    Folders already named after the expected slug of a changed post are
+    parsed as well, so duplicate slugs are still caught without a full scan.
+    """
+    blog_dirs = affected_blog_dirs(paths, blog_path)
+    records = scan_posts(blog_path, workers, blog_dirs, cache)
+    scanned = {record.blog_dir for record in records}
+    neighbours = [
+        Path(blog_path) / record.expected_dirname
+        for record in records
+        if record.expected_dirname
+    ]
+    neighbours = sorted({d for d in neighbours if d not in scanned and d.is_dir()})
+    return records + scan_posts(blog_path, workers, neighbours, cache)
+
+
+def check_blog_titles(
+    blog_path=blog_path, fix=False, workers=None, paths=None, cache_path=None
+):
+    """
+    Check that the folder name matches the title in the contents.lr file.
+    The folder name should be the title in slugified form.
+    If fix is True, the folder name will be changed to match the title.
+
+    Every contents.lr is parsed once, then all CHECKS run on the parsed
+    records: slug vs title, duplicate slugs, missing main image and
+    malformed pub_date.
+
+    If paths is given, only the blog posts containing those paths are
+    checked, otherwise the whole blog is scanned.
+
+    If cache_path is given, parsed posts are cached there between runs.
+    """
+    cache = PostCache(cache_path)
+    if paths is None:
+        records = scan_posts(blog_path, workers, cache=cache)
+        cache.evict(blog_path, keep={str(r.blog_dir / "contents.lr") for r in records})
+    else:
+        records = scan_changed_posts(paths, blog_path, workers, cache)
+        cache.evict(blog_path, blog_dirs=touched_blog_dirs(paths, blog_path))
+
+    errors = run_checks(records)
+    for message in errors:
+        print(message)
 
-    return FAIL if should_fail else PASS
+    if fix and errors:
+        fix_slugs(records, cache)
+        errors = run_checks(records)
+
+    cache.save()
+    return FAIL if errors else PASS
 
 
 def main(argv=None):
@@ -63,8 +365,44 @@ def main(argv=None):
         action="store_true",
         help="Automatically rename folders to match titles",
     )
-    args = parser.parse_args()
-    return check_blog_titles(args.path, args.fix)
+    parser.add_argument(
+        "paths",
+        nargs="*",
+        help="Changed files, only the blog posts containing them are checked",
+    )
+    parser.add_argument(
+        "--changed",
+        nargs="?",
+        const="",
+        metavar="REF",
+        help="Check blog posts changed since REF according to git (default: staged)",
+    )
+    parser.add_argument(
+        "--cache",
+        default=cache_path,
+        help="Path to the cache of parsed blog posts",
+    )
+    parser.add_argument(
+        "--no-cache",
+        dest="cache",
+        action="store_const",
+        const=None,
+        help="Parse every blog post without reading or writing the cache",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Number of threads used to parse blog posts",
+    )
+    args = parser.parse_args(argv)
+
+    paths = None
+    if args.changed is not None:
+        paths = changed_paths(args.changed) + args.paths
+    elif args.paths:
+        paths = args.paths
+    return check_blog_titles(args.path, args.fix, args.workers, paths, args.cache)
 
 
 if __name__ == "__main__":
@@ -2,7 +2,8 @@ import pytest
 from pathlib import Path
 import shutil
 import tempfile
-from check_blog_titles import PASS, FAIL, check_blog_titles
+import check_blog_titles as check_blog_titles_module
+from check_blog_titles import PASS, FAIL, PostCache, check_blog_titles, parse_post
 
 
 @pytest.fixture
@@ -38,3 +39,102 @@ def test_fix_folder_name(test_dir):
     assert result == PASS
     assert not original_dir.exists()
     assert (test_dir / "my-first-post").exists()
+
+
+def test_duplicate_slugs(test_dir):
+    create_test_blog(test_dir, "my-first-post", "My First Post")
+    create_test_blog(test_dir, "my-first-post-2", "My first post")
+    result = check_blog_titles(test_dir)
+    assert result == FAIL
+
+
+def test_fix_does_not_overwrite_existing_folder(test_dir):
+    create_test_blog(test_dir, "my-first-post", "My First Post")
+    duplicate_dir = create_test_blog(test_dir, "wrong-name", "My First Post")
+    result = check_blog_titles(test_dir, fix=True)
+    assert result == FAIL
+    assert duplicate_dir.exists()
+
+
+def test_missing_main_image(test_dir):
+    blog_dir = create_test_blog(test_dir, "my-first-post", "My First Post")
+    with open(blog_dir / "contents.lr", "a") as f:
+        f.write("---\nmain_image: image.png\n")
+    assert check_blog_titles(test_dir) == FAIL
+
+    (blog_dir / "image.png").touch()
+    assert check_blog_titles(test_dir) == PASS
+
+
+def test_malformed_pub_date(test_dir):
+    blog_dir = create_test_blog(test_dir, "my-first-post", "My First Post")
+    with open(blog_dir / "contents.lr", "a") as f:
+        f.write("---\npub_date: 2025-13-01\n")
+    result = check_blog_titles(test_dir)
+    assert result == FAIL
+
+
+def test_parse_post_fields(test_dir):
+    blog_dir = create_test_blog(test_dir, "my-first-post", "My First Post")
+    with open(blog_dir / "contents.lr", "a") as f:
+        f.write("---\npub_date: 2025-01-31\n---\nbody:\n\nHello\n")
+    record = parse_post(blog_dir)
+    assert record.title == "My First Post"
+    assert record.pub_date == "2025-01-31"
+    assert record.main_image is None
+    assert record.expected_dirname == "my-first-post"
+
+
+def test_only_changed_posts_are_checked(test_dir):
+    create_test_blog(test_dir, "wrong-name", "My First Post")
+    changed_dir = create_test_blog(test_dir, "my-second-post", "My Second Post")
+    paths = [changed_dir / "contents.lr", "README.md"]
+    assert check_blog_titles(test_dir, paths=paths) == PASS
+    assert check_blog_titles(test_dir, paths=[]) == PASS
+    assert check_blog_titles(test_dir) == FAIL
+
+
+def test_changed_post_with_taken_slug(test_dir):
+    create_test_blog(test_dir, "my-first-post", "My First Post")
+    changed_dir = create_test_blog(test_dir, "wrong-name", "My First Post")
+    result = check_blog_titles(test_dir, paths=[changed_dir / "contents.lr"])
+    assert result == FAIL
+
+
+def test_cache_skips_unchanged_posts(test_dir, monkeypatch):
+    cache_file = test_dir / "cache.json"
+    blog_path = test_dir / "blog"
+    create_test_blog(blog_path, "my-first-post", "My First Post")
+    assert check_blog_titles(blog_path, cache_path=cache_file) == PASS
+    assert cache_file.exists()
+
+    def fail_parse(blog_dir):
+        raise AssertionError(f"{blog_dir} should be read from the cache")
+
+    monkeypatch.setattr(check_blog_titles_module, "parse_post", fail_parse)
+    assert check_blog_titles(blog_path, cache_path=cache_file) == PASS
+
+
+def test_cache_detects_changed_title(test_dir):
+    cache_file = test_dir / "cache.json"
+    blog_path = test_dir / "blog"
+    blog_dir = create_test_blog(blog_path, "my-first-post", "My First Post")
+    assert check_blog_titles(blog_path, cache_path=cache_file) == PASS
+
+    with open(blog_dir / "contents.lr", "w") as f:
+        f.write("title: My Renamed Post\n")
+    assert check_blog_titles(blog_path, cache_path=cache_file) == FAIL
+
+
+def test_cache_follows_fix_and_evicts_deleted_posts(test_dir):
+    cache_file = test_dir / "cache.json"
+    blog_path = test_dir / "blog"
+    create_test_blog(blog_path, "wrong-name", "My First Post")
+    deleted_dir = create_test_blog(blog_path, "my-second-post", "My Second Post")
+    assert check_blog_titles(blog_path, fix=True, cache_path=cache_file) == PASS
+
+    shutil.rmtree(deleted_dir)
+    assert check_blog_titles(blog_path, cache_path=cache_file) == PASS
+    assert set(PostCache(cache_file).entries) == {
+        str(blog_path / "my-first-post" / "contents.lr")
+    }
@@ -0,0 +1,282 @@
+#!/usr/bin/env python
+
+import sys
+import argparse
+import datetime
+import os
+import random
+import shutil
+from pathlib import Path
+from slugify import slugify
+from lektor_record import format_record, read_record
+
+PASS = 0
+FAIL = 1
+project_path = "kutubuku"
+BLOG_DIR = "content/blog"
+# Build output is not part of a generated project.
+IGNORED = ("public", "dist")
+FENCE = "```"
+PRESETS = {"1k": 1000, "10k": 10000, "50k": 50000}
+ATTACHMENTS = ("link", "copy", "none")
+
+
+def parse_count(value):
+    """
+    Parse a number of posts, either a number or one of the PRESETS.
+    """
+    if value in PRESETS:
+        return PRESETS[value]
+    try:
+        return int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            f"expected a number or one of {', '.join(PRESETS)}, got {value!r}"
+        )
+
+
+def load_posts(blog_path):
+    """
+    Return (slug, fields) of every post in blog_path, sorted by slug.
+    """
+    return [
+        (path.parent.name, read_record(path))
+        for path in sorted(Path(blog_path).glob("*/contents.lr"))
+    ]
+
+
+def attachments_of(post_path):
+    """
+    Return the attachments of a post, every file next to its contents.lr.
+    """
+    return sorted(
+        path
+        for path in Path(post_path).iterdir()
+        if path.is_file() and path.name != "contents.lr"
+    )
+
+
+def copy_attachments(post_path, clone_path, mode="link"):
+    """
+    Copy the attachments of a post into clone_path. Hard links keep large
+    archives cheap on disk and still look like separate files to Lektor.
+    """
+    for path in attachments_of(post_path) if mode != "none" else []:
+        target = clone_path / path.name
+        if mode == "link":
+            try:
+                os.link(path, target)
+                continue
+            except OSError:
+                pass
+        shutil.copy2(path, target)
+
+
+def split_blocks(body):
+    """
+    Split a Markdown body into blocks separated by blank lines, keeping
+    fenced code blocks whole.
+    """
+    blocks = []
+    lines = []
+    fenced = False
+    for line in body.split("\n"):
+        if line.lstrip().startswith(FENCE):
+            fenced = not fenced
+        if not line.strip() and not fenced:
+            if lines:
+                blocks.append("\n".join(lines))
+                lines = []
+            continue
+        lines.append(line)
+    if lines:
+        blocks.append("\n".join(lines))
+    return blocks
+
+
+def mutate_body(body, rng, size=None):
+    """
+    Return a variant of body made of a random selection of its blocks, in
+    their original order. Without a size it is between half and one and a
+    half times as long, otherwise blocks are added until it is about size
+    characters long, repeating blocks for posts shorter than that.
+    """
+    blocks = split_blocks(body)
+    if not blocks:
+        return body
+    if size is None:
+        count = max(1, round(len(blocks) * rng.uniform(0.5, 1.5)))
+        indexes = sorted(rng.choices(range(len(blocks)), k=count))
+        return "\n\n".join(blocks[i] for i in indexes)
+
+    selected = []
+    length = 0
+    keep = min(1.0, size / max(len(body), 1))
+    while length < size:
+        for block in blocks:
+            if length >= size:
+                break
+            if rng.random() < keep:
+                length += len(block) + (2 if selected else 0)
+                selected.append(block)
+    return "\n\n".join(selected)
+
+
+def body_sizes(posts):
+    """
+    Return the body lengths of the posts, to draw realistic sizes from.
+    """
+    return [len(fields["body"]) for _, fields in posts if fields.get("body")]
+
+
+def pub_dates(count, rng, years=10, end_date=datetime.date(2026, 1, 1)):
+    """
+    Return count publication dates over the given number of years before
+    end_date. Posting picks up over time like on a growing blog, so recent
+    years have more posts than early ones.
+    """
+    days = years * 365
+    return [
+        end_date - datetime.timedelta(days=days - int(rng.triangular(0, days, days)))
+        for _ in range(count)
+    ]
+
+
+def clone_post(fields, number, pub_date, rng, size=None, keep_image=False):
+    """
+    Return the slug and fields of clone number of a post.
+    Clones are named after the post, so their slugs pass the title check.
+    The main image is kept only if keep_image, when the attachments of the
+    post are cloned with it.
+    """
+    fields = dict(fields)
+    fields["title"] = f"{fields['title']} {number}"
+    fields["pub_date"] = pub_date.isoformat()
+    if not keep_image:
+        fields.pop("main_image", None)
+    if "body" in fields:
+        fields["body"] = mutate_body(fields["body"], rng, size)
+    return slugify(fields["title"]), fields
+
+
+def copy_project(project_path, output_path):
+    """
+    Copy the Lektor project to output_path without its blog posts and
+    build output.
+    """
+    project_path = Path(project_path)
+    blog_path = project_path / BLOG_DIR
+
+    def ignore(directory, names):
+        if Path(directory) == project_path:
+            return [name for name in names if name in IGNORED]
+        if Path(directory) == blog_path:
+            return [name for name in names if (blog_path / name).is_dir()]
+        return []
+
+    shutil.copytree(project_path, output_path, ignore=ignore)
+
+
+def generate_archive(
+    output_path,
+    count,
+    project_path=project_path,
+    seed=0,
+    years=10,
+    end_date=datetime.date(2026, 1, 1),
+    attachments="none",
+    realistic=False,
+):
+    """
+    Generate a copy of the Lektor project in output_path with count posts
+    cloned from its real posts. Clones get publication dates spread over the
+    given number of years before end_date and a mutated body.
+
+    attachments is one of ATTACHMENTS, how the attachments of a post are
+    cloned with it. If realistic, body sizes are drawn from the sizes of
+    the real posts and publication dates get denser towards end_date,
+    otherwise dates are uniform and bodies are reshuffled.
+    Returns {slug: slug of the post it was cloned from}.
+    """
+    output_path = Path(output_path)
+    if output_path.exists():
+        shutil.rmtree(output_path)
+    copy_project(project_path, output_path)
+
+    rng = random.Random(seed)
+    blog_path = Path(project_path) / BLOG_DIR
+    posts = load_posts(blog_path)
+    sizes = body_sizes(posts)
+    if realistic:
+        dates = pub_dates(count, rng, years, end_date)
+    else:
+        dates = [
+            end_date - datetime.timedelta(days=rng.randrange(years * 365))
+            for _ in range(count)
+        ]
+
+    sources = {}
+    for i in range(count):
+        source, fields = posts[i % len(posts)]
+        size = rng.choice(sizes) if realistic and sizes else None
+        slug, fields = clone_post(
+            fields,
+            i // len(posts) + 1,
+            dates[i],
+            rng,
+            size,
+            keep_image=attachments != "none",
+        )
+        post_path = output_path / BLOG_DIR / slug
+        post_path.mkdir()
+        (post_path / "contents.lr").write_text(format_record(fields))
+        copy_attachments(blog_path / source, post_path, attachments)
+        sources[slug] = source
+    return sources
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Generate a Lektor project with a large synthetic blog archive"
+    )
+    parser.add_argument("output", help="Path to write the generated project to")
+    parser.add_argument(
+        "--count",
+        type=parse_count,
+        default=PRESETS["1k"],
+        help=f"Number of posts or one of the presets {', '.join(PRESETS)}",
+    )
+    parser.add_argument(
+        "--project", default=project_path, help="Path to the Lektor project to clone"
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    parser.add_argument(
+        "--years", type=int, default=10, help="Years the publication dates span"
+    )
+    parser.add_argument(
+        "--attachments",
+        choices=ATTACHMENTS,
+        default="link",
+        help="Hard link, copy or leave out the attachments of cloned posts",
+    )
+    parser.add_argument(
+        "--uniform",
+        action="store_true",
+        help="Reshuffle bodies and spread dates uniformly instead of realistically",
+    )
+    args = parser.parse_args(argv)
+    sources = generate_archive(
+        args.output,
+        args.count,
+        args.project,
+        args.seed,
+        args.years,
+        attachments=args.attachments,
+        realistic=not args.uniform,
+    )
+    print(f"Generated {len(sources)} post(s) in {args.output}")
+    return PASS
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,117 @@
+import pytest
+import datetime
+from pathlib import Path
+import random
+import shutil
+import tempfile
+from slugify import slugify
+from generate_archive import (
+    PRESETS,
+    clone_post,
+    generate_archive,
+    mutate_body,
+    parse_count,
+    pub_dates,
+    split_blocks,
+)
+from lektor_record import read_record
+
+
+@pytest.fixture
+def test_dir():
+    temp_dir = Path(tempfile.mkdtemp())
+    yield temp_dir
+    shutil.rmtree(temp_dir)
+
+
+def create_test_project(base_dir: Path) -> Path:
+    project_dir = base_dir / "project"
+    (project_dir / "templates").mkdir(parents=True)
+    (project_dir / "public").mkdir()
+    (project_dir / "project.lektorproject").write_text("[project]\n")
+    (project_dir / "content" / "blog").mkdir(parents=True)
+    (project_dir / "content" / "blog" / "contents.lr").write_text("_model: blog\n")
+    for slug, title in [("first-post", "First Post"), ("second-post", "Second Post")]:
+        (project_dir / "content" / "blog" / slug).mkdir()
+        (project_dir / "content" / "blog" / slug / "contents.lr").write_text(
+            f"title: {title}\n---\npub_date: 2024-01-01\n---\nmain_image: a.png\n"
+            "---\nbody:\n\nIntro.\n\n```\ncode\n\nmore code\n```\n\nOutro.\n"
+        )
+    (project_dir / "content" / "blog" / "first-post" / "a.png").write_bytes(b"png")
+    return project_dir
+
+
+def test_split_blocks_keeps_code_blocks_whole():
+    body = "One\ntwo\n\n\n```\na\n\nb\n```\n\nThree"
+    assert split_blocks(body) == ["One\ntwo", "```\na\n\nb\n```", "Three"]
+
+
+def test_parse_count():
+    assert parse_count("10k") == PRESETS["10k"] == 10000
+    assert parse_count("250") == 250
+    with pytest.raises(Exception, match="expected a number"):
+        parse_count("many")
+
+
+def test_mutate_body_to_size():
+    body = "\n\n".join(f"Block {i}." for i in range(10))
+    assert len(mutate_body(body, random.Random(0), size=500)) >= 500
+    assert len(mutate_body(body, random.Random(0), size=30)) < len(body)
+
+
+def test_pub_dates_are_denser_recently():
+    dates = pub_dates(1000, random.Random(0), years=10)
+    recent = sum(date.year >= 2021 for date in dates)
+    assert all(
+        datetime.date(2016, 1, 1) <= date <= datetime.date(2026, 1, 1) for date in dates
+    )
+    assert recent > 600
+
+
+def test_clone_post():
+    fields = {"title": "Don't panic", "main_image": "a.png", "body": "A\n\nB"}
+    slug, clone = clone_post(fields, 3, datetime.date(2020, 5, 1), random.Random(0))
+    assert clone["title"] == "Don't panic 3"
+    assert slug == slugify(clone["title"]) == "don-t-panic-3"
+    assert clone["pub_date"] == "2020-05-01"
+    assert "main_image" not in clone
+    assert fields["title"] == "Don't panic"
+
+
+def test_generate_archive(test_dir):
+    project_dir = create_test_project(test_dir)
+    output_dir = test_dir / "archive"
+    sources = generate_archive(output_dir, 5, project_dir)
+
+    assert sources == {
+        "first-post-1": "first-post",
+        "second-post-1": "second-post",
+        "first-post-2": "first-post",
+        "second-post-2": "second-post",
+        "first-post-3": "first-post",
+    }
+    assert not (output_dir / "public").exists()
+    assert (output_dir / "content" / "blog" / "contents.lr").exists()
+    assert not (output_dir / "content" / "blog" / "first-post").exists()
+    for slug in sources:
+        fields = read_record(output_dir / "content" / "blog" / slug / "contents.lr")
+        assert slugify(fields["title"]) == slug
+        assert fields["body"].count("```") % 2 == 0
+
+    assert generate_archive(output_dir, 5, project_dir) == sources
+
+
+def test_generate_archive_with_attachments(test_dir):
+    project_dir = create_test_project(test_dir)
+    output_dir = test_dir / "archive"
+    sources = generate_archive(
+        output_dir, 4, project_dir, attachments="link", realistic=True
+    )
+
+    blog_dir = output_dir / "content" / "blog"
+    for slug, source in sources.items():
+        fields = read_record(blog_dir / slug / "contents.lr")
+        assert fields["main_image"] == "a.png"
+        assert (blog_dir / slug / "a.png").exists() == (source == "first-post")
+    original = project_dir / "content" / "blog" / "first-post" / "a.png"
+    assert (blog_dir / "first-post-1" / "a.png").stat().st_ino == original.stat().st_ino
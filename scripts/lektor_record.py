@@ -0,0 +1,159 @@
+#!/usr/bin/env python
+"""
+Streaming reader for Lektor contents.lr records.
+
+A record is a list of fields separated by lines of three dashes. A field is
+either a single line `key: value` or a `key:` line followed by a block of
+lines that runs until the next separator. Lines made only of dashes inside a
+block are escaped with one extra dash.
+
+The reader yields fields as soon as they are complete and stops reading the
+file once the caller has every field it asked for, so validating the
+metadata of a post does not load its (possibly long) body.
+"""
+
+import sys
+import argparse
+from typing import NamedTuple, Optional
+
+FIELD_SEPARATOR = "---"
+
+
+class Field(NamedTuple):
+    """
+    A field of a Lektor record. start and end are the byte offsets of the
+    value in the file. value is None for fields that were not asked for.
+    """
+
+    name: str
+    value: Optional[str]
+    start: int
+    end: int
+
+
+def _is_dashes(line):
+    line = line.strip()
+    return len(line) >= 3 and line == "-" * len(line)
+
+
+def _unescape(lines):
+    value = "".join(line[1:] if _is_dashes(line) else line for line in lines)
+    if value.endswith("\n"):
+        value = value[:-1]
+    return value
+
+
+def tokenize(f, fields=None):
+    """
+    Lazily split a binary file object in the Lektor record format into Fields.
+    If fields is given, the values of other fields are skipped without being
+    kept in memory and yielded as None.
+    """
+    name = None
+    lines = []
+    wanted = False
+    want_newline = False
+    start = offset = 0
+
+    for raw in f:
+        line_start, offset = offset, offset + len(raw)
+        line = raw.decode("utf-8", "replace").rstrip("\r\n") + "\n"
+
+        if line.rstrip() == FIELD_SEPARATOR:
+            want_newline = False
+            if name is not None:
+                yield Field(
+                    name, _unescape(lines) if wanted else None, start, line_start
+                )
+                name = None
+        elif name is not None:
+            if want_newline:
+                want_newline = False
+                if not line.strip():
+                    start = offset
+                    continue
+            if wanted:
+                lines.append(line)
+        else:
+            key, sep, rest = line.partition(":")
+            if not sep:
+                continue
+            name = key.strip()
+            wanted = fields is None or name in fields
+            lines = []
+            first = rest.strip("\t ")
+            if first.strip():
+                start = line_start + len(raw.partition(b":")[0]) + 1
+                lines.append(first)
+            else:
+                start = offset
+                want_newline = True
+
+    if name is not None:
+        yield Field(name, _unescape(lines) if wanted else None, start, offset)
+
+
+def read_fields(path, fields=None):
+    """
+    Yield (field, value) pairs of the record at path.
+    If fields is given, only those fields are yielded and reading stops as
+    soon as all of them have been seen.
+    """
+    if fields is None:
+        remaining = None
+    else:
+        fields = frozenset(fields)
+        remaining = set(fields)
+    with open(path, "rb") as f:
+        for field in tokenize(f, fields):
+            if remaining is None:
+                yield field.name, field.value
+                continue
+            if field.name not in remaining:
+                continue
+            remaining.discard(field.name)
+            yield field.name, field.value
+            if not remaining:
+                return
+
+
+def read_record(path, fields=None):
+    """
+    Read the record at path into a dict of field values.
+    Fields missing from the record are missing from the dict.
+    """
+    return dict(read_fields(path, fields))
+
+
+def format_record(fields):
+    """
+    Format a dict of field values as a Lektor record. Multi-line values are
+    written as blocks, with lines made only of dashes escaped.
+    """
+    chunks = []
+    for name, value in fields.items():
+        if "\n" in value:
+            lines = value.split("\n")
+            value = "\n".join(
+                "-" + line if _is_dashes(line) else line for line in lines
+            )
+            chunks.append(f"{name}:\n\n{value}\n")
+        else:
+            chunks.append(f"{name}: {value}\n")
+    return f"{FIELD_SEPARATOR}\n".join(chunks)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Print fields of a Lektor record")
+    parser.add_argument("path", help="Path to a contents.lr file")
+    parser.add_argument(
+        "fields", nargs="*", help="Fields to print (default: all fields)"
+    )
+    args = parser.parse_args(argv)
+    for name, value in read_fields(args.path, args.fields or None):
+        print(f"{name}: {value}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
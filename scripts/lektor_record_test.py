@@ -0,0 +1,99 @@
+import pytest
+from pathlib import Path
+import shutil
+import tempfile
+from lektor_record import format_record, read_fields, read_record, tokenize
+
+blog_path = Path(__file__).parent.parent / "kutubuku" / "content" / "blog"
+
+RECORD = """title: My First Post
+---
+pub_date: 2025-01-31
+---
+summary:
+
+First line
+----
+Second line
+---
+body:
+
+# Hello
+
+---- not a separator
+"""
+
+
+@pytest.fixture
+def test_file():
+    temp_dir = Path(tempfile.mkdtemp())
+    path = temp_dir / "contents.lr"
+    path.write_text(RECORD)
+    yield path
+    shutil.rmtree(temp_dir)
+
+
+def test_read_all_fields(test_file):
+    assert read_record(test_file) == {
+        "title": "My First Post",
+        "pub_date": "2025-01-31",
+        "summary": "First line\n---\nSecond line",
+        "body": "# Hello\n\n---- not a separator",
+    }
+
+
+def test_read_selected_fields(test_file):
+    assert list(read_fields(test_file, ["pub_date", "title"])) == [
+        ("title", "My First Post"),
+        ("pub_date", "2025-01-31"),
+    ]
+    assert read_record(test_file, ["main_image"]) == {}
+
+
+def test_field_offsets(test_file):
+    data = test_file.read_bytes()
+    with open(test_file, "rb") as f:
+        fields = {field.name: field for field in tokenize(f)}
+    body = fields["body"]
+    assert data[body.start : body.end] == b"# Hello\n\n---- not a separator\n"
+
+
+def test_format_record_roundtrip(test_file):
+    fields = read_record(test_file)
+    test_file.write_text(format_record(fields))
+    assert read_record(test_file) == fields
+    assert "First line\n----\nSecond line" in test_file.read_text()
+
+
+def test_tokenize_is_lazy():
+    def lines():
+        yield b"title: My First Post\n"
+        yield b"---\n"
+        raise AssertionError("read past the requested field")
+
+    field = next(tokenize(lines(), {"title"}))
+    assert (field.name, field.value) == ("title", "My First Post")
+
+
+def test_skipped_fields_have_no_value(test_file):
+    with open(test_file, "rb") as f:
+        fields = {field.name: field.value for field in tokenize(f, {"title"})}
+    assert fields == {
+        "title": "My First Post",
+        "pub_date": None,
+        "summary": None,
+        "body": None,
+    }
+
+
+@pytest.mark.parametrize(
+    "content_file", sorted(blog_path.glob("*/contents.lr")), ids=lambda p: p.parent.name
+)
+def test_matches_lektor(content_file):
+    metaformat = pytest.importorskip("lektor.metaformat")
+    with open(content_file, "rb") as f:
+        expected = {
+            key: "".join(lines)
+            for key, lines in metaformat.tokenize(f, encoding="utf-8")
+        }
+    assert read_record(content_file) == expected
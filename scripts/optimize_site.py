@@ -0,0 +1,497 @@
+#!/usr/bin/env python
+
+import sys
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import posixpath
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from urllib.parse import urljoin, urlsplit
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+PASS = 0
+FAIL = 1
+public_path = "kutubuku/public"
+dist_path = "kutubuku/dist"
+cache_path = ".cache/optimize_site.json"
+
+# Bump to reprocess every file after changing how files are transformed.
+VERSION = 1
+FINGERPRINT_DIR = "static"
+FINGERPRINT_EXTENSIONS = (
+    ".css",
+    ".js",
+    ".png",
+    ".jpg",
+    ".jpeg",
+    ".gif",
+    ".svg",
+    ".webp",
+    ".avif",
+    ".ico",
+    ".woff",
+    ".woff2",
+)
+COMPRESS_EXTENSIONS = (
+    ".html",
+    ".css",
+    ".js",
+    ".json",
+    ".xml",
+    ".svg",
+    ".txt",
+    ".wasm",
+    ".ico",
+)
+# Smaller files do not fit in fewer TCP packets once compressed.
+MIN_COMPRESS_SIZE = 256
+HASH_LENGTH = 10
+# Stylesheets trimmed to the selectors used by the pages of the site.
+TRIM_CSS = ("static/vendor/bootstrap.min.css",)
+# Classes that Bootstrap's JavaScript adds to the page at runtime.
+SAFELIST = (
+    "active",
+    "collapse",
+    "collapsing",
+    "disabled",
+    "fade",
+    "hiding",
+    "offcanvas-backdrop",
+    "show",
+    "showing",
+)
+# At-rules whose body is a list of rules that can be trimmed.
+NESTED_AT_RULES = ("@media", "@supports", "@layer", "@container")
+
+CSS_TOKENS = re.compile(r"(\"(?:\\.|[^\"\\])*\"|'(?:\\.|[^'\\])*')|/\*.*?\*/", re.S)
+HTML_RAW = re.compile(r"(<(pre|textarea|script|style)\b.*?</\2\s*>)", re.S | re.I)
+HTML_COMMENT = re.compile(r"<!--(?!\[if).*?-->", re.S)
+HTML_REFERENCE = re.compile(r"(\b(?:href|src)\s*=\s*)([\"'])(.*?)\2", re.I)
+CSS_REFERENCE = re.compile(r"(url\(\s*)([\"']?)(.*?)\2(\s*\))", re.I)
+HTML_CLASS = re.compile(r"\bclass\s*=\s*([\"'])(.*?)\1", re.S | re.I)
+HTML_ID = re.compile(r"\bid\s*=\s*([\"'])(.*?)\1", re.I)
+SELECTOR_IGNORED = re.compile(r"\[[^\]]*\]|:not\([^)]*\)")
+SELECTOR_CLASS = re.compile(r"\.(-?[_a-zA-Z][\w-]*)")
+SELECTOR_ID = re.compile(r"#(-?[_a-zA-Z][\w-]*)")
+
+
+def file_digest(data):
+    return hashlib.sha1(data).hexdigest()
+
+
+def minify_css(text):
+    """
+    Strip comments and insignificant whitespace from a stylesheet, leaving
+    string literals untouched.
+    """
+
+    def minify(part):
+        part = re.sub(r"\s+", " ", part)
+        part = re.sub(r"\s*([{};,>])\s*", r"\1", part)
+        return re.sub(r":\s+", ":", part)
+
+    parts = []
+    code = []
+    last = 0
+    for match in CSS_TOKENS.finditer(text):
+        code.append(text[last : match.start()])
+        last = match.end()
+        if match.group(1):
+            parts.extend([minify("".join(code)), match.group(1)])
+            code = []
+    code.append(text[last:])
+    parts.append(minify("".join(code)))
+    return "".join(parts).replace(";}", "}").strip()
+
+
+def minify_html(text):
+    """
+    Remove comments and collapse whitespace runs to a single space, or a
+    newline if the run spans lines, so inline content renders the same.
+    The contents of pre, textarea and script elements are kept as they are,
+    style elements are minified as CSS.
+    """
+    parts = []
+    for i, part in enumerate(HTML_RAW.split(text)):
+        kind = i % 3
+        if kind == 2:
+            continue
+        if kind == 1:
+            if part[:6].lower() == "<style":
+                start = part.index(">") + 1
+                end = part.lower().rindex("</style")
+                part = part[:start] + minify_css(part[start:end]) + part[end:]
+            parts.append(part)
+            continue
+        part = HTML_COMMENT.sub("", part)
+        part = re.sub(r"\s*\n\s*", "\n", part)
+        parts.append(re.sub(r"[ \t\r\f\v]+", " ", part))
+    return "".join(parts).strip() + "\n"
+
+
+def fingerprint_name(name, data):
+    """
+    Name of a file with the content hash of data before its extension,
+    e.g. static/style.css becomes static/style.3f2a9c1d0b.css.
+    """
+    stem, ext = posixpath.splitext(name)
+    return f"{stem}.{file_digest(data)[:HASH_LENGTH]}{ext}"
+
+
+def rewrite_references(text, base_url, assets, pattern=HTML_REFERENCE):
+    """
+    Point references to fingerprinted assets at their new name. Links are
+    resolved against base_url, the URL of the referencing file, and only the
+    file name is replaced, so relative links stay relative.
+    """
+
+    def rewrite(match):
+        value = match.group(3)
+        if urlsplit(value).scheme or value.startswith(("//", "#")):
+            return match.group(0)
+        path, _, suffix = value.partition("?")
+        path, hash_sign, fragment = path.partition("#")
+        target = assets.get(urlsplit(urljoin(base_url, path)).path)
+        if target is None:
+            return match.group(0)
+        head = path[: len(path) - len(posixpath.basename(path))]
+        value = head + posixpath.basename(target) + hash_sign + fragment
+        if suffix:
+            value += "?" + suffix
+        start, end = match.span(3)
+        return (
+            match.string[match.start() : start]
+            + value
+            + match.string[end : match.end()]
+        )
+
+    return pattern.sub(rewrite, text)
+
+
+def used_selectors(public_path):
+    """
+    Collect the classes and ids used by the pages in public_path, plus the
+    classes added at runtime listed in SAFELIST.
+    """
+    classes = set(SAFELIST)
+    ids = set()
+    for path in Path(public_path).rglob("*.html"):
+        text = path.read_text(encoding="utf-8")
+        for match in HTML_CLASS.finditer(text):
+            classes.update(match.group(2).split())
+        ids.update(match.group(2) for match in HTML_ID.finditer(text))
+    return {"classes": sorted(classes), "ids": sorted(ids)}
+
+
+def skip_string(css, i):
+    """
+    Return the index after the string literal starting at css[i].
+    """
+    quote = css[i]
+    i += 1
+    while i < len(css) and css[i] != quote:
+        i += 2 if css[i] == "\\" else 1
+    return i + 1
+
+
+def iter_rules(css):
+    """
+    Yield (prelude, body) of the top-level rules of a stylesheet without
+    comments. The body is None for statements such as @import.
+    """
+    i = 0
+    while i < len(css):
+        j = i
+        while j < len(css) and css[j] not in "{;":
+            j = skip_string(css, j) if css[j] in "\"'" else j + 1
+        if j >= len(css):
+            return
+        prelude = css[i:j].strip()
+        if css[j] == ";":
+            yield prelude, None
+            i = j + 1
+            continue
+        depth = 1
+        k = j + 1
+        while k < len(css) and depth:
+            if css[k] in "\"'":
+                k = skip_string(css, k)
+                continue
+            depth += {"{": 1, "}": -1}.get(css[k], 0)
+            k += 1
+        yield prelude, css[j + 1 : k - 1]
+        i = k
+
+
+def split_selectors(prelude):
+    """
+    Split a selector list on the commas that are not within parentheses.
+    """
+    selectors = []
+    depth = start = 0
+    for i, char in enumerate(prelude):
+        depth += {"(": 1, ")": -1}.get(char, 0)
+        if char == "," and depth == 0:
+            selectors.append(prelude[start:i])
+            start = i + 1
+    selectors.append(prelude[start:])
+    return [selector.strip() for selector in selectors]
+
+
+def trim_css(css, classes, ids):
+    """
+    Remove the selectors of a stylesheet that refer to a class or id not in
+    classes or ids, and the rules left without selectors. Selectors on
+    elements only, keyframes and font faces are kept.
+    """
+    css = CSS_TOKENS.sub(lambda match: match.group(1) or "", css)
+    rules = []
+    for prelude, body in iter_rules(css):
+        if body is None:
+            rules.append(f"{prelude};")
+        elif prelude.startswith(NESTED_AT_RULES):
+            body = trim_css(body, classes, ids)
+            if body:
+                rules.append(f"{prelude}{{{body}}}")
+        elif prelude.startswith("@"):
+            rules.append(f"{prelude}{{{body}}}")
+        else:
+            selectors = []
+            for selector in split_selectors(prelude):
+                tokens = SELECTOR_IGNORED.sub("", selector)
+                if all(c in classes for c in SELECTOR_CLASS.findall(tokens)) and all(
+                    i in ids for i in SELECTOR_ID.findall(tokens)
+                ):
+                    selectors.append(selector)
+            if selectors:
+                rules.append(f"{','.join(selectors)}{{{body}}}")
+    return "".join(rules)
+
+
+def url_of(name):
+    """
+    URL of the file at name, relative to the site root.
+    """
+    return "/" + name
+
+
+def transform(name, data, assets, used=None):
+    """
+    Minify HTML and CSS and rewrite their references to fingerprinted assets.
+    Stylesheets in TRIM_CSS are trimmed to the used selectors, if given.
+    Other files are returned unchanged.
+    """
+    if name.endswith(".html"):
+        text = rewrite_references(data.decode("utf-8"), url_of(name), assets)
+        return minify_html(text).encode("utf-8")
+    if name.endswith(".css"):
+        text = rewrite_references(
+            data.decode("utf-8"), url_of(name), assets, CSS_REFERENCE
+        )
+        if used is not None and name in TRIM_CSS:
+            text = trim_css(text, set(used["classes"]), set(used["ids"]))
+        return minify_css(text).encode("utf-8")
+    return data
+
+
+def fingerprint_assets(public_path, used=None):
+    """
+    Map the URL of every static asset to the URL of its fingerprinted copy.
+    Stylesheets are hashed last, after the assets they reference were
+    renamed, and are hashed as minified.
+    """
+    static_path = Path(public_path) / FINGERPRINT_DIR
+    files = sorted(
+        path
+        for path in static_path.rglob("*")
+        if path.is_file() and path.suffix.lower() in FINGERPRINT_EXTENSIONS
+    )
+    files.sort(key=lambda path: path.suffix.lower() == ".css")
+
+    assets = {}
+    for path in files:
+        name = path.relative_to(public_path).as_posix()
+        data = transform(name, path.read_bytes(), assets, used)
+        assets[url_of(name)] = url_of(fingerprint_name(name, data))
+    return assets
+
+
+def compress(path, data):
+    """
+    Write the .gz and .br siblings of path, unless compressing does not make
+    data smaller. Returns the size of the smallest sibling written.
+    """
+    outputs = [(".gz", gzip.compress(data, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        outputs.append((".br", brotli.compress(data, quality=11)))
+
+    smallest = len(data)
+    for suffix, compressed in outputs:
+        sibling = path + suffix
+        if len(compressed) < len(data):
+            with open(sibling, "wb") as f:
+                f.write(compressed)
+            smallest = min(smallest, len(compressed))
+        elif os.path.exists(sibling):
+            os.remove(sibling)
+    return smallest
+
+
+def compressed_names(name):
+    if not name.endswith(COMPRESS_EXTENSIONS):
+        return []
+    return [name + ".gz"] + ([name + ".br"] if brotli is not None else [])
+
+
+def process_file(job):
+    """
+    Transform, write and compress one file of the site.
+    Returns (output name, key, input bytes, output bytes, compressed bytes),
+    with compressed bytes None if the file was up to date.
+    """
+    public_path, dist_path, name, dist_name, assets, used, previous_key = job
+    with open(os.path.join(public_path, name), "rb") as f:
+        data = f.read()
+
+    key = file_digest(data)
+    if name.endswith((".html", ".css")):
+        context = json.dumps([assets, used], sort_keys=True)
+        key = file_digest(f"{key}{context}".encode())
+    key = f"{VERSION}-{brotli is not None}-{key}"
+    dist_file = os.path.join(dist_path, dist_name)
+    if key == previous_key and os.path.exists(dist_file):
+        return dist_name, key, len(data), None, None
+
+    output = transform(name, data, assets, used)
+    os.makedirs(os.path.dirname(dist_file), exist_ok=True)
+    with open(dist_file, "wb") as f:
+        f.write(output)
+    compressed = len(output)
+    if len(output) >= MIN_COMPRESS_SIZE:
+        if dist_name.endswith(COMPRESS_EXTENSIONS):
+            compressed = compress(dist_file, output)
+    else:
+        for sibling in compressed_names(dist_name):
+            if os.path.exists(os.path.join(dist_path, sibling)):
+                os.remove(os.path.join(dist_path, sibling))
+    return dist_name, key, len(data), len(output), compressed
+
+
+def optimize_site(
+    public_path=public_path, dist_path=dist_path, cache_path=cache_path, workers=None
+):
+    """
+    Write an optimized copy of the built site in public_path to dist_path:
+    HTML and CSS are minified, stylesheets in TRIM_CSS are trimmed to the
+    selectors used by the pages, static assets get content-hash file names
+    that the HTML and CSS refer to, and compressible files get .gz and .br
+    (if brotli is installed) siblings. Files are processed in a process
+    pool. Files whose input did not change since the last run, according to
+    the keys kept in cache_path, are not processed again, and files that
+    are no longer part of the site are removed from dist_path.
+    """
+    cache_path = Path(cache_path)
+    try:
+        previous = json.loads(cache_path.read_text())
+    except (OSError, ValueError):
+        previous = {}
+
+    started = time.perf_counter()
+    used = used_selectors(public_path)
+    assets = fingerprint_assets(public_path, used)
+    jobs = []
+    for path in sorted(Path(public_path).rglob("*")):
+        if not path.is_file():
+            continue
+        name = path.relative_to(public_path).as_posix()
+        dist_name = assets.get(url_of(name), url_of(name))[1:]
+        page_assets = assets if name.endswith((".html", ".css")) else {}
+        jobs.append(
+            (
+                str(public_path),
+                str(dist_path),
+                name,
+                dist_name,
+                page_assets,
+                used if name in TRIM_CSS else None,
+                previous.get(dist_name),
+            )
+        )
+
+    keys = {}
+    processed = input_bytes = output_bytes = compressed_bytes = 0
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for dist_name, key, input_size, output_size, compressed_size in executor.map(
+            process_file, jobs, chunksize=8
+        ):
+            keys[dist_name] = key
+            if output_size is None:
+                continue
+            processed += 1
+            input_bytes += input_size
+            output_bytes += output_size
+            compressed_bytes += compressed_size
+
+    expected = set(keys)
+    expected.update(sibling for name in keys for sibling in compressed_names(name))
+    removed = 0
+    for path in sorted(Path(dist_path).rglob("*"), reverse=True):
+        name = path.relative_to(dist_path).as_posix()
+        if path.is_file() and name not in expected:
+            path.unlink()
+            removed += 1
+        elif path.is_dir() and not any(path.iterdir()):
+            path.rmdir()
+
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = cache_path.with_suffix(".tmp")
+    tmp_path.write_text(json.dumps(keys))
+    os.replace(tmp_path, cache_path)
+
+    elapsed = time.perf_counter() - started
+    print(
+        f"Optimized {processed} file(s) in {elapsed:.2f}s, "
+        f"skipped {len(jobs) - processed} up to date, removed {removed}"
+    )
+    print(f"Fingerprinted {len(assets)} static asset(s)")
+    print(
+        f"Bytes: {input_bytes} -> {output_bytes} minified, "
+        f"{compressed_bytes} compressed"
+    )
+    return PASS
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Minify, fingerprint and precompress the built site"
+    )
+    parser.add_argument("--public", default=public_path, help="Path to the built site")
+    parser.add_argument(
+        "--dist", default=dist_path, help="Path to write the optimized site to"
+    )
+    parser.add_argument(
+        "--cache",
+        default=cache_path,
+        help="Path to keep the keys of processed files between runs",
+    )
+    parser.add_argument(
+        "--workers", type=int, default=None, help="Number of worker processes"
+    )
+    args = parser.parse_args(argv)
+    if not os.path.isdir(args.public):
+        print(f"Built site not found at {args.public}")
+        return FAIL
+    return optimize_site(args.public, args.dist, args.cache, args.workers)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,135 @@
+import pytest
+from pathlib import Path
+import gzip
+import shutil
+import tempfile
+from optimize_site import (
+    fingerprint_name,
+    minify_css,
+    minify_html,
+    optimize_site,
+    rewrite_references,
+    trim_css,
+    used_selectors,
+)
+
+
+@pytest.fixture
+def test_dir():
+    temp_dir = Path(tempfile.mkdtemp())
+    yield temp_dir
+    shutil.rmtree(temp_dir)
+
+
+def create_test_site(base_dir: Path) -> Path:
+    public_dir = base_dir / "public"
+    (public_dir / "static").mkdir(parents=True)
+    (public_dir / "blog" / "my-first-post").mkdir(parents=True)
+    (public_dir / "static" / "logo.png").write_bytes(b"\x89PNG logo")
+    (public_dir / "static" / "style.css").write_text(
+        "/* layout */\nbody {\n  color: red;\n  background: url('logo.png');\n}\n"
+    )
+    (public_dir / "index.html").write_text(
+        '<link rel="stylesheet" href="static/style.css">\n'
+        + "<p>hello   world</p>\n" * 50
+    )
+    (public_dir / "blog" / "my-first-post" / "index.html").write_text(
+        '<link rel="stylesheet" href="../../static/style.css?v=1">\n'
+        '<img src="https://example.com/static/style.css">\n'
+    )
+    return public_dir
+
+
+def test_minify_css_keeps_strings():
+    css = '/* comment */ a > b , c {\n  content: "a  ;  }" ;\n  color : red;\n}\n'
+    assert minify_css(css) == 'a>b,c{content:"a  ;  }";color :red}'
+
+
+def test_minify_html_keeps_preformatted_text():
+    html = "<p>a   b</p>\n\n  <!-- note -->\n<pre>x\n\n    y</pre>\n<style>\na { color: red; }\n</style>"
+    assert minify_html(html) == (
+        "<p>a b</p>\n<pre>x\n\n    y</pre>\n<style>a{color:red}</style>\n"
+    )
+
+
+def test_fingerprint_name():
+    name = fingerprint_name("static/style.css", b"body{}")
+    assert name.startswith("static/style.")
+    assert name.endswith(".css")
+    assert name != fingerprint_name("static/style.css", b"p{}")
+
+
+def test_rewrite_references_keeps_relative_links():
+    assets = {"/static/style.css": "/static/style.0123456789.css"}
+    html = (
+        '<link href="../static/style.css#x"><a href="https://x.org/static/style.css">'
+    )
+    assert rewrite_references(html, "/blog/index.html", assets) == (
+        '<link href="../static/style.0123456789.css#x">'
+        '<a href="https://x.org/static/style.css">'
+    )
+
+
+def test_trim_css():
+    css = (
+        "/* reboot */ :root{--bs-blue:#0d6efd}body{margin:0}"
+        ".btn,.card{padding:1px}.card .card-body{padding:2px}"
+        ".nav-link:not(.disabled){color:red}#offcanvas{width:1px}"
+        ".icon{background:url(\"data:image/svg+xml,%3csvg a='{'/%3e\")}"
+        "@media (min-width:576px){.card{margin:0}.btn{margin:1px}}"
+        "@keyframes spin{to{transform:rotate(360deg)}}"
+    )
+    assert trim_css(css, {"btn", "nav-link", "icon"}, set()) == (
+        ":root{--bs-blue:#0d6efd}body{margin:0}.btn{padding:1px}"
+        ".nav-link:not(.disabled){color:red}"
+        ".icon{background:url(\"data:image/svg+xml,%3csvg a='{'/%3e\")}"
+        "@media (min-width:576px){.btn{margin:1px}}"
+        "@keyframes spin{to{transform:rotate(360deg)}}"
+    )
+
+
+def test_used_selectors(test_dir):
+    (test_dir / "index.html").write_text(
+        '<nav class="navbar  navbar-expand"><div id="menu" class="offcanvas">'
+    )
+    used = used_selectors(test_dir)
+    assert {"navbar", "navbar-expand", "offcanvas", "show"} <= set(used["classes"])
+    assert used["ids"] == ["menu"]
+
+
+def test_optimize_site(test_dir):
+    public_dir = create_test_site(test_dir)
+    dist_dir = test_dir / "dist"
+    cache_path = test_dir / "cache.json"
+    optimize_site(public_dir, dist_dir, cache_path, workers=1)
+
+    assert not (dist_dir / "static" / "style.css").exists()
+    (css,) = (dist_dir / "static").glob("style.*.css")
+    (logo,) = (dist_dir / "static").glob("logo.*.png")
+    assert css.read_text() == f"body{{color:red;background:url('{logo.name}')}}"
+
+    index = (dist_dir / "index.html").read_text()
+    assert f'href="static/{css.name}"' in index
+    assert "<p>hello world</p>" in index
+    assert gzip.decompress((dist_dir / "index.html.gz").read_bytes()).decode() == index
+
+    post = (dist_dir / "blog" / "my-first-post" / "index.html").read_text()
+    assert f'href="../../static/{css.name}?v=1"' in post
+    assert 'src="https://example.com/static/style.css"' in post
+
+
+def test_optimize_site_removes_stale_files(test_dir, capsys):
+    public_dir = create_test_site(test_dir)
+    dist_dir = test_dir / "dist"
+    cache_path = test_dir / "cache.json"
+    optimize_site(public_dir, dist_dir, cache_path, workers=1)
+    (old_css,) = (dist_dir / "static").glob("style.*.css")
+
+    (public_dir / "static" / "style.css").write_text("body { color: blue; }\n")
+    capsys.readouterr()
+    optimize_site(public_dir, dist_dir, cache_path, workers=1)
+    assert "skipped 1 up to date, removed 1" in capsys.readouterr().out
+
+    (new_css,) = (dist_dir / "static").glob("style.*.css")
+    assert new_css != old_css
+    assert new_css.name in (dist_dir / "index.html").read_text()
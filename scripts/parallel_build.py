@@ -0,0 +1,364 @@
+#!/usr/bin/env python
+
+import sys
+import argparse
+import os
+import sqlite3
+import time
+import zlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from lektor.builder import Builder, PathCache
+from lektor.db import Page
+from lektor.project import Project
+from lektor.utils import prune_file_and_folder
+from search_index import update_index
+
+PASS = 0
+FAIL = 1
+project_path = "kutubuku"
+output_path = "kutubuku/public"
+buildstate_path = ".cache/build_site/buildstate"
+index_cache_path = ".cache/search_index"
+
+BLOG_PATH = "/blog"
+# Posts are spread over a fixed number of shards, so a post is built by the
+# same shard and checked against the same build state whatever the number of
+# workers.
+SHARDS = 16
+
+
+def available_cores():
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def record_paths(project_path):
+    """
+    Return the sorted Lektor paths of the records of the project, from the
+    directories of its content holding a contents.lr.
+    """
+    content_path = Path(project_path) / "content"
+    return sorted(
+        "/" + "/".join(contents.parent.relative_to(content_path).parts)
+        for contents in content_path.rglob("contents.lr")
+    )
+
+
+def split_shards(paths, shards=SHARDS):
+    """
+    Split record paths into the shards built in parallel and the records
+    built last. Every post and its sub pages go to the post shard picked by
+    the hash of its slug, the blog goes last as its listings depend on all
+    posts and every other page goes to the pages shard.
+    Returns {shard name: paths} and the paths built last.
+    """
+    posts = {f"posts-{i:02d}": [] for i in range(shards)}
+    pages = []
+    last = []
+    for path in paths:
+        if path == BLOG_PATH:
+            last.append(path)
+        elif path.startswith(BLOG_PATH + "/"):
+            slug = path.split("/")[2]
+            posts[f"posts-{zlib.crc32(slug.encode()) % shards:02d}"].append(path)
+        else:
+            pages.append(path)
+    return {"pages": pages, **posts}, last
+
+
+class ShardBuilder(Builder):
+    """
+    Lektor builder of some records of a project, with their attachments and
+    generated pages, instead of the whole tree. Child pages are left to the
+    shard they belong to.
+    """
+
+    def build_sources(self, sources):
+        """
+        Build sources and what they own. Returns the number of failures and
+        the paths of the updated artifacts.
+        """
+        failures = 0
+        updated = []
+        path_cache = PathCache(self.env)
+        # Like build_all, a connection is kept open for the WAL handling.
+        con = self.connect_to_database()
+        try:
+            to_build = deque(sources)
+            while to_build:
+                source = to_build.popleft()
+                prog, build_state = self.build(source, path_cache=path_cache)
+                self.extend_build_queue(to_build, prog)
+                failures += len(build_state.failed_artifacts)
+                updated.extend(
+                    artifact.dst_filename for artifact in build_state.updated_artifacts
+                )
+        finally:
+            con.close()
+        return failures, updated
+
+    def extend_build_queue(self, queue, prog):
+        if not isinstance(prog.source, Page):
+            super().extend_build_queue(queue, prog)
+            return
+        for child in prog.iter_child_sources():
+            # Paginated pages share the path of their record.
+            if not isinstance(child, Page) or child.path == prog.source.path:
+                queue.append(child)
+        for func in self.env.custom_generators:
+            queue.extend(func(prog.source) or ())
+
+    def build_records(self, paths):
+        return self.build_sources(
+            record for record in map(self.pad.get, paths) if record is not None
+        )
+
+    def build_assets(self):
+        return self.build_sources(
+            root for root in self.pad.get_all_roots() if not isinstance(root, Page)
+        )
+
+
+def build_shard(env, output_path, buildstate_path, paths=None):
+    """
+    Build the records at paths, or the assets if paths is None, into
+    output_path with their own build state in buildstate_path.
+    """
+    # Lektor asks before building into a non empty directory with a new
+    # build state, which every shard but the first would do.
+    Path(buildstate_path).mkdir(parents=True, exist_ok=True)
+    builder = ShardBuilder(env.new_pad(), output_path, buildstate_path=buildstate_path)
+    if paths is None:
+        return builder.build_assets()
+    return builder.build_records(paths)
+
+
+# Environment of a worker process, made once by init_worker.
+_env = None
+
+
+def init_worker(project_path):
+    global _env
+    _env = Project.discover(project_path).make_env()
+
+
+def run_shard(output_path, buildstate_path, paths):
+    return build_shard(_env, output_path, buildstate_path, paths)
+
+
+def referenced_artifacts(project_path, buildstate_paths):
+    """
+    Names of the artifacts that any of the build states knows with a
+    primary source that still exists.
+    """
+    referenced = set()
+    for path in buildstate_paths:
+        database = Path(path) / "buildstate"
+        if not database.exists():
+            continue
+        con = sqlite3.connect(database)
+        try:
+            rows = con.execute(
+                "select artifact, source from artifacts where is_primary_source"
+            ).fetchall()
+        finally:
+            con.close()
+        referenced.update(
+            artifact
+            for artifact, source in rows
+            if os.path.exists(os.path.join(project_path, source))
+        )
+    return referenced
+
+
+def prune(env, output_path, buildstate_paths):
+    """
+    Remove the files of output_path that no build state references, like
+    Lektor's prune but across the build states of every shard.
+    Returns the names of the removed artifacts.
+    """
+    referenced = referenced_artifacts(env.root_path, buildstate_paths)
+    pruned = []
+    for dirpath, dirnames, filenames in os.walk(output_path):
+        dirnames[:] = [x for x in dirnames if not env.is_ignored_artifact(x)]
+        for filename in filenames:
+            if env.is_ignored_artifact(filename):
+                continue
+            full_path = os.path.join(dirpath, filename)
+            name = Path(full_path).relative_to(output_path).as_posix()
+            if name not in referenced:
+                prune_file_and_folder(full_path, output_path)
+                pruned.append(name)
+
+    for path in buildstate_paths:
+        database = Path(path) / "buildstate"
+        if not pruned or not database.exists():
+            continue
+        con = sqlite3.connect(database)
+        try:
+            con.executemany(
+                "delete from artifacts where artifact = ?", [(x,) for x in pruned]
+            )
+            con.commit()
+        finally:
+            con.close()
+    return sorted(pruned)
+
+
+def parallel_lektor_build(project_path, output_path, buildstate_path, workers=None):
+    """
+    Build the Lektor project into output_path on workers processes.
+
+    Posts are split into shards that are built in a process pool together
+    with a shard of the other pages and one of the assets. Every shard has
+    its own build state under buildstate_path, so shards never write to the
+    same database and a shard rebuilds only what changed. They share the
+    output directory, where Lektor writes every file aside and renames it
+    into place. The blog, whose listings depend on every post, is built
+    meanwhile in this process from the index made before the shards start.
+    Files no build state references are pruned at the end.
+    Returns the number of failures and the paths of the updated artifacts.
+    """
+    workers = workers or available_cores()
+    output_path = os.path.abspath(output_path)
+    buildstate_path = Path(buildstate_path)
+    shards, last = split_shards(record_paths(project_path))
+    jobs = {name: paths for name, paths in shards.items() if paths}
+    jobs["assets"] = None
+
+    # Creating the environment installs the local plugins if needed, before
+    # any worker loads them.
+    env = Project.discover(project_path).make_env()
+    last_buildstate = buildstate_path / "blog"
+    last_buildstate.mkdir(parents=True, exist_ok=True)
+    builder = ShardBuilder(
+        env.new_pad(), output_path, buildstate_path=str(last_buildstate)
+    )
+    # Plugins prepare whole site data, like the archive index and the image
+    # variants, once here instead of in every shard.
+    env.plugin_controller.emit("before-build-all", builder=builder)
+
+    failures = 0
+    updated = []
+    if workers == 1:
+        for name, paths in jobs.items():
+            shard_failures, shard_updated = build_shard(
+                env, output_path, str(buildstate_path / name), paths
+            )
+            failures += shard_failures
+            updated += shard_updated
+        shard_failures, shard_updated = builder.build_records(last)
+        failures += shard_failures
+        updated += shard_updated
+    else:
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=init_worker,
+            initargs=(project_path,),
+        ) as executor:
+            futures = [
+                executor.submit(
+                    run_shard, output_path, str(buildstate_path / name), paths
+                )
+                for name, paths in jobs.items()
+            ]
+            shard_failures, shard_updated = builder.build_records(last)
+            failures += shard_failures
+            updated += shard_updated
+            for future in futures:
+                shard_failures, shard_updated = future.result()
+                failures += shard_failures
+                updated += shard_updated
+    env.plugin_controller.emit("after-build-all", builder=builder)
+
+    buildstate_paths = [buildstate_path / name for name in [*jobs, "blog"]]
+    if not failures:
+        # Like Lektor's prune, plugins can drop artifacts of the blog build
+        # state first, like the archive index its obsolete listing pages.
+        env.plugin_controller.emit("before-prune", builder=builder, all=False)
+        prune(env, output_path, buildstate_paths)
+        env.plugin_controller.emit("after-prune", builder=builder, all=False)
+    return failures, updated
+
+
+def parallel_build(
+    project_path=project_path,
+    output_path=output_path,
+    buildstate_path=buildstate_path,
+    workers=None,
+    index=True,
+    index_cache_path=index_cache_path,
+):
+    """
+    Build the site on every core, see parallel_lektor_build, and update its
+    search index from the built pages.
+    """
+    workers = workers or available_cores()
+    print(f"Building on {workers} worker(s)...")
+    started = time.perf_counter()
+    failures, updated = parallel_lektor_build(
+        project_path, output_path, buildstate_path, workers
+    )
+    pages = sorted(p for p in updated if p.endswith(".html"))
+    print(
+        f"Updated {len(updated)} artifact(s), {len(pages)} page(s) "
+        f"in {time.perf_counter() - started:.1f}s"
+    )
+    if failures:
+        print(f"Build failed with {failures} failure(s)")
+        return FAIL
+
+    if index:
+        print("Indexing pages...")
+        return update_index(output_path, index_cache_path)
+    return PASS
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Build the Lektor site in parallel and update its search index"
+    )
+    parser.add_argument(
+        "--project", default=project_path, help="Path to the Lektor project"
+    )
+    parser.add_argument(
+        "--output", default=output_path, help="Path to the build output directory"
+    )
+    parser.add_argument(
+        "--buildstate",
+        default=buildstate_path,
+        help="Path to keep the build states of the shards between runs",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Number of worker processes (default: all available cores)",
+    )
+    parser.add_argument(
+        "--no-index",
+        dest="index",
+        action="store_false",
+        help="Do not update the search index",
+    )
+    parser.add_argument(
+        "--index-cache",
+        default=index_cache_path,
+        help="Path to keep the search index state between runs",
+    )
+    args = parser.parse_args(argv)
+    return parallel_build(
+        args.project,
+        args.output,
+        args.buildstate,
+        args.workers,
+        args.index,
+        args.index_cache,
+    )
+
+
+if __name__ == "__main__":
+    sys.exit(main())
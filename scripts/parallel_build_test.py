@@ -0,0 +1,109 @@
+import pytest
+from pathlib import Path
+import shutil
+import tempfile
+from lektor.builder import Builder
+from lektor.project import Project
+from parallel_build import parallel_lektor_build, record_paths, split_shards
+
+
+@pytest.fixture
+def test_dir():
+    temp_dir = Path(tempfile.mkdtemp())
+    yield temp_dir
+    shutil.rmtree(temp_dir)
+
+
+def create_test_project(base_dir: Path) -> Path:
+    project_dir = base_dir / "project"
+    files = {
+        "project.lektorproject": "[project]\nname = test\n",
+        "models/page.ini": "[model]\nname = Page\n\n[fields.title]\ntype = string\n",
+        "models/blog.ini": (
+            "[model]\nname = Blog\n\n[fields.title]\ntype = string\n\n"
+            "[children]\nmodel = blog-post\norder_by = title\n"
+        ),
+        "models/blog-post.ini": (
+            "[model]\nname = Blog Post\n\n[fields.title]\ntype = string\n"
+        ),
+        "templates/page.html": "{{ this.title }}",
+        "templates/blog-post.html": "{{ this.title }}",
+        "templates/blog.html": (
+            "{% for post in this.children %}{{ post.title }},{% endfor %}"
+        ),
+        "content/contents.lr": "title: Home\n",
+        "content/about/contents.lr": "title: About\n",
+        "content/blog/contents.lr": "_model: blog\n---\ntitle: Blog\n",
+        "assets/static/style.css": "body {}\n",
+    }
+    for slug in "abcdef":
+        files[f"content/blog/{slug}/contents.lr"] = f"title: {slug.upper()}\n"
+        files[f"content/blog/{slug}/notes.txt"] = f"Notes of {slug}\n"
+    for name, text in files.items():
+        (project_dir / name).parent.mkdir(parents=True, exist_ok=True)
+        (project_dir / name).write_text(text)
+    return project_dir
+
+
+def files_of(path):
+    return {
+        p.relative_to(path).as_posix(): p.read_bytes()
+        for p in path.rglob("*")
+        if p.is_file() and ".lektor" not in p.parts
+    }
+
+
+def test_record_paths(test_dir):
+    project_dir = create_test_project(test_dir)
+    paths = record_paths(project_dir)
+    assert paths[:3] == ["/", "/about", "/blog"]
+    assert paths[3:] == [f"/blog/{slug}" for slug in "abcdef"]
+
+
+def test_split_shards():
+    paths = ["/", "/about", "/blog", "/blog/a", "/blog/a/part", "/blog/b"]
+    shards, last = split_shards(paths, shards=4)
+    assert last == ["/blog"]
+    assert shards["pages"] == ["/", "/about"]
+    assert sorted(p for name, ps in shards.items() if name != "pages" for p in ps) == [
+        "/blog/a",
+        "/blog/a/part",
+        "/blog/b",
+    ]
+    assert any(shard[:2] == ["/blog/a", "/blog/a/part"] for shard in shards.values())
+    assert split_shards(paths, shards=4) == (shards, last)
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_parallel_build_matches_lektor(test_dir, workers):
+    project_dir = create_test_project(test_dir)
+    output_dir = test_dir / "public"
+    buildstate_dir = test_dir / "buildstate"
+    failures, updated = parallel_lektor_build(
+        project_dir, output_dir, buildstate_dir, workers
+    )
+    assert failures == 0
+
+    env = Project.discover(project_dir).make_env(load_plugins=False)
+    serial_dir = test_dir / "serial"
+    assert Builder(env.new_pad(), str(serial_dir)).build_all() == 0
+    assert files_of(output_dir) == files_of(serial_dir)
+    assert len(updated) == len(files_of(serial_dir))
+
+    assert parallel_lektor_build(project_dir, output_dir, buildstate_dir, workers) == (
+        0,
+        [],
+    )
+
+    shutil.rmtree(project_dir / "content" / "blog" / "b")
+    (project_dir / "content" / "blog" / "c" / "contents.lr").write_text("title: Zed\n")
+    failures, updated = parallel_lektor_build(
+        project_dir, output_dir, buildstate_dir, workers
+    )
+    assert failures == 0
+    assert sorted(Path(p).relative_to(output_dir).as_posix() for p in updated) == [
+        "blog/c/index.html",
+        "blog/index.html",
+    ]
+    assert not (output_dir / "blog" / "b").exists()
+    assert (output_dir / "blog" / "index.html").read_text().strip() == "A,D,E,F,Zed,"
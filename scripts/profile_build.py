@@ -0,0 +1,337 @@
+#!/usr/bin/env python
+
+import sys
+import argparse
+import datetime
+import json
+import os
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+from lektor.builder import Builder
+from lektor.pluginsystem import Plugin
+from lektor.project import Project
+
+project_path = "kutubuku"
+# The profiled build has an output of its own, apart from the site build.
+output_path = ".cache/build_profile/public"
+report_path = ".cache/build_profile"
+POST_MODEL = "blog-post"
+SORT_KEYS = ("seconds", "bytes", "template_seconds", "markdown_seconds")
+
+
+class ArtifactTiming:
+    """
+    Time spent building a single artifact, split into template rendering and
+    Markdown rendering. Markdown is rendered lazily from within templates, so
+    markdown_seconds is part of template_seconds.
+    """
+
+    def __init__(self, artifact_name, source, post):
+        self.artifact = artifact_name
+        self.source = source
+        self.post = post
+        self.seconds = 0.0
+        self.bytes = 0
+        self.templates = defaultdict(float)
+        self.markdown_seconds = 0.0
+
+    @property
+    def template_seconds(self):
+        return sum(self.templates.values())
+
+    def to_json(self):
+        return {
+            "artifact": self.artifact,
+            "source": self.source,
+            "post": self.post,
+            "seconds": self.seconds,
+            "bytes": self.bytes,
+            "template_seconds": self.template_seconds,
+            "markdown_seconds": self.markdown_seconds,
+            "templates": dict(self.templates),
+        }
+
+
+class ProfilerPlugin(Plugin):
+    """
+    Lektor plugin that times Markdown rendering through the markdown-meta
+    events emitted around every render.
+    """
+
+    name = "build profiler"
+    description = "Times Markdown rendering of the current artifact."
+
+    def __init__(self, env, id):
+        super().__init__(env, id)
+        self.builder = None
+        self.started = None
+
+    def on_markdown_meta_init(self, **extra):
+        self.started = time.perf_counter()
+
+    def on_markdown_meta_postprocess(self, **extra):
+        if self.started is not None and self.builder.current is not None:
+            self.builder.current.markdown_seconds += time.perf_counter() - self.started
+        self.started = None
+
+
+def post_of(source):
+    """
+    Return the path of the blog post a source belongs to, or None.
+    Attachments belong to the post they are attached to.
+    """
+    while source is not None:
+        datamodel = getattr(source, "datamodel", None)
+        if datamodel is not None and datamodel.id == POST_MODEL:
+            return source.path
+        source = getattr(source, "parent", None)
+    return None
+
+
+class ProfilingBuilder(Builder):
+    """
+    Lektor builder that records wall time, bytes written and template render
+    time of every artifact it builds.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.timings = []
+        self.current = None
+
+        render_template = self.env.render_template
+
+        def timed_render_template(name, *args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return render_template(name, *args, **kwargs)
+            finally:
+                if self.current is not None:
+                    self.current.templates[name] += time.perf_counter() - started
+
+        self.env.render_template = timed_render_template
+
+    def build_artifact(self, artifact, build_func):
+        if artifact.is_current:
+            return super().build_artifact(artifact, build_func)
+
+        source = artifact.source_obj
+        timing = ArtifactTiming(
+            artifact.artifact_name, getattr(source, "path", None), post_of(source)
+        )
+        self.current = timing
+        started = time.perf_counter()
+        try:
+            return super().build_artifact(artifact, build_func)
+        finally:
+            timing.seconds = time.perf_counter() - started
+            self.current = None
+            try:
+                timing.bytes = os.path.getsize(artifact.dst_filename)
+            except OSError:
+                pass
+            self.timings.append(timing)
+
+
+def summarize(timings, key, sort="seconds"):
+    """
+    Aggregate artifact timings by key ("post" or "template") and sort them,
+    slowest first.
+    """
+    groups = {}
+    for timing in timings:
+        if key == "template":
+            names = [(name, seconds) for name, seconds in timing.templates.items()]
+        elif timing.post is not None:
+            names = [(timing.post, timing.seconds)]
+        else:
+            names = []
+        for name, seconds in names:
+            group = groups.setdefault(
+                name,
+                {
+                    key: name,
+                    "seconds": 0.0,
+                    "bytes": 0,
+                    "template_seconds": 0.0,
+                    "markdown_seconds": 0.0,
+                    "artifacts": 0,
+                },
+            )
+            group["seconds"] += seconds
+            group["bytes"] += timing.bytes
+            group["template_seconds"] += timing.template_seconds
+            group["markdown_seconds"] += timing.markdown_seconds
+            group["artifacts"] += 1
+    return sorted(groups.values(), key=lambda g: g[sort], reverse=True)
+
+
+def find_regressions(report, previous, threshold=0.2, min_seconds=0.01):
+    """
+    Compare posts and templates against the previous report.
+    An entry regressed if it got slower by more than threshold (a fraction)
+    and by at least min_seconds.
+    """
+    regressions = []
+    for section, key in (("posts", "post"), ("templates", "template")):
+        before = {entry[key]: entry["seconds"] for entry in previous.get(section, [])}
+        for entry in report[section]:
+            old = before.get(entry[key])
+            if old is None:
+                continue
+            new = entry["seconds"]
+            if new - old >= min_seconds and new > old * (1 + threshold):
+                regressions.append(
+                    {
+                        key: entry[key],
+                        "previous_seconds": old,
+                        "seconds": new,
+                        "change": (new - old) / old if old else None,
+                    }
+                )
+    return regressions
+
+
+def format_report(report, top=10, sort="seconds"):
+    lines = [
+        f"Build profile {report['created']}",
+        f"Built {len(report['artifacts'])} artifact(s) in {report['seconds']:.3f}s, "
+        f"{report['bytes']} bytes written",
+        "",
+    ]
+    for section, key in (("posts", "post"), ("templates", "template")):
+        lines.append(f"Slowest {section} by {sort}:")
+        for entry in report[section][:top]:
+            lines.append(
+                f"  {entry['seconds']:8.3f}s {entry['bytes']:>10} B "
+                f"template {entry['template_seconds']:.3f}s "
+                f"markdown {entry['markdown_seconds']:.3f}s  {entry[key]}"
+            )
+        lines.append("")
+
+    lines.append(f"Slowest artifacts by {sort}:")
+    artifacts = sorted(report["artifacts"], key=lambda a: a[sort], reverse=True)
+    for entry in artifacts[:top]:
+        lines.append(
+            f"  {entry['seconds']:8.3f}s {entry['bytes']:>10} B  {entry['artifact']}"
+        )
+    lines.append("")
+
+    if report["regressions"]:
+        lines.append("Regressions against the previous build:")
+        for entry in report["regressions"]:
+            name = entry.get("post") or entry.get("template")
+            lines.append(
+                f"  {entry['previous_seconds']:.3f}s -> {entry['seconds']:.3f}s  {name}"
+            )
+    else:
+        lines.append("No regressions against the previous build.")
+    return "\n".join(lines) + "\n"
+
+
+def profile_build(
+    project_path=project_path,
+    output_path=output_path,
+    report_path=report_path,
+    top=10,
+    sort="seconds",
+    threshold=0.2,
+):
+    """
+    Build the Lektor project like `lektor build --output-path` does and write
+    a profile of the build to report_path as report.json and report.txt.
+    The previous report is kept as previous.json and compared against.
+    Returns the number of build failures.
+
+    The build starts from an empty build state in a temporary directory, so
+    every artifact is built and timed whatever was built before.
+    """
+    report_path = Path(report_path)
+    project = Project.discover(project_path)
+    env = project.make_env()
+    plugin_id = "build-profiler"
+    env.plugin_controller.instanciate_plugin(plugin_id, ProfilerPlugin)
+
+    with tempfile.TemporaryDirectory() as buildstate_path:
+        builder = ProfilingBuilder(
+            env.new_pad(), os.path.abspath(output_path), buildstate_path
+        )
+        env.plugins[plugin_id].builder = builder
+        started = time.perf_counter()
+        failures = builder.build_all()
+        seconds = time.perf_counter() - started
+
+    timings = builder.timings
+    if not timings:
+        # Keep the last report to compare the next build against.
+        print("Nothing was built, the reports are left unchanged.")
+        return failures
+    report = {
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "seconds": seconds,
+        "bytes": sum(timing.bytes for timing in timings),
+        "failures": failures,
+        "sort": sort,
+        "posts": summarize(timings, "post", sort),
+        "templates": summarize(timings, "template", sort),
+        "artifacts": sorted(
+            (timing.to_json() for timing in timings),
+            key=lambda a: a[sort],
+            reverse=True,
+        ),
+    }
+
+    json_path = report_path / "report.json"
+    previous_path = report_path / "previous.json"
+    try:
+        previous = json.loads(json_path.read_text())
+    except (OSError, ValueError):
+        previous = {}
+    report["regressions"] = find_regressions(report, previous, threshold)
+
+    report_path.mkdir(parents=True, exist_ok=True)
+    if json_path.exists():
+        os.replace(json_path, previous_path)
+    json_path.write_text(json.dumps(report, indent=2))
+    text = format_report(report, top, sort)
+    (report_path / "report.txt").write_text(text)
+    print(text, end="")
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Build the Lektor site and report where the build spends its time"
+    )
+    parser.add_argument(
+        "--project", default=project_path, help="Path to the Lektor project"
+    )
+    parser.add_argument(
+        "--output", default=output_path, help="Path to the build output directory"
+    )
+    parser.add_argument(
+        "--report", default=report_path, help="Directory to write the reports to"
+    )
+    parser.add_argument(
+        "--top", type=int, default=10, help="Number of slowest entries to show"
+    )
+    parser.add_argument(
+        "--sort", choices=SORT_KEYS, default="seconds", help="Sort entries by"
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.2,
+        help="Slowdown against the previous build flagged as a regression",
+    )
+    args = parser.parse_args(argv)
+    failures = profile_build(
+        args.project, args.output, args.report, args.top, args.sort, args.threshold
+    )
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,52 @@
+import pytest
+from profile_build import ArtifactTiming, find_regressions, summarize
+
+
+def create_timing(artifact, post, seconds, templates=None, markdown_seconds=0.0):
+    timing = ArtifactTiming(artifact, post, post)
+    timing.seconds = seconds
+    timing.bytes = 100
+    timing.templates.update(templates or {})
+    timing.markdown_seconds = markdown_seconds
+    return timing
+
+
+def test_summarize_posts():
+    timings = [
+        create_timing("blog/a/index.html", "/blog/a", 0.1, {"blog-post.html": 0.08}),
+        create_timing("blog/a/image.png", "/blog/a", 0.05),
+        create_timing("blog/b/index.html", "/blog/b", 0.2, {"blog-post.html": 0.15}),
+        create_timing("index.html", None, 0.3, {"page.html": 0.2}),
+    ]
+    posts = summarize(timings, "post")
+    assert [p["post"] for p in posts] == ["/blog/b", "/blog/a"]
+    assert posts[1]["seconds"] == pytest.approx(0.15)
+    assert posts[1]["bytes"] == 200
+    assert posts[1]["artifacts"] == 2
+
+
+def test_summarize_templates():
+    timings = [
+        create_timing("blog/a/index.html", "/blog/a", 0.1, {"blog-post.html": 0.08}),
+        create_timing("index.html", None, 0.3, {"page.html": 0.2}),
+    ]
+    templates = summarize(timings, "template")
+    assert [t["template"] for t in templates] == ["page.html", "blog-post.html"]
+    assert templates[0]["seconds"] == 0.2
+
+
+def test_find_regressions():
+    previous = {
+        "posts": [{"post": "/blog/a", "seconds": 0.1}],
+        "templates": [{"template": "blog.html", "seconds": 0.5}],
+    }
+    report = {
+        "posts": [
+            {"post": "/blog/a", "seconds": 0.2},
+            {"post": "/blog/new", "seconds": 1.0},
+        ],
+        "templates": [{"template": "blog.html", "seconds": 0.55}],
+    }
+    regressions = find_regressions(report, previous, threshold=0.2)
+    assert [r.get("post") or r.get("template") for r in regressions] == ["/blog/a"]
+    assert find_regressions(report, {}) == []
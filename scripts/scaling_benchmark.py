@@ -0,0 +1,290 @@
+#!/usr/bin/env python
+
+import sys
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import math
+import os
+import re
+import resource
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from lektor.project import Project
+from check_blog_titles import check_blog_titles
+from generate_archive import BLOG_DIR, PRESETS, generate_archive, parse_count
+from profile_build import ProfilingBuilder
+from search_index import update_index
+
+PASS = 0
+FAIL = 1
+project_path = "kutubuku"
+report_path = ".cache/scaling_benchmark"
+SIZES = ("1k", "10k", "50k")
+# Stages in the order they run. Check and recheck are the blog title check
+# without and with its cache, posts and pagination are the parts of the
+# build spent on post pages and on the listing pages of the blog, its years
+# and its tags.
+STAGES = (
+    "generate",
+    "check",
+    "recheck",
+    "setup",
+    "build",
+    "posts",
+    "pagination",
+    "index",
+)
+PAGINATION = re.compile(r"^blog/((\d+|tag/[^/]+)/)?(page/\d+/)?index\.html$")
+
+
+class Timer:
+    """
+    Collects the wall time of named stages.
+    """
+
+    def __init__(self):
+        self.seconds = {}
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[name] = time.perf_counter() - started
+
+
+def peak_rss():
+    """
+    Peak resident set size of this process in bytes.
+    """
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+def benchmark_size(count, work_path, project_path=project_path, seed=0):
+    """
+    Generate an archive of count posts and time every stage on it.
+    Runs in its own process, so the peak memory is that of this size.
+    """
+    work_path = Path(work_path) / f"posts-{count}"
+    archive_path = work_path / "project"
+    output_path = work_path / "public"
+    shutil.rmtree(work_path, ignore_errors=True)
+    timer = Timer()
+
+    with timer.stage("generate"):
+        generate_archive(
+            archive_path,
+            count,
+            project_path,
+            seed,
+            attachments="link",
+            realistic=True,
+        )
+
+    blog_path = archive_path / BLOG_DIR
+    titles_cache = work_path / "check_blog_titles.json"
+    for stage in ("check", "recheck"):
+        with contextlib.redirect_stdout(io.StringIO()):
+            with timer.stage(stage):
+                failed = check_blog_titles(blog_path, cache_path=titles_cache)
+        if failed:
+            raise RuntimeError(f"Blog title check failed for {count} posts")
+
+    # Creating the environment installs the local plugins on a first run,
+    # which is kept out of the build time.
+    with timer.stage("setup"):
+        env = Project.discover(archive_path).make_env()
+    builder = ProfilingBuilder(env.new_pad(), os.path.abspath(output_path))
+    with timer.stage("build"):
+        failures = builder.build_all()
+        builder.prune()
+    if failures:
+        raise RuntimeError(f"Building {count} posts failed with {failures} failure(s)")
+    pagination = [t for t in builder.timings if PAGINATION.match(t.artifact)]
+    timer.seconds["posts"] = sum(t.seconds for t in builder.timings if t.post)
+    timer.seconds["pagination"] = sum(t.seconds for t in pagination)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        with timer.stage("index"):
+            update_index(output_path, work_path / "index-cache")
+
+    return {
+        "posts": count,
+        "seconds": timer.seconds,
+        "artifacts": len(builder.timings),
+        "pagination_pages": len(pagination),
+        "site_bytes": sum(t.bytes for t in builder.timings),
+        "peak_rss": peak_rss(),
+    }
+
+
+def exponents(sizes):
+    """
+    Growth exponent of every stage between consecutive sizes: 1 means the
+    stage scales linearly with the number of posts, 2 quadratically.
+    """
+    steps = []
+    for small, large in zip(sizes, sizes[1:]):
+        ratio = math.log(large["posts"] / small["posts"])
+        steps.append(
+            {
+                "from": small["posts"],
+                "to": large["posts"],
+                "exponents": {
+                    stage: math.log(large["seconds"][stage] / small["seconds"][stage])
+                    / ratio
+                    for stage in STAGES
+                    if small["seconds"].get(stage) and large["seconds"].get(stage)
+                },
+            }
+        )
+    return steps
+
+
+def first_to_break(sizes, steps, budget):
+    """
+    The stage that breaks first: the first stage over budget seconds, or
+    else the stage growing fastest between the two largest sizes.
+    """
+    for size in sizes:
+        for stage in STAGES:
+            if size["seconds"].get(stage, 0) > budget:
+                return {"stage": stage, "posts": size["posts"], "reason": "budget"}
+    if steps:
+        growth = steps[-1]["exponents"]
+        stage = max(growth, key=growth.get)
+        return {"stage": stage, "posts": steps[-1]["to"], "reason": "growth"}
+    return None
+
+
+def format_report(report):
+    lines = [f"Scaling benchmark {report['created']}", "", "Seconds per stage:"]
+    header = f"{'posts':>7} " + " ".join(f"{stage:>12}" for stage in STAGES)
+    lines.append(header + f" {'pages':>7} {'peak MB':>8}")
+    for size in report["sizes"]:
+        lines.append(
+            f"{size['posts']:>7} "
+            + " ".join(f"{size['seconds'].get(s, 0):>12.3f}" for s in STAGES)
+            + f" {size['pagination_pages']:>7} {size['peak_rss'] / 2**20:>8.1f}"
+        )
+
+    lines += ["", "Milliseconds per post:", header]
+    for size in report["sizes"]:
+        lines.append(
+            f"{size['posts']:>7} "
+            + " ".join(
+                f"{size['seconds'].get(s, 0) * 1000 / size['posts']:>12.3f}"
+                for s in STAGES
+            )
+        )
+
+    if report["exponents"]:
+        lines += ["", "Growth exponents (1 linear, 2 quadratic):", header]
+        for step in report["exponents"]:
+            lines.append(
+                f"{step['to']:>7} "
+                + " ".join(f"{step['exponents'].get(s, 0):>12.2f}" for s in STAGES)
+            )
+
+    lines.append("")
+    if report["skipped"]:
+        lines.append(
+            f"Skipped sizes over budget: {', '.join(map(str, report['skipped']))}"
+        )
+    broken = report["first_to_break"]
+    if broken is None:
+        lines.append("Not enough sizes to tell which stage breaks first.")
+    elif broken["reason"] == "budget":
+        lines.append(
+            f"First to break: {broken['stage']}, over the budget of "
+            f"{report['budget']:.0f}s at {broken['posts']} posts."
+        )
+    else:
+        lines.append(
+            f"First to break: {broken['stage']}, growing fastest up to "
+            f"{broken['posts']} posts."
+        )
+    return "\n".join(lines) + "\n"
+
+
+def scaling_benchmark(
+    sizes=SIZES,
+    project_path=project_path,
+    report_path=report_path,
+    budget=600.0,
+    seed=0,
+):
+    """
+    Time generating, checking, building and indexing archives of every size
+    in sizes and write a scaling report to report_path as report.json and
+    report.txt. Sizes after the first one with a stage over budget seconds
+    are skipped.
+    """
+    report_path = Path(report_path)
+    report = {
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "budget": budget,
+        "sizes": [],
+        "skipped": [],
+    }
+    for count in sorted(PRESETS.get(size, size) for size in sizes):
+        if any(max(s["seconds"].values()) > budget for s in report["sizes"]):
+            report["skipped"].append(count)
+            continue
+        print(f"Benchmarking {count} posts...")
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            size = executor.submit(
+                benchmark_size, count, report_path / "work", project_path, seed
+            ).result()
+        report["sizes"].append(size)
+    report["exponents"] = exponents(report["sizes"])
+    report["first_to_break"] = first_to_break(
+        report["sizes"], report["exponents"], budget
+    )
+
+    report_path.mkdir(parents=True, exist_ok=True)
+    (report_path / "report.json").write_text(json.dumps(report, indent=2))
+    text = format_report(report)
+    (report_path / "report.txt").write_text(text)
+    print(text, end="")
+    return PASS
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Time the site stages on generated archives of growing size"
+    )
+    parser.add_argument(
+        "--sizes",
+        type=lambda value: [parse_count(size) for size in value.split(",")],
+        default=list(SIZES),
+        help=f"Comma separated numbers of posts or presets (default: {','.join(SIZES)})",
+    )
+    parser.add_argument(
+        "--project", default=project_path, help="Path to the Lektor project"
+    )
+    parser.add_argument(
+        "--report", default=report_path, help="Directory to write the reports to"
+    )
+    parser.add_argument(
+        "--budget",
+        type=float,
+        default=600.0,
+        help="Seconds a stage may take before larger sizes are skipped",
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    args = parser.parse_args(argv)
+    return scaling_benchmark(
+        args.sizes, args.project, args.report, args.budget, args.seed
+    )
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,51 @@
+import pytest
+from scaling_benchmark import STAGES, exponents, first_to_break, format_report
+
+
+def size(posts, **seconds):
+    return {
+        "posts": posts,
+        "seconds": dict(dict.fromkeys(STAGES, 0.001 * posts), **seconds),
+        "pagination_pages": posts // 5,
+        "peak_rss": 2**20 * posts,
+    }
+
+
+def test_exponents():
+    sizes = [size(100, pagination=1.0), size(1000, pagination=100.0)]
+    (step,) = exponents(sizes)
+    assert (step["from"], step["to"]) == (100, 1000)
+    assert step["exponents"]["build"] == pytest.approx(1.0)
+    assert step["exponents"]["pagination"] == pytest.approx(2.0)
+
+
+def test_first_to_break():
+    sizes = [size(100, pagination=1.0), size(1000, pagination=100.0)]
+    steps = exponents(sizes)
+    assert first_to_break(sizes, steps, budget=1000) == {
+        "stage": "pagination",
+        "posts": 1000,
+        "reason": "growth",
+    }
+    sizes[0]["seconds"]["index"] = 20.0
+    assert first_to_break(sizes, steps, budget=10) == {
+        "stage": "index",
+        "posts": 100,
+        "reason": "budget",
+    }
+    assert first_to_break(sizes[:1], [], budget=1000) is None
+
+
+def test_format_report():
+    sizes = [size(100), size(1000, pagination=100.0)]
+    report = {
+        "created": "2026-01-01T00:00:00",
+        "budget": 60.0,
+        "sizes": sizes,
+        "skipped": [10000],
+        "exponents": exponents(sizes),
+    }
+    report["first_to_break"] = first_to_break(sizes, report["exponents"], 60.0)
+    text = format_report(report)
+    assert "Skipped sizes over budget: 10000" in text
+    assert "First to break: pagination, over the budget of 60s at 1000 posts." in text
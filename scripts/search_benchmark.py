@@ -0,0 +1,238 @@
+#!/usr/bin/env python
+
+import sys
+import argparse
+import datetime
+import json
+import shutil
+import time
+from pathlib import Path
+from build_site import lektor_build
+from generate_archive import generate_archive
+from search_index import INDEX_DIRNAME, MANIFEST, SearchClient, update_index
+
+PASS = 0
+FAIL = 1
+project_path = "kutubuku"
+report_path = ".cache/search_benchmark"
+SIZES = (50, 500, 5000)
+TOP = 10
+# Fixed queries with the posts that are relevant to them. Clones of a
+# relevant post are relevant as well. Queries without relevant posts only
+# count towards cost, e.g. prefixes typed on the way to a word.
+QUERIES = {
+    "docker build": ("optimize-your-docker-build", "secure-your-container-build"),
+    "rust unit testing": ("unit-testing-with-rust",),
+    "python typing": ("dynamic-yet-strong-python-typing-for-data-science",),
+    "textual": (
+        "experimenting-retro-gaming-with-textual",
+        "learning-tui-development-with-textual",
+    ),
+    "git rebase": ("git-merge-vs-rebase-the-art-of-branch-integration",),
+    "slots memory": ("saving-memory-in-python-with-slots",),
+    "duckdb": ("duckdb-for-scientists-simplicity-meets-spark-like-performance",),
+    "openai models locally": (
+        "running-openai-models-locally",
+        "running-openai-models-locally-with-just-a-few-clicks",
+    ),
+    "makefiles scientists": ("makefiles-for-scientists-a-guide-to-automation",),
+    "multithreading": ("multithreading-in-rust",),
+    "changelog pre-commit": ("pre-commit-your-changelog-s-guardian",),
+    "exhaustive enums": ("never-say-never-exhaustive-enums-in-python",),
+    "py": (),
+    "pyth": (),
+    "the": (),
+}
+
+
+def percentile(values, fraction):
+    """
+    Percentile of values by linear interpolation between closest ranks.
+    """
+    values = sorted(values)
+    if not values:
+        return 0.0
+    position = (len(values) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+def slug_of(url):
+    return url.rstrip("/").rsplit("/", 1)[-1]
+
+
+def index_stats(index_path):
+    files = [path for path in Path(index_path).rglob("*") if path.is_file()]
+    manifest = json.loads((Path(index_path) / MANIFEST).read_text())
+    startup = (Path(index_path) / MANIFEST).stat().st_size
+    startup += (Path(index_path) / manifest["lengths"]).stat().st_size
+    return {
+        "index_bytes": sum(path.stat().st_size for path in files),
+        "index_files": len(files),
+        "shards": len(manifest["shards"]),
+        "startup_bytes": startup,
+    }
+
+
+def run_queries(index_path, sources, queries=QUERIES, repeat=20):
+    """
+    Run every query repeat times against the index, each time with a new
+    client so no index file is cached between runs. Returns one entry per
+    query with the files and bytes fetched, latencies and relevance.
+    sources maps the slug of every post to the slug it was cloned from.
+    """
+    results = []
+    for query, relevant in queries.items():
+        latencies = []
+        for _ in range(repeat):
+            client = SearchClient(index_path)
+            loaded = len(client.fetched)
+            started = time.perf_counter()
+            found = client.search(query, limit=TOP)
+            latencies.append(time.perf_counter() - started)
+        fetched = client.fetched[loaded:]
+
+        entry = {
+            "query": query,
+            "results": len(found),
+            "fragments": len(fetched),
+            "bytes": sum(size for _, size in fetched),
+            "latencies": latencies,
+        }
+        if relevant:
+            hits = [sources.get(slug_of(r["url"])) in relevant for r in found]
+            # Small archives have fewer than TOP relevant posts to find.
+            total = sum(source in relevant for source in sources.values())
+            entry["precision"] = sum(hits) / max(min(TOP, total), 1)
+            entry["reciprocal_rank"] = next(
+                (1 / (rank + 1) for rank, hit in enumerate(hits) if hit), 0.0
+            )
+        results.append(entry)
+    return results
+
+
+def summarize(count, queries, stats, build_seconds, index_seconds):
+    latencies = [latency for entry in queries for latency in entry["latencies"]]
+    judged = [entry for entry in queries if "precision" in entry]
+    return dict(
+        stats,
+        posts=count,
+        build_seconds=build_seconds,
+        index_seconds=index_seconds,
+        fragments_per_query=sum(e["fragments"] for e in queries) / len(queries),
+        max_fragments=max(e["fragments"] for e in queries),
+        bytes_per_query=sum(e["bytes"] for e in queries) / len(queries),
+        max_bytes=max(e["bytes"] for e in queries),
+        p50_ms=percentile(latencies, 0.5) * 1000,
+        p95_ms=percentile(latencies, 0.95) * 1000,
+        p99_ms=percentile(latencies, 0.99) * 1000,
+        precision=sum(e["precision"] for e in judged) / max(len(judged), 1),
+        mrr=sum(e["reciprocal_rank"] for e in judged) / max(len(judged), 1),
+    )
+
+
+def benchmark_size(count, work_path, project_path=project_path, repeat=20, seed=0):
+    """
+    Generate, build and index an archive of count posts and query it.
+    """
+    work_path = Path(work_path) / f"posts-{count}"
+    archive_path = work_path / "project"
+    output_path = work_path / "public"
+    shutil.rmtree(work_path, ignore_errors=True)
+    sources = generate_archive(archive_path, count, project_path, seed)
+
+    started = time.perf_counter()
+    failures, _ = lektor_build(archive_path, output_path, str(work_path / "buildstate"))
+    build_seconds = time.perf_counter() - started
+    if failures:
+        raise RuntimeError(f"Building {count} posts failed with {failures} failure(s)")
+
+    started = time.perf_counter()
+    update_index(output_path, work_path / "index-cache")
+    index_seconds = time.perf_counter() - started
+
+    index_path = output_path / INDEX_DIRNAME
+    queries = run_queries(index_path, sources, repeat=repeat)
+    summary = summarize(
+        count, queries, index_stats(index_path), build_seconds, index_seconds
+    )
+    return summary, queries
+
+
+def format_report(report):
+    lines = [
+        f"Search benchmark {report['created']}, "
+        f"{len(QUERIES)} queries x {report['repeat']} runs",
+        "",
+        f"{'posts':>6} {'build s':>8} {'index s':>8} {'index KB':>9} {'files':>6} {'startup KB':>10} "
+        f"{'frags/q':>8} {'KB/q':>7} {'max KB':>7} {'p50 ms':>7} {'p95 ms':>7} "
+        f"{'p99 ms':>7} {'P@10':>5} {'MRR':>5}",
+    ]
+    for s in report["sizes"]:
+        lines.append(
+            f"{s['posts']:>6} {s['build_seconds']:>8.2f} {s['index_seconds']:>8.2f} "
+            f"{s['index_bytes'] / 1024:>9.1f} {s['index_files']:>6} "
+            f"{s['startup_bytes'] / 1024:>10.1f} {s['fragments_per_query']:>8.2f} "
+            f"{s['bytes_per_query'] / 1024:>7.1f} {s['max_bytes'] / 1024:>7.1f} "
+            f"{s['p50_ms']:>7.2f} {s['p95_ms']:>7.2f} {s['p99_ms']:>7.2f} "
+            f"{s['precision']:>5.2f} {s['mrr']:>5.2f}"
+        )
+    return "\n".join(lines) + "\n"
+
+
+def search_benchmark(
+    sizes=SIZES, project_path=project_path, report_path=report_path, repeat=20
+):
+    """
+    Benchmark search for archives of every size in sizes and write the
+    report to report_path as report.json and report.txt.
+    """
+    report_path = Path(report_path)
+    report = {
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "repeat": repeat,
+        "sizes": [],
+        "queries": {},
+    }
+    for count in sizes:
+        print(f"Benchmarking {count} posts...")
+        summary, queries = benchmark_size(
+            count, report_path / "work", project_path, repeat
+        )
+        report["sizes"].append(summary)
+        report["queries"][count] = queries
+
+    report_path.mkdir(parents=True, exist_ok=True)
+    (report_path / "report.json").write_text(json.dumps(report, indent=2))
+    text = format_report(report)
+    (report_path / "report.txt").write_text(text)
+    print(text, end="")
+    return PASS
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark search index size, fetches and latency by archive size"
+    )
+    parser.add_argument(
+        "--sizes",
+        type=lambda value: [int(size) for size in value.split(",")],
+        default=list(SIZES),
+        help="Comma separated numbers of posts to benchmark",
+    )
+    parser.add_argument(
+        "--project", default=project_path, help="Path to the Lektor project"
+    )
+    parser.add_argument(
+        "--report", default=report_path, help="Directory to write the reports to"
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=20, help="Number of runs of every query"
+    )
+    args = parser.parse_args(argv)
+    return search_benchmark(args.sizes, args.project, args.report, args.repeat)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
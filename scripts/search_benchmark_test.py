@@ -0,0 +1,57 @@
+import pytest
+from pathlib import Path
+import shutil
+import tempfile
+from search_benchmark import percentile, run_queries, slug_of
+from search_index import INDEX_DIRNAME, update_index
+
+
+@pytest.fixture
+def test_dir():
+    temp_dir = Path(tempfile.mkdtemp())
+    yield temp_dir
+    shutil.rmtree(temp_dir)
+
+
+def create_test_site(base_dir: Path) -> Path:
+    site_dir = base_dir / "public"
+    for slug, title in [
+        ("docker-1", "Docker build"),
+        ("docker-2", "Docker build again"),
+        ("rust-1", "Rust build"),
+    ]:
+        (site_dir / "blog" / slug).mkdir(parents=True)
+        (site_dir / "blog" / slug / "index.html").write_text(
+            f"<html><body><div data-pagefind-body><h1>{title}</h1></div></body></html>"
+        )
+    return site_dir
+
+
+def test_percentile():
+    assert percentile([], 0.5) == 0.0
+    assert percentile([3, 1, 2], 0.5) == 2
+    assert percentile([1, 2, 3, 4], 0.5) == 2.5
+    assert percentile([1, 2, 3, 4], 0.99) == pytest.approx(3.97)
+
+
+def test_slug_of():
+    assert slug_of("/blog/docker-1/") == "docker-1"
+
+
+def test_run_queries(test_dir, capsys):
+    site_dir = create_test_site(test_dir)
+    update_index(site_dir, test_dir / "cache")
+    sources = {"docker-1": "docker", "docker-2": "docker", "rust-1": "rust"}
+    queries = {"build": ("rust",), "docker": ("docker",), "bui": ()}
+
+    results = run_queries(site_dir / INDEX_DIRNAME, sources, queries, repeat=2)
+    assert [entry["results"] for entry in results] == [3, 2, 3]
+    assert all(len(entry["latencies"]) == 2 for entry in results)
+    assert all(entry["fragments"] > 0 and entry["bytes"] > 0 for entry in results)
+
+    build, docker, prefix = results
+    assert build["precision"] == 1.0
+    assert build["reciprocal_rank"] > 0
+    assert docker["precision"] == 1.0
+    assert docker["reciprocal_rank"] == 1.0
+    assert "precision" not in prefix
@@ -0,0 +1,602 @@
+#!/usr/bin/env python
+
+import sys
+import argparse
+import hashlib
+import json
+import math
+import os
+import re
+import shutil
+import time
+from collections import Counter
+from html.parser import HTMLParser
+from pathlib import Path
+
+PASS = 0
+FAIL = 1
+site_path = "kutubuku/public"
+cache_path = ".cache/search_index"
+
+# Bump to rebuild the index from scratch after changing its format.
+VERSION = 1
+INDEX_DIRNAME = "search-index"
+MANIFEST = "index.json"
+# Terms are grouped into shards by prefix. A shard larger than SHARD_BYTES is
+# split on a longer prefix, up to MAX_PREFIX characters.
+MAX_PREFIX = 3
+SHARD_BYTES = 16 * 1024
+# Metadata of CHUNK_SIZE consecutive page ids is kept in one file.
+CHUNK_SIZE = 64
+EXCERPT_WORDS = 30
+MAX_TERM_LENGTH = 40
+TOKEN = re.compile(r"\w+")
+# Regions of a page that are indexed, as emitted by the blog templates.
+BODY_ATTR = "data-pagefind-body"
+META_ATTR = "data-pagefind-meta"
+IGNORE_ATTR = "data-pagefind-ignore"
+VOID_ELEMENTS = {
+    "area",
+    "base",
+    "br",
+    "col",
+    "embed",
+    "hr",
+    "img",
+    "input",
+    "link",
+    "meta",
+    "source",
+    "track",
+    "wbr",
+}
+SKIPPED_ELEMENTS = {"script", "style", "template", "noscript"}
+# BM25 parameters.
+K1 = 1.2
+B = 0.75
+
+
+def encode_varint(value, out):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def decode_varint(data, pos):
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+def encode_shard(terms):
+    """
+    Encode {term: {page id: term frequency}} as a shard: the number of
+    terms, then for every term in order its UTF-8 length and bytes, its
+    number of pages and the delta-encoded page ids each followed by the
+    term frequency, all as varints.
+    """
+    out = bytearray()
+    encode_varint(len(terms), out)
+    for term in sorted(terms):
+        encoded = term.encode("utf-8")
+        encode_varint(len(encoded), out)
+        out += encoded
+        postings = terms[term]
+        encode_varint(len(postings), out)
+        previous = 0
+        for page_id in sorted(postings):
+            encode_varint(page_id - previous, out)
+            encode_varint(postings[page_id], out)
+            previous = page_id
+    return bytes(out)
+
+
+def decode_shard(data):
+    terms = {}
+    count, pos = decode_varint(data, 0)
+    for _ in range(count):
+        length, pos = decode_varint(data, pos)
+        term = data[pos : pos + length].decode("utf-8")
+        pos += length
+        pages, pos = decode_varint(data, pos)
+        postings = {}
+        page_id = 0
+        for _ in range(pages):
+            delta, pos = decode_varint(data, pos)
+            page_id += delta
+            postings[page_id], pos = decode_varint(data, pos)
+        terms[term] = postings
+    return terms
+
+
+def encode_lengths(lengths, size):
+    out = bytearray()
+    for page_id in range(size):
+        encode_varint(lengths.get(page_id, 0), out)
+    return bytes(out)
+
+
+def decode_lengths(data):
+    lengths = []
+    pos = 0
+    while pos < len(data):
+        length, pos = decode_varint(data, pos)
+        lengths.append(length)
+    return lengths
+
+
+def tokenize(text):
+    return [
+        term for term in TOKEN.findall(text.lower()) if len(term) <= MAX_TERM_LENGTH
+    ]
+
+
+class PageParser(HTMLParser):
+    """
+    Collect the text of the data-pagefind-body regions of a page, the
+    data-pagefind-meta fields within them and the first image.
+    Elements marked with data-pagefind-ignore are skipped.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.stack = []
+        self.has_body = False
+        self.text = []
+        self.meta = {}
+        self.image = None
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        parent = self.stack[-1] if self.stack else (None, False, False, None)
+        body = parent[1] or BODY_ATTR in attrs
+        ignore = parent[2] or IGNORE_ATTR in attrs or tag in SKIPPED_ELEMENTS
+        meta = parent[3]
+        self.has_body = self.has_body or body
+        if body and not ignore:
+            if tag == "img" and self.image is None and attrs.get("src"):
+                self.image = attrs["src"]
+            field = attrs.get(META_ATTR)
+            if field:
+                name, _, value = field.partition(":")
+                if value:
+                    self.meta[name] = value
+                else:
+                    meta = name
+                    self.meta[name] = ""
+        if tag not in VOID_ELEMENTS:
+            self.stack.append((tag, body, ignore, meta))
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_ELEMENTS:
+            self.stack.pop()
+
+    def handle_endtag(self, tag):
+        # Close unclosed elements such as <p> and <li> along with this one.
+        for depth in range(len(self.stack) - 1, -1, -1):
+            if self.stack[depth][0] == tag:
+                del self.stack[depth:]
+                return
+
+    def handle_data(self, data):
+        if not self.stack:
+            return
+        _, body, ignore, meta = self.stack[-1]
+        if not body or ignore:
+            return
+        if meta is not None:
+            self.meta[meta] += data
+        else:
+            self.text.append(data)
+
+
+def url_of(name):
+    """
+    URL of the page at name, relative to the site root.
+    """
+    if name == "index.html":
+        return "/"
+    if name.endswith("/index.html"):
+        return "/" + name[: -len("index.html")]
+    return "/" + name
+
+
+def parse_page(data, url):
+    """
+    Return the search record of a page: its metadata, excerpt, length in
+    terms and term frequencies, or None if the page has no indexed region.
+    """
+    parser = PageParser()
+    parser.feed(data.decode("utf-8", errors="replace"))
+    parser.close()
+    if not parser.has_body:
+        return None
+
+    meta = {name: " ".join(value.split()) for name, value in parser.meta.items()}
+    text = " ".join(" ".join(parser.text).split())
+    terms = tokenize(text) + tokenize(" ".join(meta.values()))
+    if parser.image and "image" not in meta:
+        meta["image"] = parser.image
+    meta["url"] = url
+    meta.setdefault("title", url)
+    meta["excerpt"] = " ".join(text.split()[:EXCERPT_WORDS])
+    return {"meta": meta, "length": len(terms), "terms": Counter(terms)}
+
+
+def file_digest(data):
+    return hashlib.sha1(data).hexdigest()
+
+
+def shard_prefixes(sizes, depth=1):
+    """
+    Group terms by prefix. sizes maps every term to its encoded size.
+    Returns {prefix: [terms]}, where a group larger than SHARD_BYTES is split
+    on a longer prefix. Terms shorter than the prefix form their own group.
+    """
+    groups = {}
+    for term in sizes:
+        groups.setdefault(term[:depth], []).append(term)
+
+    shards = {}
+    for prefix, terms in groups.items():
+        size = sum(sizes[term] for term in terms)
+        if size > SHARD_BYTES and depth < MAX_PREFIX and len(terms) > 1:
+            shards.update(shard_prefixes({t: sizes[t] for t in terms}, depth + 1))
+        else:
+            shards[prefix] = terms
+    return shards
+
+
+def posting_size(postings):
+    # Estimated, a varint page id delta and frequency are usually two bytes.
+    return 2 + 2 * len(postings)
+
+
+class SearchIndex:
+    """
+    An inverted index of the pages of a site, kept as the files the search
+    client reads: a manifest, the shards of terms, the page lengths and the
+    chunks of page metadata. Every file but the manifest is named after its
+    content hash, so unchanged files keep their name between builds.
+    """
+
+    def __init__(self):
+        self.postings = {}
+        self.lengths = {}
+        self.pages = {}
+
+    @classmethod
+    def load(cls, path):
+        """
+        Load the index written to path, or return an empty index.
+        """
+        index = cls()
+        path = Path(path)
+        try:
+            manifest = json.loads((path / MANIFEST).read_text())
+        except (OSError, ValueError):
+            return index
+        if manifest.get("version") != VERSION:
+            return index
+        for name in manifest["shards"].values():
+            index.postings.update(decode_shard((path / name).read_bytes()))
+        lengths = decode_lengths((path / manifest["lengths"]).read_bytes())
+        index.lengths = {i: length for i, length in enumerate(lengths) if length}
+        for name in manifest["chunks"].values():
+            chunk = json.loads((path / name).read_text())
+            index.pages.update((int(page_id), meta) for page_id, meta in chunk.items())
+        return index
+
+    def remove(self, page_ids):
+        page_ids = set(page_ids)
+        if not page_ids:
+            return
+        for term in list(self.postings):
+            postings = self.postings[term]
+            for page_id in page_ids.intersection(postings):
+                del postings[page_id]
+            if not postings:
+                del self.postings[term]
+        for page_id in page_ids:
+            self.lengths.pop(page_id, None)
+            self.pages.pop(page_id, None)
+
+    def add(self, page_id, record):
+        for term, frequency in record["terms"].items():
+            self.postings.setdefault(term, {})[page_id] = frequency
+        self.lengths[page_id] = record["length"]
+        self.pages[page_id] = record["meta"]
+
+    def files(self):
+        """
+        Return the manifest and {file name: content} of the index.
+        """
+        files = {}
+
+        def add(stem, data, suffix):
+            name = f"{stem}.{file_digest(data)[:16]}{suffix}"
+            files[name] = data
+            return name
+
+        sizes = {term: len(term) + posting_size(p) for term, p in self.postings.items()}
+        shards = {}
+        for prefix, terms in sorted(shard_prefixes(sizes).items()):
+            data = encode_shard({term: self.postings[term] for term in terms})
+            shards[prefix] = add("shards/shard", data, ".bin")
+
+        size = max(self.lengths, default=-1) + 1
+        lengths = add("lengths", encode_lengths(self.lengths, size), ".bin")
+
+        chunks = {}
+        for page_id, meta in sorted(self.pages.items()):
+            chunks.setdefault(page_id // CHUNK_SIZE, {})[page_id] = meta
+        chunks = {
+            str(chunk): add(
+                "pages/pages",
+                json.dumps(pages, sort_keys=True).encode("utf-8"),
+                ".json",
+            )
+            for chunk, pages in chunks.items()
+        }
+
+        manifest = {
+            "version": VERSION,
+            "pages": len(self.lengths),
+            "average_length": sum(self.lengths.values()) / max(len(self.lengths), 1),
+            "max_prefix": MAX_PREFIX,
+            "chunk_size": CHUNK_SIZE,
+            "lengths": lengths,
+            "shards": shards,
+            "chunks": chunks,
+        }
+        return manifest, files
+
+
+def write_index(path, manifest, files):
+    """
+    Write the files of the index that are missing in path, then the
+    manifest, and remove files that are no longer part of the index.
+    Returns the number of files written.
+    """
+    path = Path(path)
+    written = 0
+    for name, data in files.items():
+        target = path / name
+        if target.exists():
+            continue
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_bytes(data)
+        written += 1
+    tmp_path = path / (MANIFEST + ".tmp")
+    tmp_path.write_text(json.dumps(manifest, sort_keys=True))
+    os.replace(tmp_path, path / MANIFEST)
+
+    for target in list(path.rglob("*")):
+        name = target.relative_to(path).as_posix()
+        if target.is_file() and name != MANIFEST and name not in files:
+            target.unlink()
+    return written
+
+
+def update_index(site_path=site_path, cache_path=cache_path):
+    """
+    Index the pages of the built site in site_path into its search-index
+    directory.
+
+    The index and the state of every indexed page are kept in cache_path.
+    Only pages whose content changed since the last run are parsed again,
+    and only index files whose content changed are written, so an unchanged
+    site only costs a stat per page. Lektor prunes the index from the site
+    on every build, in which case it is copied back from the cache.
+    """
+    started = time.perf_counter()
+    site_path = Path(site_path)
+    cache_path = Path(cache_path)
+    cache_index_path = cache_path / INDEX_DIRNAME
+    state_path = cache_path / "state.json"
+    try:
+        state = json.loads(state_path.read_text())
+    except (OSError, ValueError):
+        state = {}
+    if state.get("version") != VERSION:
+        state = {"version": VERSION, "pages": {}}
+        shutil.rmtree(cache_index_path, ignore_errors=True)
+    entries = state["pages"]
+    index = SearchIndex.load(cache_index_path)
+
+    removed = set(entries)
+    changed = {}
+    for path in sorted(site_path.rglob("*.html")):
+        name = path.relative_to(site_path).as_posix()
+        if name.startswith(INDEX_DIRNAME + "/"):
+            continue
+        removed.discard(name)
+        stat = path.stat()
+        entry = entries.get(name)
+        if (
+            entry
+            and entry["mtime_ns"] == stat.st_mtime_ns
+            and entry["size"] == stat.st_size
+        ):
+            continue
+        data = path.read_bytes()
+        digest = file_digest(data)
+        if entry and entry["sha1"] == digest:
+            entry.update(mtime_ns=stat.st_mtime_ns, size=stat.st_size)
+            continue
+        changed[name] = (stat, digest, parse_page(data, url_of(name)))
+
+    stale = [entries[name]["id"] for name in removed | set(changed) if name in entries]
+    stale = [page_id for page_id in stale if page_id is not None]
+    index.remove(stale)
+    for name in removed:
+        del entries[name]
+
+    used = {entry["id"] for entry in entries.values() if entry["id"] is not None}
+    used.difference_update(stale)
+    free = (
+        page_id
+        for page_id in range(len(used) + len(changed) + 1)
+        if page_id not in used
+    )
+    for name, (stat, digest, record) in changed.items():
+        page_id = None
+        if record is not None:
+            page_id = next(free)
+            index.add(page_id, record)
+        entries[name] = {
+            "mtime_ns": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "sha1": digest,
+            "id": page_id,
+        }
+
+    manifest, files = index.files()
+    index_path = site_path / INDEX_DIRNAME
+    if changed or removed or not (cache_index_path / MANIFEST).exists():
+        write_index(cache_index_path, manifest, files)
+    written = write_index(index_path, manifest, files)
+
+    cache_path.mkdir(parents=True, exist_ok=True)
+    tmp_path = state_path.with_suffix(".tmp")
+    tmp_path.write_text(json.dumps(state))
+    os.replace(tmp_path, state_path)
+
+    elapsed = time.perf_counter() - started
+    print(
+        f"Indexed {manifest['pages']} page(s) in {elapsed:.2f}s: "
+        f"{len(changed)} changed, {len(removed)} removed, "
+        f"{written} of {len(files)} index file(s) written"
+    )
+    return PASS
+
+
+class SearchClient:
+    """
+    Reference implementation of the search client in static/search.js.
+    Index files are read through fetch, only when a query needs them, and
+    every fetch is recorded in fetched.
+    """
+
+    def __init__(self, index_path, fetch=None):
+        self.index_path = Path(index_path)
+        self.fetched = []
+        self.fetch = fetch or self.read_file
+        self.shards = {}
+        self.chunks = {}
+        self.manifest = json.loads(self.get(MANIFEST))
+        self.lengths = decode_lengths(self.get(self.manifest["lengths"]))
+
+    def read_file(self, name):
+        return (self.index_path / name).read_bytes()
+
+    def get(self, name):
+        data = self.fetch(name)
+        self.fetched.append((name, len(data)))
+        return data
+
+    @property
+    def bytes_fetched(self):
+        return sum(size for _, size in self.fetched)
+
+    def shard(self, term):
+        """
+        Return the terms of the shard that term belongs to.
+        """
+        for n in range(min(len(term), self.manifest["max_prefix"]), 0, -1):
+            prefix = term[:n]
+            name = self.manifest["shards"].get(prefix)
+            if name is not None:
+                if name not in self.shards:
+                    self.shards[name] = decode_shard(self.get(name))
+                return self.shards[name]
+        return {}
+
+    def matches(self, term, prefix=False):
+        """
+        Return the terms matching a query term with their postings. Terms the
+        query term is a prefix of match as well if prefix is set and the
+        query term is long enough to select a single shard.
+        """
+        terms = self.shard(term)
+        if prefix and len(term) >= self.manifest["max_prefix"]:
+            return {t: p for t, p in terms.items() if t.startswith(term)}
+        return {term: terms[term]} if term in terms else {}
+
+    def meta(self, page_id):
+        chunk = str(page_id // self.manifest["chunk_size"])
+        if chunk not in self.chunks:
+            name = self.manifest["chunks"][chunk]
+            self.chunks[chunk] = json.loads(self.get(name))
+        return self.chunks[chunk][str(page_id)]
+
+    def search(self, query, limit=10):
+        """
+        Return the metadata of the pages matching every term of query, best
+        BM25 score first. The last term also matches as a prefix, so results
+        show up while typing.
+        """
+        terms = tokenize(query)
+        if not terms:
+            return []
+        pages = self.manifest["pages"]
+        average = self.manifest["average_length"] or 1
+        scores = None
+        for i, term in enumerate(terms):
+            term_scores = {}
+            for postings in self.matches(term, prefix=i == len(terms) - 1).values():
+                idf = math.log(
+                    1 + (pages - len(postings) + 0.5) / (len(postings) + 0.5)
+                )
+                for page_id, tf in postings.items():
+                    norm = K1 * (1 - B + B * self.lengths[page_id] / average)
+                    score = idf * tf * (K1 + 1) / (tf + norm)
+                    term_scores[page_id] = term_scores.get(page_id, 0) + score
+            if scores is None:
+                scores = term_scores
+            else:
+                scores = {
+                    page_id: score + term_scores[page_id]
+                    for page_id, score in scores.items()
+                    if page_id in term_scores
+                }
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return [
+            dict(self.meta(page_id), score=score) for page_id, score in ranked[:limit]
+        ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Build the search index of the built site"
+    )
+    parser.add_argument("--site", default=site_path, help="Path to the built site")
+    parser.add_argument(
+        "--cache",
+        default=cache_path,
+        help="Path to keep the index and page state between runs",
+    )
+    parser.add_argument(
+        "--query", help="Search the index of the site instead of building it"
+    )
+    args = parser.parse_args(argv)
+    if not os.path.isdir(args.site):
+        print(f"Built site not found at {args.site}")
+        return FAIL
+    if args.query is not None:
+        client = SearchClient(Path(args.site) / INDEX_DIRNAME)
+        for result in client.search(args.query):
+            print(f"{result['score']:6.2f}  {result['title']}  {result['url']}")
+        return PASS
+    return update_index(args.site, args.cache)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
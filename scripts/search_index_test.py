@@ -0,0 +1,158 @@
+import pytest
+from pathlib import Path
+import shutil
+import tempfile
+from search_index import (
+    INDEX_DIRNAME,
+    SearchClient,
+    decode_shard,
+    decode_varint,
+    encode_shard,
+    encode_varint,
+    parse_page,
+    shard_prefixes,
+    update_index,
+    url_of,
+)
+
+
+@pytest.fixture
+def test_dir():
+    temp_dir = Path(tempfile.mkdtemp())
+    yield temp_dir
+    shutil.rmtree(temp_dir)
+
+
+def page(title, body, image=""):
+    return (
+        "<html><head><title>ignored</title></head><body><nav>Menu</nav>"
+        '<div class="blog-post" data-pagefind-body>'
+        f'<h1 data-pagefind-meta="title"><a href="#">{title}</a></h1>'
+        f"{image}<p>{body}<p>unclosed<script>var hidden;</script>"
+        "<div data-pagefind-ignore>skipped words</div></div>"
+        "<footer>Proudly built using Lektor</footer></body></html>"
+    )
+
+
+def create_test_site(base_dir: Path) -> Path:
+    site_dir = base_dir / "public"
+    for slug, title, body in [
+        ("docker", "Optimize your Docker build", "Docker layers cache the build."),
+        ("rust", "Unit testing with Rust", "Rust tests run with cargo test."),
+        ("python", "Python typing", "Typing in Python helps data science."),
+    ]:
+        (site_dir / "blog" / slug).mkdir(parents=True)
+        (site_dir / "blog" / slug / "index.html").write_text(page(title, body))
+    (site_dir / "index.html").write_text("<html><body>Welcome</body></html>")
+    return site_dir
+
+
+def test_varint_roundtrip():
+    out = bytearray()
+    for value in (0, 1, 127, 128, 300, 2**35):
+        encode_varint(value, out)
+    pos = 0
+    values = []
+    while pos < len(out):
+        value, pos = decode_varint(out, pos)
+        values.append(value)
+    assert values == [0, 1, 127, 128, 300, 2**35]
+
+
+def test_shard_roundtrip():
+    terms = {"docker": {0: 3, 7: 1, 300: 2}, "döner": {5: 1}}
+    data = encode_shard(terms)
+    assert decode_shard(data) == terms
+    # Delta encoded ids and frequencies fit in a byte or two each.
+    assert len(data) < 30
+
+
+def test_shard_prefixes_split_large_groups(monkeypatch):
+    monkeypatch.setattr("search_index.SHARD_BYTES", 10)
+    sizes = {"a": 1, "ab": 4, "abc": 4, "abd": 4, "b": 1}
+    assert shard_prefixes(sizes) == {
+        "a": ["a"],
+        "ab": ["ab"],
+        "abc": ["abc"],
+        "abd": ["abd"],
+        "b": ["b"],
+    }
+
+
+def test_url_of():
+    assert url_of("index.html") == "/"
+    assert url_of("blog/post/index.html") == "/blog/post/"
+    assert url_of("404.html") == "/404.html"
+
+
+def test_parse_page_reads_indexed_regions():
+    record = parse_page(
+        page("My Post", "Hello world", '<img src="main.png">').encode(), "/blog/x/"
+    )
+    assert record["meta"] == {
+        "title": "My Post",
+        "image": "main.png",
+        "url": "/blog/x/",
+        "excerpt": "Hello world unclosed",
+    }
+    assert record["terms"] == {
+        "my": 1,
+        "post": 1,
+        "hello": 1,
+        "world": 1,
+        "unclosed": 1,
+    }
+    assert record["length"] == 5
+    assert parse_page(b"<html><body>Welcome</body></html>", "/") is None
+
+
+def test_update_index_and_search(test_dir, capsys):
+    site_dir = create_test_site(test_dir)
+    cache_dir = test_dir / "cache"
+    update_index(site_dir, cache_dir)
+    assert "Indexed 3 page(s)" in capsys.readouterr().out
+
+    client = SearchClient(site_dir / INDEX_DIRNAME)
+    assert [r["url"] for r in client.search("docker build")] == ["/blog/docker/"]
+    assert [r["url"] for r in client.search("test")] == ["/blog/rust/"]
+    assert [r["url"] for r in client.search("pyth")] == ["/blog/python/"]
+    assert client.search("lektor menu skipped hidden") == []
+    assert client.search("docker rust") == []
+    names = [name for name, _ in client.fetched]
+    assert len(names) == len(set(names))
+
+
+def test_update_index_is_incremental(test_dir, capsys):
+    site_dir = create_test_site(test_dir)
+    cache_dir = test_dir / "cache"
+    update_index(site_dir, cache_dir)
+    capsys.readouterr()
+
+    update_index(site_dir, cache_dir)
+    assert "0 changed, 0 removed, 0 of" in capsys.readouterr().out
+
+    (site_dir / "blog" / "rust" / "index.html").write_text(
+        page("Multithreading in Rust", "Threads and channels.")
+    )
+    shutil.rmtree(site_dir / "blog" / "python")
+    update_index(site_dir, cache_dir)
+    assert "Indexed 2 page(s)" in capsys.readouterr().out
+
+    client = SearchClient(site_dir / INDEX_DIRNAME)
+    assert [r["url"] for r in client.search("threads")] == ["/blog/rust/"]
+    assert client.search("cargo") == []
+    assert client.search("typing") == []
+    assert [r["url"] for r in client.search("docker")] == ["/blog/docker/"]
+
+
+def test_pruned_index_is_restored_from_cache(test_dir, capsys):
+    site_dir = create_test_site(test_dir)
+    cache_dir = test_dir / "cache"
+    update_index(site_dir, cache_dir)
+    shutil.rmtree(site_dir / INDEX_DIRNAME)
+    capsys.readouterr()
+
+    update_index(site_dir, cache_dir)
+    assert "0 changed" in capsys.readouterr().out
+    client = SearchClient(site_dir / INDEX_DIRNAME)
+    assert [r["url"] for r in client.search("rust")] == ["/blog/rust/"]
@@ -0,0 +1,310 @@
+#!/usr/bin/env python
+
+import sys
+import argparse
+import email.utils
+import gzip
+import io
+import os
+import re
+import threading
+from collections import OrderedDict
+from functools import partial
+from http import HTTPStatus
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+directory = "kutubuku/dist"
+COMPRESSIBLE_TYPES = re.compile(
+    r"^(text/|application/(javascript|json|xml|wasm|manifest\+json)|image/svg\+xml)"
+)
+# GitHub Pages serves every file with a 10 minute cache lifetime.
+DEFAULT_MAX_AGE = 600
+# Files named with a content hash, e.g. style.3f2a9c1d.css, never change.
+FINGERPRINTED = re.compile(r"\.[0-9a-f]{8,}\.[a-z0-9]+$")
+RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+ENCODING_SUFFIX = {"br": ".br", "gzip": ".gz"}
+
+
+class LRUCache:
+    """
+    Thread-safe cache of byte strings that evicts the least recently used
+    entries once the total size exceeds max_bytes.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            data = self.entries.get(key)
+            if data is not None:
+                self.entries.move_to_end(key)
+            return data
+
+    def put(self, key, data):
+        if len(data) > self.max_bytes:
+            return
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.size -= len(old)
+            self.entries[key] = data
+            self.size += len(data)
+            while self.size > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= len(evicted)
+
+
+def accepted_encodings(header):
+    """
+    Parse an Accept-Encoding header into the set of accepted codings.
+    """
+    encodings = set()
+    for item in (header or "").split(","):
+        coding, _, params = item.strip().partition(";")
+        q = re.search(r"q=([0-9.]+)", params)
+        if coding and not (q and float(q.group(1)) == 0):
+            encodings.add(coding.strip().lower())
+    return encodings
+
+
+def parse_range(header, size):
+    """
+    Parse a single byte range header into an inclusive (start, end) pair.
+    Returns None if the header is not a single byte range, and raises
+    ValueError if the range cannot be satisfied.
+    """
+    match = RANGE.match(header.strip())
+    if not match or match.groups() == ("", ""):
+        return None
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    else:
+        start = max(size - int(last), 0)
+        end = size - 1
+    if start > end or start >= size:
+        raise ValueError(header)
+    return start, end
+
+
+class PreviewHandler(SimpleHTTPRequestHandler):
+    """
+    Static file handler that behaves like the production host: compressed
+    responses, ETag and Last-Modified revalidation, byte ranges and cache
+    headers. Precompressed .br and .gz siblings are served when they exist,
+    other compressible files are compressed on the fly. File contents are
+    kept in an in-memory LRU cache keyed by path, encoding, mtime and size.
+    """
+
+    cache = LRUCache()
+    max_age = DEFAULT_MAX_AGE
+    quiet = False
+
+    def log_message(self, format, *args):
+        if not self.quiet:
+            super().log_message(format, *args)
+
+    def end_headers(self):
+        self.send_header("Accept-Ranges", "bytes")
+        super().end_headers()
+
+    def resolve(self):
+        """
+        Return the file to serve for the request path, None to let the parent
+        handler deal with redirects and directory listings.
+        """
+        path = self.translate_path(self.path)
+        if os.path.isdir(path):
+            if not urlsplit(self.path).path.endswith("/"):
+                return None
+            for index in ("index.html", "index.htm"):
+                if os.path.isfile(os.path.join(path, index)):
+                    return os.path.join(path, index)
+            return None
+        return path
+
+    def read(self, path, stat, encoding):
+        key = (path, encoding, stat.st_mtime_ns, stat.st_size)
+        data = self.cache.get(key)
+        if data is not None:
+            return data
+
+        if encoding in ("br", "gzip") and os.path.isfile(
+            path + ENCODING_SUFFIX[encoding]
+        ):
+            with open(path + ENCODING_SUFFIX[encoding], "rb") as f:
+                data = f.read()
+        else:
+            with open(path, "rb") as f:
+                data = f.read()
+            if encoding == "br":
+                data = brotli.compress(data, quality=5)
+            elif encoding == "gzip":
+                data = gzip.compress(data, compresslevel=6)
+        self.cache.put(key, data)
+        return data
+
+    def choose_encoding(self, path, ctype):
+        accepted = accepted_encodings(self.headers.get("Accept-Encoding"))
+        for encoding in ("br", "gzip"):
+            if encoding not in accepted:
+                continue
+            if os.path.isfile(path + ENCODING_SUFFIX[encoding]):
+                return encoding
+        if not COMPRESSIBLE_TYPES.match(ctype):
+            return None
+        if "br" in accepted and brotli is not None:
+            return "br"
+        if "gzip" in accepted:
+            return "gzip"
+        return None
+
+    def is_fresh(self, etag, stat):
+        if_none_match = self.headers.get("If-None-Match")
+        if if_none_match is not None:
+            tags = [tag.strip() for tag in if_none_match.split(",")]
+            return "*" in tags or etag in tags or f"W/{etag}" in tags
+        if_modified_since = self.headers.get("If-Modified-Since")
+        if if_modified_since:
+            try:
+                since = email.utils.parsedate_to_datetime(if_modified_since)
+            except (TypeError, ValueError):
+                return False
+            return int(stat.st_mtime) <= since.timestamp()
+        return False
+
+    def cache_control(self, path):
+        if FINGERPRINTED.search(path):
+            return "public, max-age=31536000, immutable"
+        return f"public, max-age={self.max_age}"
+
+    def send_head(self):
+        path = self.resolve()
+        if path is None:
+            return super().send_head()
+        try:
+            stat = os.stat(path)
+        except OSError:
+            self.send_error(HTTPStatus.NOT_FOUND, "File not found")
+            return None
+
+        ctype = self.guess_type(path)
+        encoding = self.choose_encoding(path, ctype)
+        etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}{"-" + encoding if encoding else ""}"'
+
+        if self.is_fresh(etag, stat):
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", self.cache_control(path))
+            self.end_headers()
+            return None
+
+        data = self.read(path, stat, encoding)
+        status = HTTPStatus.OK
+        content_range = None
+        range_header = self.headers.get("Range")
+        if_range = self.headers.get("If-Range")
+        if range_header and encoding is None and (not if_range or if_range == etag):
+            try:
+                byte_range = parse_range(range_header, len(data))
+            except ValueError:
+                self.send_response(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+                self.send_header("Content-Range", f"bytes */{len(data)}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return None
+            if byte_range is not None:
+                start, end = byte_range
+                content_range = f"bytes {start}-{end}/{len(data)}"
+                data = data[start : end + 1]
+                status = HTTPStatus.PARTIAL_CONTENT
+
+        self.send_response(status)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(data)))
+        self.send_header("Last-Modified", self.date_time_string(stat.st_mtime))
+        self.send_header("ETag", etag)
+        self.send_header("Cache-Control", self.cache_control(path))
+        if content_range:
+            self.send_header("Content-Range", content_range)
+        if encoding:
+            self.send_header("Content-Encoding", encoding)
+        if encoding or COMPRESSIBLE_TYPES.match(ctype):
+            self.send_header("Vary", "Accept-Encoding")
+        self.end_headers()
+        return io.BytesIO(data)
+
+
+def serve(
+    directory=directory,
+    bind="127.0.0.1",
+    port=8000,
+    max_age=DEFAULT_MAX_AGE,
+    cache_bytes=64 * 1024 * 1024,
+    quiet=False,
+):
+    handler = type(
+        "Handler",
+        (PreviewHandler,),
+        {"cache": LRUCache(cache_bytes), "max_age": max_age, "quiet": quiet},
+    )
+    server = ThreadingHTTPServer((bind, port), partial(handler, directory=directory))
+    host, port = server.server_address[:2]
+    print(f"Serving {directory} on http://{host}:{port}/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Serve the built site with compression and caching"
+    )
+    parser.add_argument(
+        "--directory", default=directory, help="Directory to serve files from"
+    )
+    parser.add_argument("--bind", default="127.0.0.1", help="Address to bind to")
+    parser.add_argument("--port", type=int, default=8000, help="Port to listen on")
+    parser.add_argument(
+        "--max-age",
+        type=int,
+        default=DEFAULT_MAX_AGE,
+        help="Cache lifetime in seconds of files without a content hash",
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=64,
+        help="Size in MB of the in-memory cache of hot files",
+    )
+    parser.add_argument(
+        "--quiet", action="store_true", help="Do not log requests, e.g. for load tests"
+    )
+    args = parser.parse_args(argv)
+    return serve(
+        args.directory,
+        args.bind,
+        args.port,
+        args.max_age,
+        args.cache_size * 1024 * 1024,
+        args.quiet,
+    )
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,117 @@
+import pytest
+from pathlib import Path
+import gzip
+import http.client
+import shutil
+import tempfile
+import threading
+from functools import partial
+from http.server import ThreadingHTTPServer
+from serve import LRUCache, PreviewHandler, accepted_encodings, parse_range
+
+
+@pytest.fixture
+def test_dir():
+    temp_dir = Path(tempfile.mkdtemp())
+    yield temp_dir
+    shutil.rmtree(temp_dir)
+
+
+@pytest.fixture
+def server(test_dir):
+    (test_dir / "index.html").write_text("<html>" + "hello " * 100 + "</html>")
+    (test_dir / "style.css").write_text("body { color: red; }")
+    (test_dir / "style.css.gz").write_bytes(gzip.compress(b"body { color: red; }"))
+    (test_dir / "video.mp4").write_bytes(bytes(range(256)))
+    handler = type(
+        "Handler", (PreviewHandler,), {"cache": LRUCache(1024 * 1024), "quiet": True}
+    )
+    httpd = ThreadingHTTPServer(
+        ("127.0.0.1", 0), partial(handler, directory=str(test_dir))
+    )
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd.server_address[1]
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def get(port, path, headers=None):
+    conn = http.client.HTTPConnection("127.0.0.1", port)
+    conn.request("GET", path, headers=headers or {})
+    response = conn.getresponse()
+    body = response.read()
+    conn.close()
+    return response, body
+
+
+def test_accepted_encodings():
+    assert accepted_encodings("gzip, deflate, br;q=0") == {"gzip", "deflate"}
+    assert accepted_encodings(None) == set()
+
+
+def test_parse_range():
+    assert parse_range("bytes=0-9", 100) == (0, 9)
+    assert parse_range("bytes=90-", 100) == (90, 99)
+    assert parse_range("bytes=-10", 100) == (90, 99)
+    assert parse_range("bytes=0-9,20-29", 100) is None
+    with pytest.raises(ValueError):
+        parse_range("bytes=100-", 100)
+
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = LRUCache(max_bytes=10)
+    cache.put("a", b"aaaa")
+    cache.put("b", b"bbbb")
+    cache.get("a")
+    cache.put("c", b"cccc")
+    assert cache.get("a") == b"aaaa"
+    assert cache.get("b") is None
+    assert cache.size == 8
+
+
+def test_serves_precompressed_sibling(server):
+    response, body = get(server, "/style.css", {"Accept-Encoding": "gzip"})
+    assert response.status == 200
+    assert response.getheader("Content-Encoding") == "gzip"
+    assert response.getheader("Vary") == "Accept-Encoding"
+    assert gzip.decompress(body) == b"body { color: red; }"
+
+
+def test_compresses_on_the_fly(server):
+    response, body = get(server, "/", {"Accept-Encoding": "gzip"})
+    assert response.getheader("Content-Encoding") == "gzip"
+    assert gzip.decompress(body).startswith(b"<html>hello")
+
+    response, body = get(server, "/")
+    assert response.getheader("Content-Encoding") is None
+    assert body.startswith(b"<html>hello")
+
+
+def test_revalidation(server):
+    response, _ = get(server, "/style.css")
+    etag = response.getheader("ETag")
+    last_modified = response.getheader("Last-Modified")
+    assert response.getheader("Cache-Control") == "public, max-age=600"
+
+    response, body = get(server, "/style.css", {"If-None-Match": etag})
+    assert response.status == 304
+    assert body == b""
+
+    response, _ = get(server, "/style.css", {"If-Modified-Since": last_modified})
+    assert response.status == 304
+
+
+def test_range_requests(server):
+    response, body = get(server, "/video.mp4", {"Range": "bytes=10-19"})
+    assert response.status == 206
+    assert response.getheader("Content-Range") == "bytes 10-19/256"
+    assert body == bytes(range(10, 20))
+
+    response, _ = get(server, "/video.mp4", {"Range": "bytes=300-"})
+    assert response.status == 416
+
+
+def test_missing_file(server):
+    response, _ = get(server, "/missing.html")
+    assert response.status == 404
@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+
+import sys
+import argparse
+import base64
+import hashlib
+import os
+import urllib.request
+from pathlib import Path
+import pygments
+from pygments.formatters import HtmlFormatter
+
+PASS = 0
+FAIL = 1
+vendor_path = "kutubuku/assets/static/vendor"
+
+# Third-party assets with their Subresource Integrity hash, as published by
+# the project. Downloaded files that do not match are rejected.
+ASSETS = {
+    "bootstrap.min.css": (
+        "https://cdn.jsdelivr.net/npm/bootstrap@5.3.2/dist/css/bootstrap.min.css",
+        "sha384-T3c6CoIi6uLrA9TneNEoa7RxnatzjcDSCmG1MXxSR1GAsXEV/Dwwykc2MPK8M2HN",
+    ),
+    "bootstrap.bundle.min.js": (
+        "https://cdn.jsdelivr.net/npm/bootstrap@5.3.2/dist/js/bootstrap.bundle.min.js",
+        "sha384-C6RzsynM9kWDrMNeT87bh95OGNyZPhcTNXj1NW7RuBCsyN/o0jlpcV8Qyq46cDfL",
+    ),
+}
+# Must match the class and style used by the code-highlight Lektor plugin.
+HIGHLIGHT_CSS = "pygments.css"
+HIGHLIGHT_CLASS = "highlight"
+HIGHLIGHT_STYLE = "default"
+
+
+def integrity(data, algorithm="sha384"):
+    digest = hashlib.new(algorithm, data).digest()
+    return f"{algorithm}-{base64.b64encode(digest).decode()}"
+
+
+def write_file(path, data):
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    tmp_path.write_bytes(data)
+    os.replace(tmp_path, path)
+
+
+def vendor_assets(vendor_path=vendor_path, force=False):
+    """
+    Download the third-party assets into vendor_path and write the
+    stylesheet of highlighted code blocks if it is missing. Assets already
+    present with the expected integrity hash are kept, so this runs offline
+    once they were downloaded. With force, assets are downloaded and the
+    stylesheet written again. Returns the number of assets that failed.
+    """
+    vendor_path = Path(vendor_path)
+    vendor_path.mkdir(parents=True, exist_ok=True)
+
+    failures = 0
+    for name, (url, expected) in ASSETS.items():
+        path = vendor_path / name
+        if not force and path.exists() and integrity(path.read_bytes()) == expected:
+            print(f"{name} is up to date")
+            continue
+        try:
+            with urllib.request.urlopen(url, timeout=30) as response:
+                data = response.read()
+        except OSError as e:
+            state = "is out of date" if path.exists() else "is missing"
+            print(
+                f"Error: {path} {state} and could not be downloaded from {url} "
+                f"({e}). Run make vendor once with network access."
+            )
+            failures += 1
+            continue
+        actual = integrity(data, expected.split("-", 1)[0])
+        if actual != expected:
+            print(f"Integrity mismatch for {url}: expected {expected}, got {actual}")
+            failures += 1
+            continue
+        write_file(path, data)
+        print(f"Vendored {url} ({len(data)} bytes)")
+
+    formatter = HtmlFormatter(style=HIGHLIGHT_STYLE)
+    rules = formatter.get_style_defs(f".{HIGHLIGHT_CLASS}").splitlines()
+    # Leave the line height and line numbers outside code blocks alone.
+    css = "".join(
+        f"{rule}\n" for rule in rules if rule.startswith(f".{HIGHLIGHT_CLASS}")
+    )
+    # The stylesheet is committed, so a Pygments version with other rules
+    # only changes it when asked to.
+    path = vendor_path / HIGHLIGHT_CSS
+    if force or not path.exists():
+        write_file(path, css.encode("utf-8"))
+        print(f"Wrote {path}")
+    elif path.read_text(encoding="utf-8") != css:
+        print(f"{path} differs from Pygments {pygments.__version__}, use --force")
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Vendor third-party assets and the code highlighting stylesheet"
+    )
+    parser.add_argument(
+        "--path", default=vendor_path, help="Directory to write the assets to"
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Download assets that are present and rewrite the code stylesheet",
+    )
+    args = parser.parse_args(argv)
+    failures = vendor_assets(args.path, args.force)
+    return FAIL if failures else PASS
+
+
+if __name__ == "__main__":
+    sys.exit(main())